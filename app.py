@@ -7,9 +7,11 @@ Description: This module defines the routes and associated functionalities for t
 #         IMPORTS
 # ==============================
 
+import gzip
+import itertools
 import os
 import logging
-import pandas as pd
+import time
 from flask import (
     Flask,
     render_template,
@@ -19,13 +21,61 @@ from flask import (
     flash,
     send_file,
     session,
+    jsonify,
+    abort,
+    g,
+    Response,
+    stream_with_context,
 )
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from forms import LoadForm
-from utils.dataLoadFunction import process_engagement_data
-from utils.database import load_data_to_db
+from forms import LoadForm, SharePointExportForm
+from utils.dataLoadFunction import (
+    process_engagement_data,
+    split_by_service_line,
+    KEEP_COLS,
+    ALL_SERVICE_LINES,
+    SERVICE_LINES,
+)
+from utils.cache import (
+    HEADER_SCAN_ROWS,
+    cache_upload,
+    cached_upload_path,
+    file_hash,
+    save_upload,
+    scan_header,
+)
+from utils.database import load_delta_to_db
+from utils.pool import get_pool
+from utils.aggregates import engagement_breakdown, upload_summary
+from utils.history import load_etc_history
+from utils.sharepoint import (
+    DELEGATES,
+    EXCEPTIONS,
+    enrich_engagements,
+    load_sharepoint_export,
+    read_sharepoint_lists,
+    sharepoint_versions,
+)
+from utils.jobs import JobQueue, DONE, FAILED
+from utils.export import (
+    ensure_export,
+    find_processed_frame,
+    save_processed_frame,
+    EXPORT_FORMATS,
+)
+from utils.pagination import load_frame, frame_columns, page_frame, DEFAULT_PAGE_SIZE
+from utils.metrics import CONTENT_TYPE, observe_request, render_metrics
+from utils.runs import RunRegistry, run_fingerprint
+from utils.logs import configure_logging, run_log
+from utils.storage import StorageManager
+from utils.query import (
+    DEFAULT_LIMIT,
+    build_engagement_query,
+    parse_fields,
+    stream_engagements,
+)
 
 # ==============================
 #         CONFIGURATION
@@ -37,8 +87,19 @@ app = Flask(__name__)
 app.secret_key = "your_secret_key"
 LOAD_FOLDER = "./data/loading"
 LOG_FOLDER = "./logs"
+# Last loaded rows per service line, compared with each upload to load only the changes
+SNAPSHOT_FOLDER = "./data/snapshots"
 app.config["LOAD_FOLDER"] = LOAD_FOLDER
 app.config["LOG_FOLDER"] = LOG_FOLDER
+app.config["SNAPSHOT_FOLDER"] = SNAPSHOT_FOLDER
+# Number of /process jobs that may run at once; 0 runs them inside the request
+app.config["MAX_CONCURRENT_JOBS"] = int(os.getenv("MAX_CONCURRENT_JOBS", 2))
+# Retention of uploads, processed data, exports and logs (see utils.storage)
+app.config["STORAGE_MAX_AGE_DAYS"] = float(os.getenv("STORAGE_MAX_AGE_DAYS", 30))
+app.config["STORAGE_MAX_BYTES"] = int(os.getenv("STORAGE_MAX_BYTES", 5 * 1024**3))
+app.config["STORAGE_COMPRESS_AFTER_DAYS"] = float(
+    os.getenv("STORAGE_COMPRESS_AFTER_DAYS", 2)
+)
 
 if not os.path.exists(LOAD_FOLDER):
     os.makedirs(LOAD_FOLDER)
@@ -46,11 +107,36 @@ if not os.path.exists(LOAD_FOLDER):
 if not os.path.exists(LOG_FOLDER):
     os.makedirs(LOG_FOLDER)
 
-logging.basicConfig(
-    filename=os.path.join(app.config["LOG_FOLDER"], "app.log"), level=logging.INFO
+# Logging goes through a queue to a background writer with a rotating app.log
+configure_logging(app.config["LOG_FOLDER"])
+
+job_queue = JobQueue(max_workers=app.config["MAX_CONCURRENT_JOBS"])
+
+# Uploads by content hash and completed /process runs, so repeats are not redone
+run_registry = RunRegistry(os.path.join(LOAD_FOLDER, "runs.json"))
+
+
+def cached_run_artifacts():
+    """
+    Returns the names of the outputs cached runs serve, after dropping runs
+    older than the retention period so their outputs can be evicted too.
+    """
+    run_registry.expire(
+        datetime.now() - timedelta(days=app.config["STORAGE_MAX_AGE_DAYS"])
+    )
+    return run_registry.referenced_names()
+
+
+# Files created by the routes below, compressed and evicted as they age
+storage = StorageManager(
+    os.path.join(LOAD_FOLDER, "storage.json"),
+    max_age_days=app.config["STORAGE_MAX_AGE_DAYS"],
+    max_bytes=app.config["STORAGE_MAX_BYTES"],
+    compress_after_days=app.config["STORAGE_COMPRESS_AFTER_DAYS"],
+    protected=cached_run_artifacts,
 )
 
-static_service_lines = ["All", "CBS & Elim", "Assurance", "Consulting", "Tax", "SaT"]
+static_service_lines = [ALL_SERVICE_LINES] + SERVICE_LINES
 
 # ==============================
 #         ROUTES
@@ -73,33 +159,242 @@ def load():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_path = os.path.join(app.config["LOAD_FOLDER"], f"{timestamp}_{filename}")
 
-        file.save(file_path)
-
         try:
-            flash("File loaded successfully. Previewing the first 20 rows.", "success")
-            # Show preview of first 20 rows
-            df_load = pd.read_excel(file_path)
-            df_preview = df_load.head(20)
+            # Stream the upload to disk, then check its header from the first rows
+            # so a file without the required columns is rejected before parsing
+            content_hash = save_upload(file.stream, file_path)
+            header_row, missing = scan_header(file_path, KEEP_COLS)
+            if missing:
+                os.remove(file_path)
+                flash(
+                    f"No header row with all required columns in the first "
+                    f"{HEADER_SCAN_ROWS} rows. Row {header_row} is closest but "
+                    f"is missing: {', '.join(missing)}.",
+                    "danger",
+                )
+                return redirect(url_for("load"))
+
+            # Keep one copy of identical uploads, so they share the parse cache
+            stored_path = run_registry.register_upload(content_hash, file_path)
+            if stored_path != file_path:
+                os.remove(file_path)
+                file_path = stored_path
+            flash("File loaded successfully.", "success")
+            # Parse the upload once into the cache with the header row found
+            # above; the preview pages through it
+            header_row = cache_upload(
+                file_path,
+                required_cols=KEEP_COLS,
+                content_hash=content_hash,
+                header_row=header_row,
+            )
+            preview_path = cached_upload_path(file_path, header_row, content_hash)
+            storage.track(file_path)
+            storage.track(preview_path)
             session["file_path"] = file_path
+            session["file_hash"] = content_hash
+            session["preview_path"] = preview_path
             session["load_timestamp"] = timestamp
             return render_template(
                 "load.html",
                 form=form,
-                table=df_preview.style.set_table_attributes(
-                    'table_id="previewTable" classes="table table-striped table-sm" data-toggle="table" data-pagination="true" data-search="true"'
-                ).to_html(),
+                columns=frame_columns(preview_path),
                 file_path=file_path,
+                start_row=header_row,
                 service_lines=static_service_lines,
             )
         except Exception as e:
             flash(f"Error processing file: {str(e)}", "danger")
             return redirect(url_for("load"))
 
+    for error in form.file.errors:
+        flash(error, "danger")
+
     return render_template("load.html", form=form, service_lines=static_service_lines)
     # TODO: #8 Add count for number of rows in the preview file
 
 
 # ======== PROCESS ========
+PROCESS_STAGES = ["parse", "transform", "export", "db load"]
+
+
+def run_process_job(
+    job,
+    file_path,
+    start_row,
+    service_line,
+    export_log,
+    upload_timestamp,
+    upload_user,
+    content_hash=None,
+):
+    """
+    Background job for /process: runs process_upload with everything it logs
+    also written to the job's own log file, linked from the results page when
+    export_log is set. Returns the context for processed.html.
+    """
+    log_name = f"process_{job.id}.log"
+    with storage.pin(file_path), run_log(app.config["LOG_FOLDER"], log_name):
+        result = process_upload(
+            job,
+            file_path,
+            start_row,
+            service_line,
+            upload_timestamp,
+            upload_user,
+            content_hash,
+        )
+    result["log_link"] = log_name if export_log else None
+
+    for name in result_names(result):
+        storage.track(find_processed_frame(app.config["LOAD_FOLDER"], name))
+    storage.track(os.path.join(app.config["LOG_FOLDER"], log_name))
+    storage.maybe_sweep()
+    return result
+
+
+def result_names(result):
+    """
+    Returns the names of the processed frames a /process result pages through.
+    """
+    names = [result["download_name"], result["outreach_name"]]
+    names += [line["download_name"] for line in result["service_line_results"] or []]
+    return [name for name in names if name]
+
+
+def process_upload(
+    job,
+    file_path,
+    start_row,
+    service_line,
+    upload_timestamp,
+    upload_user,
+    content_hash=None,
+):
+    """
+    Parses and transforms the upload, exports it and loads it into the
+    database. content_hash is the upload's hash from save_upload, if known.
+    """
+    # Process the data
+    df_processed = process_engagement_data(
+        file_path,
+        start_row=start_row,
+        service_line=service_line,
+        streaming=True,
+        use_cache=True,
+        optimize=True,
+        progress=job.set_stage,
+        content_hash=content_hash,
+    )
+
+    df_procesed_size = df_processed.shape[0]
+
+    # Store the processed frame; downloads are generated from it on first request
+    job.set_stage("export")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    processed_name = f"processed_data_{timestamp}"
+    save_processed_frame(df_processed, app.config["LOAD_FOLDER"], processed_name)
+
+    # Outreach list: processed data joined to the loaded delegates and exceptions
+    outreach_name = None
+    delegates, exceptions = read_sharepoint_lists(notify=job.add_message)
+    if delegates is not None or exceptions is not None:
+        outreach_name = f"{processed_name}_outreach"
+        save_processed_frame(
+            enrich_engagements(df_processed, delegates, exceptions),
+            app.config["LOAD_FOLDER"],
+            outreach_name,
+        )
+
+    job.set_stage("db load")
+    service_line_results = None
+    if service_line == ALL_SERVICE_LINES:
+        # Split the single processed frame and export/load each service line
+        service_line_results = []
+        frames = split_by_service_line(
+            df_processed,
+            [line for line in static_service_lines if line != ALL_SERVICE_LINES],
+        )
+        for line, df_line in frames.items():
+            line_name = f"{processed_name}_{secure_filename(line)}"
+            save_processed_frame(df_line, app.config["LOAD_FOLDER"], line_name)
+            load_delta_to_db(
+                df_line,
+                "engagement_data",
+                upload_timestamp,
+                upload_user,
+                app.config["SNAPSHOT_FOLDER"],
+                f"engagement_data_{secure_filename(line)}",
+                notify=job.add_message,
+                label=line,
+            )
+            service_line_results.append(
+                {
+                    "service_line": line,
+                    "size": df_line.shape[0],
+                    "download_name": line_name,
+                }
+            )
+    else:
+        # Load the changes since the last upload for this service line
+        load_delta_to_db(
+            df_processed,
+            "engagement_data",
+            upload_timestamp,
+            upload_user,
+            app.config["SNAPSHOT_FOLDER"],
+            f"engagement_data_{secure_filename(service_line)}",
+            notify=job.add_message,
+        )
+
+    # One ETC age history row per engagement and report date, for trend queries
+    load_etc_history(df_processed, "engagement_data", notify=job.add_message)
+
+    job.add_message("Data processed successfully.", "success")
+
+    return {
+        # The table pages through the stored frame via /data/processed/<name>
+        "columns": list(df_processed.columns),
+        "download_name": processed_name,
+        "outreach_name": outreach_name,
+        "export_formats": EXPORT_FORMATS,
+        "size": df_procesed_size,
+        "service_line_results": service_line_results,
+    }
+
+
+def run_registered_job(job, fingerprint, *args):
+    """
+    Runs run_process_job and records its result for fingerprint, unless a
+    load failed, so a repeat of the same upload and parameters reuses it.
+    """
+    result = run_process_job(job, *args)
+    if all(category != "danger" for _, category in job.messages):
+        run_registry.record(fingerprint, result, job.messages)
+    return result
+
+
+def completed_run(fingerprint):
+    """
+    Returns the registered run for fingerprint if its processed output is
+    still stored, otherwise None.
+    """
+    entry = run_registry.completed(fingerprint)
+    if entry is None:
+        return None
+    frame_paths = [
+        find_processed_frame(app.config["LOAD_FOLDER"], name)
+        for name in result_names(entry["result"])
+    ]
+    if None in frame_paths:
+        run_registry.forget(fingerprint)
+        return None
+    # Reused outputs count as recently used for eviction
+    for frame_path in frame_paths:
+        storage.touch(frame_path)
+    return entry
+
+
 @app.route("/process", methods=["POST"])
 def process():
     file_path = session.get("file_path")
@@ -111,86 +406,288 @@ def process():
         request.remote_addr
     )  # For simplicity, using the remote address as the user
 
-    try:
-        # Process the data
-        df_processed = process_engagement_data(
-            file_path, start_row=start_row, service_line=service_line
+    # The upload may have been compressed by storage since it was loaded
+    if not file_path or not storage.restore(file_path):
+        flash("Error processing data: no uploaded file to process.", "danger")
+        return redirect(url_for("load"))
+    # Hashed once at upload; the cache lookup reuses it rather than rereading the file
+    content_hash = session.get("file_hash") or file_hash(file_path)
+    fingerprint = run_fingerprint(
+        content_hash, start_row, service_line, export_log, sharepoint_versions()
+    )
+    entry = completed_run(fingerprint)
+    if entry is not None:
+        # Same contents and parameters: serve the earlier output and DB load result
+        job = job_queue.add_done(
+            entry["result"],
+            [tuple(message) for message in entry["messages"]]
+            + [
+                (
+                    f"This file was already processed with these settings on "
+                    f"{entry['completed_at']}; showing that run.",
+                    "info",
+                )
+            ],
+            stages=PROCESS_STAGES,
+        )
+    else:
+        # Identical requests arriving while a run is in progress share its job
+        job = run_registry.claim(
+            fingerprint,
+            lambda: job_queue.submit(
+                run_registered_job,
+                fingerprint,
+                file_path,
+                start_row,
+                service_line,
+                export_log,
+                upload_timestamp,
+                upload_user,
+                content_hash,
+                stages=PROCESS_STAGES,
+            ),
         )
+    return redirect(url_for("job_results", job_id=job.id))
 
-        df_procesed_size = df_processed.shape[0]
 
-        # Save processed data to a new Excel file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        processed_file_name = f"processed_data_{timestamp}.xlsx"
-        processed_file_path = os.path.join(
-            app.config["LOAD_FOLDER"], processed_file_name
-        )
-        df_processed.to_excel(processed_file_path, index=False)
+# ======== JOBS ========
+@app.route("/jobs/<job_id>")
+def job_results(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        flash("Processing job not found or expired.", "danger")
+        return redirect(url_for("load"))
+
+    if job.status == FAILED:
+        flash(f"Error processing data: {job.error}", "danger")
+        return redirect(url_for("load"))
+
+    if job.status == DONE:
+        for message, category in job.messages:
+            flash(message, category)
+        return render_template("processed.html", **job.result)
+
+    return render_template("job.html", job=job.to_dict())
 
-        # Load data to database
-        load_data_to_db(df_processed, "engagement_data", upload_timestamp, upload_user)
 
-        # Limit displayed rows to 20
-        df_display = (
-            df_processed.head(20)
-            .style.set_table_attributes(
-                'table_id="processedTable" classes="table table-striped table-sm" data-toggle="table" data-pagination="true" data-search="true"'
+@app.route("/jobs/<job_id>/status")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+# ======== TABLE DATA ========
+def table_page(path):
+    """
+    Returns one page of the frame at path as JSON for bootstrap-table's
+    server-side pagination, using its search, sort, order, offset and limit
+    query parameters.
+    """
+    try:
+        return jsonify(
+            page_frame(
+                load_frame(path),
+                search=request.args.get("search"),
+                sort=request.args.get("sort"),
+                order=request.args.get("order", "asc"),
+                offset=request.args.get("offset", 0, type=int),
+                limit=request.args.get("limit", DEFAULT_PAGE_SIZE, type=int),
             )
-            .to_html()
         )
+    except Exception as e:
+        logging.error(f"Error paging {path}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
-        flash("Data processed successfully.", "success")
 
-        if export_log:
-            log_file_name = f"app_{timestamp}.log"
-            logging.shutdown()
-            os.rename(
-                os.path.join(app.config["LOG_FOLDER"], "app.log"),
-                os.path.join(app.config["LOG_FOLDER"], log_file_name),
-            )
-            return render_template(
-                "processed.html",
-                table=df_display,
-                download_link=processed_file_name,
-                log_link=log_file_name,
-                size=df_procesed_size,
-            )
-        else:
-            return render_template(
-                "processed.html",
-                table=df_display,
-                download_link=processed_file_name,
-                size=df_procesed_size,
-            )
+@app.route("/data/preview")
+def preview_data():
+    preview_path = session.get("preview_path")
+    if not preview_path or not os.path.exists(preview_path):
+        return jsonify({"error": "no upload to preview"}), 404
+    return table_page(preview_path)
 
-    except Exception as e:
-        flash(f"Error processing data: {str(e)}", "danger")
-        return redirect(url_for("load"))
+
+@app.route("/data/processed/<name>")
+def processed_data(name):
+    frame_path = find_processed_frame(app.config["LOAD_FOLDER"], secure_filename(name))
+    if frame_path is None:
+        return jsonify({"error": "processed data not found"}), 404
+    return table_page(frame_path)
 
 
 # ======== DOWNLOADS ========
+def send_stored(file_path):
+    """
+    Sends a file as an attachment, decompressing it on the fly if storage has
+    compressed it. Pinned while it is opened, so a sweep cannot remove it.
+    """
+    with storage.pin(file_path):
+        stored = storage.resolve(file_path)
+        if stored is None:
+            abort(404)
+        stored_path, compressed = stored
+        if compressed:
+            return send_file(
+                gzip.open(stored_path, "rb"),
+                as_attachment=True,
+                download_name=os.path.basename(file_path),
+            )
+        return send_file(stored_path, as_attachment=True)
+
+
 @app.route("/download/<filename>")
 def download(filename):
+    filename = secure_filename(filename)
     file_path = os.path.join(app.config["LOAD_FOLDER"], filename)
-    return send_file(file_path, as_attachment=True)
+    if storage.resolve(file_path) is None:
+        # Exports are generated on first download and streamed from disk in chunks
+        file_path = ensure_export(app.config["LOAD_FOLDER"], filename)
+        if file_path is None:
+            abort(404)
+        storage.track(file_path)
+    return send_stored(file_path)
 
 
 @app.route("/download_log/<filename>")
 def download_log(filename):
-    file_path = os.path.join(app.config["LOG_FOLDER"], filename)
-    return send_file(file_path, as_attachment=True)
+    # Run logs are complete once their job is; app.log keeps being written
+    return send_stored(
+        os.path.join(app.config["LOG_FOLDER"], secure_filename(filename))
+    )
+
+
+# ======== DATABASE POOL ========
+@app.route("/db/pool")
+def db_pool():
+    return jsonify(get_pool().stats())
+
+
+# ======== STORAGE ========
+@app.route("/storage")
+def storage_stats():
+    return jsonify(storage.stats())
+
+
+# ======== API ========
+def list_arg(name):
+    # Repeated (?gui=a&gui=b) or comma-separated (?gui=a,b) values
+    return [
+        value for arg in request.args.getlist(name) for value in arg.split(",") if value
+    ]
+
+
+def timestamp_arg(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+
+@app.route("/api/engagements")
+def api_engagements():
+    """
+    Pages through engagement_data for dashboards, as streamed JSON in upload
+    order. Query parameters: fields (comma-separated columns), service_line,
+    partner_gui and manager_gui (one or more), etc_age_min, etc_age_max,
+    upload_from and upload_to (ISO 8601), limit, and cursor, the next_cursor
+    of the previous page. Rows missing an upload timestamp, engagement ID or
+    creation date are not returned.
+    """
+    try:
+        fields = parse_fields(request.args.get("fields"))
+        limit = request.args.get("limit", DEFAULT_LIMIT, type=int)
+        query, params = build_engagement_query(
+            "engagement_data",
+            fields,
+            service_line=request.args.get("service_line"),
+            partner_guis=list_arg("partner_gui"),
+            manager_guis=list_arg("manager_gui"),
+            etc_age_min=request.args.get("etc_age_min", type=int),
+            etc_age_max=request.args.get("etc_age_max", type=int),
+            upload_from=timestamp_arg("upload_from"),
+            upload_to=timestamp_arg("upload_to"),
+            cursor=request.args.get("cursor"),
+            limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        # The connection is held only while the page is streamed
+        with get_pool().connection() as connection:
+            yield from stream_engagements(connection, query, params, fields, limit)
+
+    chunks = stream_with_context(generate())
+    try:
+        # Run the query before the response starts, so errors are still reported
+        first = next(chunks)
+    except Exception as e:
+        logging.error(f"Error querying engagements: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    return Response(itertools.chain([first], chunks), mimetype="application/json")
+
+
+# ======== METRICS ========
+@app.before_request
+def start_request_timer():
+    g.request_start_time = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    start_time = g.pop("request_start_time", None)
+    if start_time is not None:
+        # Labelled by route pattern rather than URL, so /jobs/<job_id> is one series
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe_request(
+            request.method,
+            route,
+            response.status_code,
+            time.perf_counter() - start_time,
+        )
+    return response
+
+
+@app.route("/metrics")
+def metrics():
+    # Stage and request histograms in the Prometheus text format
+    return app.response_class(render_metrics(), content_type=CONTENT_TYPE)
 
 
 # ======== DELEGATES ========
-@app.route("/delegates")
+def sharepoint_upload(kind, template):
+    """
+    Loads an uploaded SharePoint list export into its table, replacing the
+    previous export.
+    """
+    form = SharePointExportForm()
+    rows_loaded = None
+    if form.validate_on_submit():
+        file = form.file.data
+        timestamp = datetime.now()
+        file_path = os.path.join(
+            app.config["LOAD_FOLDER"],
+            f"{timestamp:%Y%m%d_%H%M%S}_{kind}_{secure_filename(file.filename)}",
+        )
+        file.save(file_path)
+        storage.track(file_path)
+        rows_loaded = load_sharepoint_export(file_path, kind, timestamp)
+
+    for error in form.file.errors:
+        flash(error, "danger")
+
+    return render_template(template, form=form, rows_loaded=rows_loaded)
+
+
+@app.route("/delegates", methods=["GET", "POST"])
 def delegates():
-    return render_template("delegates.html")
+    return sharepoint_upload(DELEGATES, "delegates.html")
 
 
 # ======== APPLICATION ========
-@app.route("/etc_exception_application")
+@app.route("/etc_exception_application", methods=["GET", "POST"])
 def etc_exception_application():
-    return render_template("etc_exception_application.html")
+    return sharepoint_upload(EXCEPTIONS, "etc_exception_application.html")
 
 
 # ======== EP APPROVAL ========
@@ -208,7 +705,26 @@ def finance_approval():
 # ======== REPORTS ========
 @app.route("/reports")
 def reports():
-    return render_template("reports.html")
+    # Read from the summary refreshed by each load, not the engagement table
+    uploads = service_lines = partners = None
+    try:
+        with get_pool().connection() as connection:
+            uploads = upload_summary(connection, "engagement_data")
+            service_lines = engagement_breakdown(
+                connection, "engagement_data", "engagement_partner_service_line"
+            )
+            partners = engagement_breakdown(
+                connection, "engagement_data", "engagement_partner"
+            )
+    except Exception as e:
+        flash(f"Error loading reports: {str(e)}", "danger")
+        logging.error(f"Error loading reports: {str(e)}")
+    return render_template(
+        "reports.html",
+        uploads=uploads,
+        service_lines=service_lines,
+        partners=partners,
+    )
 
 
 # ======== 404 ========
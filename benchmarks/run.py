@@ -0,0 +1,332 @@
+"""
+Benchmarks reading, transforming, exporting and loading synthetic engagement
+lists (see utils.synthetic), and compares the timings and peak memory with the
+baselines stored in benchmarks/baselines.json.
+
+    python -m benchmarks.run --rows 10000 100000 --format parquet --db sqlite
+    python -m benchmarks.run --rows 10000 --db postgres --update-baseline
+
+Exits with status 1 if any stage is slower or uses more memory than its
+baseline by more than the tolerance. Baselines depend on the machine, so
+refresh them with --update-baseline on the machine that runs the checks.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from utils.dataLoadFunction import (
+    ALL_SERVICE_LINES,
+    KEEP_COLS,
+    process_engagement_data,
+    read_engagement_file,
+)
+from utils.database import ENGAGEMENT_COLUMNS
+from utils.export import write_export
+from utils.metrics import STAGE_DURATION, resident_memory
+from utils.synthetic import BENCHMARK_SIZES, generate_engagements, write_engagement_list
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DATA_FOLDER = "./data/synthetic"
+EXPORT_BENCHMARK_FORMATS = ["parquet", "csv.gz", "xlsx"]
+# Stages of process_engagement_data (see utils.metrics) that make up transform
+TRANSFORM_STAGES = ["filter", "prune", "dates", "calc"]
+
+# A stage regresses when it is this much slower or larger than its baseline,
+# and by more than the noise floor
+DEFAULT_TOLERANCE = 0.5
+NOISE_FLOOR_SECONDS = 0.05
+NOISE_FLOOR_MB = 20
+
+
+def _measure(func, interval=0.01):
+    """
+    Runs func once and returns (result, seconds, peak MB).
+
+    Peak MB is the highest resident memory of the process while func ran,
+    sampled every `interval` seconds by a background thread, less the resident
+    memory before it started. Unlike tracemalloc this includes memory held by
+    pyarrow, which backs pandas strings, and does not slow func down.
+    """
+    start_memory = resident_memory() or 0
+    peak = [start_memory]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], resident_memory() or 0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start_time = time.perf_counter()
+    try:
+        result = func()
+        seconds = time.perf_counter() - start_time
+    finally:
+        done.set()
+        sampler.join()
+    peak[0] = max(peak[0], resident_memory() or 0)
+    return result, seconds, (peak[0] - start_memory) / 1024**2
+
+
+def _best_of(func, repeat):
+    """
+    Measures func `repeat` times and returns the last result with the lowest
+    seconds and peak MB, which are the least disturbed by other processes.
+    """
+    runs = [_measure(func) for _ in range(repeat)]
+    return runs[-1][0], min(run[1] for run in runs), min(run[2] for run in runs)
+
+
+def _stage_seconds():
+    return {key[0]: total for key, total in STAGE_DURATION.sums().items()}
+
+
+def load_sqlite(df, upload_timestamp):
+    """
+    Stand-in for the Postgres load when no database is available: inserts the
+    processed rows into an in-memory SQLite table with the same columns and
+    (engagement_id, creation_date) key, skipping duplicates.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    connection = sqlite3.connect(":memory:")
+    columns = ENGAGEMENT_COLUMNS
+    connection.execute(
+        f"CREATE TABLE engagement_data ({', '.join(columns)}, "
+        "PRIMARY KEY (engagement_id, creation_date))"
+    )
+    values = df.reindex(columns=columns[:-2]).astype(object)
+    values = values.where(values.notna(), None)
+    for col in values.columns:
+        if col.endswith("_date"):
+            values[col] = values[col].map(
+                lambda value: None if value is None else value.isoformat()
+            )
+    rows = (
+        row + (upload_timestamp.isoformat(), "benchmark")
+        for row in values.itertuples(index=False, name=None)
+    )
+    cursor = connection.executemany(
+        f"INSERT OR IGNORE INTO engagement_data ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})",
+        rows,
+    )
+    connection.commit()
+    rows_inserted = cursor.rowcount
+    connection.close()
+    return rows_inserted
+
+
+def load_postgres(df, upload_timestamp):
+    """
+    Loads the processed rows with load_data_to_db into a scratch table, which
+    is dropped afterwards.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    from utils.database import load_data_to_db
+    from utils.pool import get_pool
+
+    table_name = "benchmark_engagement_data"
+    messages = []
+    with get_pool().connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"DROP TABLE IF EXISTS {table_name}, {table_name}_summary CASCADE;"
+        )
+        connection.commit()
+    try:
+        result = load_data_to_db(
+            df,
+            table_name,
+            upload_timestamp,
+            "benchmark",
+            notify=lambda message, category: messages.append(message),
+        )
+        if result is None:
+            raise RuntimeError(messages[-1])
+        return result[0]
+    finally:
+        with get_pool().connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"DROP TABLE IF EXISTS {table_name}, {table_name}_summary CASCADE;"
+            )
+            connection.commit()
+
+
+DB_LOADERS = {"sqlite": load_sqlite, "postgres": load_postgres}
+
+
+def input_file(rows, fmt, folder=DATA_FOLDER):
+    """
+    Returns the synthetic engagement list for rows and fmt, generating it on
+    first use. Generation is seeded, so the file is the same on every machine.
+    """
+    path = os.path.join(folder, f"synthetic_engagement_data-{rows}.{fmt}")
+    if not os.path.exists(path):
+        write_engagement_list(generate_engagements(rows), folder, fmt)
+    return path
+
+
+def run_benchmark(rows, fmt="parquet", db="sqlite", folder=DATA_FOLDER, repeat=3):
+    """
+    Times and memory-profiles each stage for one synthetic engagement list,
+    taking the best of `repeat` runs per stage.
+
+    Returns:
+        dict: Stage name to {"seconds", "peak_mb", "rows"}. transform is the
+            filter, prune, dates and calc stages of process and has no peak_mb.
+    """
+    path = input_file(rows, fmt, folder)
+    results = {}
+
+    df_raw, seconds, peak_mb = _best_of(
+        lambda: read_engagement_file(path, keep_cols=KEEP_COLS), repeat
+    )
+    results["read"] = {"seconds": seconds, "peak_mb": peak_mb, "rows": len(df_raw)}
+    del df_raw
+
+    transform_seconds = []
+
+    def process():
+        before = _stage_seconds()
+        df = process_engagement_data(
+            path, service_line=ALL_SERVICE_LINES, verbose=False, optimize=True
+        )
+        after = _stage_seconds()
+        transform_seconds.append(
+            sum(
+                after.get(stage, 0) - before.get(stage, 0) for stage in TRANSFORM_STAGES
+            )
+        )
+        return df
+
+    df, seconds, peak_mb = _best_of(process, repeat)
+    results["process"] = {"seconds": seconds, "peak_mb": peak_mb, "rows": len(df)}
+    results["transform"] = {"seconds": min(transform_seconds), "rows": len(df)}
+
+    with tempfile.TemporaryDirectory() as export_folder:
+        for export_fmt in EXPORT_BENCHMARK_FORMATS:
+            export_path = os.path.join(export_folder, f"benchmark.{export_fmt}")
+            _, seconds, peak_mb = _best_of(
+                lambda: write_export(df, export_path, export_fmt), repeat
+            )
+            results[f"export_{export_fmt}"] = {
+                "seconds": seconds,
+                "peak_mb": peak_mb,
+                "rows": len(df),
+            }
+
+    rows_loaded, seconds, peak_mb = _best_of(
+        lambda: DB_LOADERS[db](df, datetime.now().replace(microsecond=0)), repeat
+    )
+    results[f"db_load_{db}"] = {
+        "seconds": seconds,
+        "peak_mb": peak_mb,
+        "rows": rows_loaded,
+    }
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns a message for each stage that is slower or uses more memory than
+    its baseline by more than tolerance (a fraction) and the noise floor.
+    Stages without a baseline are not compared.
+    """
+    regressions = []
+    for stage, measured in results.items():
+        expected = baseline.get(stage)
+        if expected is None:
+            continue
+        for metric, floor in (
+            ("seconds", NOISE_FLOOR_SECONDS),
+            ("peak_mb", NOISE_FLOOR_MB),
+        ):
+            if metric not in measured or metric not in expected:
+                continue
+            limit = max(expected[metric] * (1 + tolerance), expected[metric] + floor)
+            if measured[metric] > limit:
+                regressions.append(
+                    f"{stage}: {metric} {measured[metric]:.2f} > baseline "
+                    f"{expected[metric]:.2f} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines, path=BASELINE_PATH):
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def baseline_key(rows, fmt):
+    return f"{rows}/{fmt}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the engagement pipeline on synthetic data."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=BENCHMARK_SIZES[:1])
+    parser.add_argument(
+        "--format", default="parquet", choices=["xlsx", "csv", "parquet"]
+    )
+    parser.add_argument("--db", default="sqlite", choices=sorted(DB_LOADERS))
+    parser.add_argument("--data", default=DATA_FOLDER)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store these results as the baseline instead of comparing",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    baselines = load_baselines()
+    regressions = []
+    for rows in args.rows:
+        key = baseline_key(rows, args.format)
+        results = run_benchmark(rows, args.format, args.db, args.data, args.repeat)
+        print(f"\n{key} ({args.db})")
+        for stage, measured in results.items():
+            peak = measured.get("peak_mb")
+            print(
+                f"  {stage:<20} {measured['seconds']:8.2f} s"
+                + (f" {peak:9.1f} MB" if peak is not None else "")
+                + f" {measured['rows']:>9} rows"
+            )
+        if args.update_baseline:
+            baselines.setdefault(key, {}).update(results)
+        else:
+            regressions += [
+                f"{key} {message}"
+                for message in compare_to_baseline(
+                    results, baselines.get(key, {}), args.tolerance
+                )
+            ]
+
+    if args.update_baseline:
+        save_baselines(baselines)
+        print(f"\nBaselines saved to {BASELINE_PATH}")
+    elif regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
@@ -1,12 +1,37 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed
 from wtforms import FileField, IntegerField, StringField, SubmitField
 from wtforms.validators import DataRequired
+from utils.cache import CSV_EXTENSIONS, EXCEL_EXTENSIONS, SUPPORTED_EXTENSIONS
 
 
 class LoadForm(FlaskForm):
-    file = FileField("Load Excel File", validators=[DataRequired()])
+    file = FileField(
+        "Load Engagement List (Excel, CSV, Parquet or Feather)",
+        validators=[
+            DataRequired(),
+            FileAllowed(
+                [ext.lstrip(".") for ext in SUPPORTED_EXTENSIONS],
+                "Upload an Excel, CSV, Parquet or Feather/Arrow file.",
+            ),
+        ],
+    )
     start_row = IntegerField("Start Row", default=1, validators=[DataRequired()])
     service_line = StringField(
         "Service Line", default="Consulting", validators=[DataRequired()]
     )
     submit = SubmitField("Load")
+
+
+class SharePointExportForm(FlaskForm):
+    file = FileField(
+        "Load SharePoint List Export (Excel or CSV)",
+        validators=[
+            DataRequired(),
+            FileAllowed(
+                [ext.lstrip(".") for ext in EXCEL_EXTENSIONS + CSV_EXTENSIONS],
+                "Upload an Excel or CSV file.",
+            ),
+        ],
+    )
+    submit = SubmitField("Load")
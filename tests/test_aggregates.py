@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import MagicMock
+from datetime import datetime
+import pandas as pd
+from utils.aggregates import (
+    engagement_breakdown,
+    refresh_summary,
+    summarize_upload,
+    write_upload_summary,
+)
+
+
+class TestAggregates(unittest.TestCase):
+
+    def test_refresh_summary_for_uploads(self):
+        """
+        Test only the given uploads are deleted and recomputed, with ETC ages
+        bucketed in SQL.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.rowcount = 3
+
+        result = refresh_summary(mock_connection, "test_table", [datetime(2024, 6, 10)])
+
+        self.assertEqual(result, 3)
+        delete_sql, delete_params = mock_cursor.execute.call_args_list[1][0]
+        self.assertIn("DELETE FROM test_table_summary", delete_sql)
+        self.assertEqual(delete_params, ([datetime(2024, 6, 10)],))
+        insert_sql, insert_params = mock_cursor.execute.call_args_list[2][0]
+        self.assertIn(
+            "FROM test_table WHERE upload_timestamp = ANY(%s::timestamp[])", insert_sql
+        )
+        self.assertIn("WHEN etc_age IS NULL THEN 'Unknown'", insert_sql)
+        self.assertIn("WHEN etc_age <= 30 THEN '0-30'", insert_sql)
+        self.assertIn("ELSE '180+'", insert_sql)
+        mock_connection.commit.assert_not_called()
+
+    def test_refresh_summary_rebuild(self):
+        """
+        Test the summary is rebuilt from the whole table without upload timestamps.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.rowcount = 0
+
+        refresh_summary(mock_connection, "test_table")
+
+        self.assertIn("TRUNCATE", mock_cursor.execute.call_args_list[1][0][0])
+        self.assertNotIn("WHERE", mock_cursor.execute.call_args_list[2][0][0])
+
+    def test_summarize_upload(self):
+        """
+        Test a list is counted once per engagement into the SQL buckets.
+        """
+        df = pd.DataFrame(
+            {
+                "engagement_id": ["1", "2", "3", "3"],
+                "creation_date": [datetime(2024, 5, 10)] * 4,
+                "engagement_partner_service_line": ["Consulting"] * 4,
+                "engagement_partner": ["Partner1"] * 4,
+                "engagement_status": ["Released"] * 4,
+                "etc_age": pd.array([-2, 30, None, None], dtype="Int64"),
+            }
+        )
+
+        summary = summarize_upload(df)
+
+        self.assertEqual(summary["etc_age_bucket"].tolist(), ["0-30", "Unknown"])
+        self.assertEqual(summary["engagements"].tolist(), [2, 1])
+
+    def test_write_upload_summary(self):
+        """
+        Test only the upload's rows for the list's service lines are replaced.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        df = pd.DataFrame(
+            {
+                "engagement_id": ["1"],
+                "creation_date": [datetime(2024, 5, 10)],
+                "engagement_partner_service_line": ["Consulting"],
+                "engagement_partner": ["Partner1"],
+                "engagement_status": ["Released"],
+                "etc_age": [45],
+            }
+        )
+
+        result = write_upload_summary(
+            mock_connection, "test_table", df, datetime(2024, 6, 10)
+        )
+
+        self.assertEqual(result, 1)
+        delete_sql, delete_params = mock_cursor.execute.call_args_list[1][0]
+        self.assertIn("DELETE FROM test_table_summary", delete_sql)
+        self.assertEqual(delete_params, (datetime(2024, 6, 10), ["Consulting"], False))
+        self.assertEqual(
+            mock_cursor.executemany.call_args[0][1],
+            [(datetime(2024, 6, 10), "Consulting", "Partner1", "Released", "31-60", 1)],
+        )
+        mock_connection.commit.assert_not_called()
+
+    def test_engagement_breakdown(self):
+        """
+        Test the breakdown has a column per bucket and is sorted by total.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.description = [
+            ("engagement_partner",),
+            ("etc_age_bucket",),
+            ("engagements",),
+        ]
+        mock_cursor.fetchall.return_value = [
+            ("Partner1", "0-30", 2),
+            ("Partner2", "180+", 4),
+            ("Partner2", "Unknown", 1),
+        ]
+
+        df = engagement_breakdown(mock_connection, "test_table", "engagement_partner")
+
+        self.assertEqual(
+            list(df.columns),
+            [
+                "engagement_partner",
+                "0-30",
+                "31-60",
+                "61-90",
+                "91-180",
+                "180+",
+                "Unknown",
+                "Total",
+            ],
+        )
+        self.assertEqual(df["engagement_partner"].tolist(), ["Partner2", "Partner1"])
+        self.assertEqual(df["Total"].tolist(), [5, 2])
+        # Only the latest upload of each service line is counted
+        self.assertIn("MAX(upload_timestamp)", mock_cursor.execute.call_args[0][0])
+        with self.assertRaises(ValueError):
+            engagement_breakdown(mock_connection, "test_table", "client; DROP TABLE x")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
 import os
+import shutil
+import tempfile
 import unittest
 from datetime import datetime
 from flask import Flask, session
-from app import app, process_engagement_data, load_data_to_db
+from app import app, process_engagement_data
+from utils.export import save_processed_frame
 import pandas as pd
 
 
@@ -23,8 +26,14 @@ class FlaskAppTests(unittest.TestCase):
         cls.client = cls.app.test_client()
         cls.app.config["TESTING"] = True
         cls.app.config["WTF_CSRF_ENABLED"] = False
-        cls.app.config["UPLOAD_FOLDER"] = "./tests_uploads"
-        cls.app.config["LOG_FOLDER"] = "./test_logs"
+        # Fixtures and outputs go to a temporary folder, not the app's own
+        cls.folders = {
+            key: cls.app.config[key] for key in ["LOAD_FOLDER", "LOG_FOLDER"]
+        }
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.app.config["UPLOAD_FOLDER"] = os.path.join(cls.temp_dir, "uploads")
+        cls.app.config["LOAD_FOLDER"] = os.path.join(cls.temp_dir, "loading")
+        cls.app.config["LOG_FOLDER"] = os.path.join(cls.temp_dir, "logs")
 
         # Ensure the test directories exist
         os.makedirs(cls.app.config["LOAD_FOLDER"], exist_ok=True)
@@ -96,10 +105,8 @@ class FlaskAppTests(unittest.TestCase):
         Clean up the test environment after all tests have run. This includes removing
         the test directories.
         """
-        import shutil
-
-        shutil.rmtree(cls.app.config["UPLOAD_FOLDER"])
-        shutil.rmtree(cls.app.config["LOG_FOLDER"])
+        shutil.rmtree(cls.temp_dir)
+        cls.app.config.update(cls.folders)
 
     def test_home_page(self):
         """
@@ -126,9 +133,7 @@ class FlaskAppTests(unittest.TestCase):
         """
         data = {"start_row": 1, "service_line": "Service Line 1"}
         # Use the valid test file here
-        test_file_path = os.path.join(
-            self.app.config["LOAD_FOLDER"], "test_file.xlsx"
-        )
+        test_file_path = os.path.join(self.app.config["LOAD_FOLDER"], "test_file.xlsx")
         with open(test_file_path, "rb") as test_file:
             data["file"] = (test_file, "test_file.xlsx")
             response = self.client.post(
@@ -158,6 +163,73 @@ class FlaskAppTests(unittest.TestCase):
 
         # TODO: #9 Fix the above unit test, expected columns not working correctly
 
+    def test_process_without_upload(self):
+        """
+        Test processing without an uploaded file in the session redirects back to
+        the upload page instead of failing.
+        """
+        client = self.app.test_client()
+        data = {"start_row": 1, "service_line": "Assurance"}
+        response = client.post("/process", data=data)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith("/load"))
+
+    def test_job_status_unknown(self):
+        """
+        Test the job status endpoint returns 404 for an unknown job ID.
+        """
+        response = self.client.get("/jobs/unknown/status")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {"error": "job not found"})
+
+    def test_processed_data_page(self):
+        """
+        Test the processed data endpoint serves a page of a stored frame and
+        returns 404 for an unknown one.
+        """
+        frame_path = save_processed_frame(
+            pd.DataFrame({"engagement_id": [str(i) for i in range(30)]}),
+            self.app.config["LOAD_FOLDER"],
+            "processed_data_test",
+        )
+        self.addCleanup(os.remove, frame_path)
+        response = self.client.get(
+            "/data/processed/processed_data_test?offset=20&limit=20&sort=engagement_id"
+        )
+        self.assertEqual(response.status_code, 200)
+        page = response.get_json()
+        self.assertEqual(page["total"], 30)
+        self.assertEqual(len(page["rows"]), 10)
+
+        response = self.client.get("/data/processed/unknown")
+        self.assertEqual(response.status_code, 404)
+
+    def test_api_engagements_invalid_arguments(self):
+        """
+        Test unknown fields and malformed cursors are rejected before querying.
+        """
+        response = self.client.get("/api/engagements?fields=engagement_id,unknown")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {"error": "Unknown fields: unknown"})
+        response = self.client.get("/api/engagements?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+    def test_metrics(self):
+        """
+        Test /metrics serves the Prometheus text format with the latency of
+        earlier requests labelled by route pattern.
+        """
+        self.client.get("/jobs/unknown/status")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        body = response.get_data(as_text=True)
+        self.assertIn("# TYPE pipeline_stage_duration_seconds histogram", body)
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="/jobs/<job_id>/status",status="404"}',
+            body,
+        )
+
     def test_404_error(self):
         """
         Test a non-existent route to ensure it returns a 404 status code and contains
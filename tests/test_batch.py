@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import pandas as pd
+from utils.batch import (
+    DONE,
+    FAILED,
+    find_engagement_lists,
+    list_timestamp,
+    load_checkpoint,
+    load_processed,
+    run_batch,
+)
+from utils.synthetic import generate_engagements, write_engagement_list
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.files = [
+            write_engagement_list(
+                generate_engagements(50, seed=week),
+                self.folder,
+                "csv",
+                f"2024050{week} Engagement List",
+            )
+            for week in (1, 2)
+        ]
+        self.checkpoint_path = os.path.join(self.folder, "checkpoint.json")
+
+    def test_find_engagement_lists(self):
+        """
+        Test a directory with a pattern and a glob find the same files in order.
+        """
+        self.assertEqual(find_engagement_lists(self.folder, "*.csv"), self.files)
+        self.assertEqual(
+            find_engagement_lists(os.path.join(self.folder, "*List.csv")), self.files
+        )
+
+    @patch("utils.batch.load_processed", return_value=True)
+    def test_run_batch_resumes(self, mock_load_processed):
+        """
+        Test files are loaded in order and checkpointed, a rerun skips them,
+        and a file whose contents changed is processed again.
+        """
+        results = run_batch(self.files, self.checkpoint_path, workers=0)
+
+        self.assertEqual([entry["status"] for entry in results.values()], [DONE, DONE])
+        self.assertEqual(mock_load_processed.call_count, 2)
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        self.assertEqual(checkpoint[os.path.abspath(self.files[0])]["status"], DONE)
+
+        run_batch(self.files, self.checkpoint_path, workers=0)
+        self.assertEqual(mock_load_processed.call_count, 2)
+
+        replacement = generate_engagements(60, seed=3)
+        write_engagement_list(
+            replacement, self.folder, "csv", "20240502 Engagement List"
+        )
+        run_batch(self.files, self.checkpoint_path, workers=0)
+        self.assertEqual(mock_load_processed.call_count, 3)
+        self.assertEqual(
+            len(mock_load_processed.call_args[0][0]),
+            (replacement["Engagement Status"] == "Released").sum(),
+        )
+
+    @patch("utils.batch.load_processed", return_value=True)
+    def test_lists_are_stamped_with_their_own_date(self, mock_load_processed):
+        """
+        Test back-filled lists are loaded as uploads of the dates they were
+        issued, not of the time the batch ran.
+        """
+        run_batch(self.files, self.checkpoint_path, workers=0)
+
+        self.assertEqual(
+            [call[0][3] for call in mock_load_processed.call_args_list],
+            [datetime(2024, 5, 1), datetime(2024, 5, 2)],
+        )
+        undated = os.path.join(self.folder, "list.csv")
+        shutil.copy(self.files[0], undated)
+        df = pd.DataFrame({"report_date": pd.to_datetime(["2024-05-03", None])})
+        self.assertEqual(list_timestamp(undated, df), datetime(2024, 5, 3))
+
+    @patch("utils.batch.load_processed", return_value=True)
+    def test_header_row_is_detected(self, mock_load_processed):
+        """
+        Test a list with rows above its header loads without a start row, and
+        one without the required columns fails.
+        """
+        df = generate_engagements(20, seed=4)
+        preamble = os.path.join(self.folder, "20240503 Engagement List.xlsx")
+        with pd.ExcelWriter(preamble) as writer:
+            pd.DataFrame([["Weekly engagement list"]]).to_excel(
+                writer, index=False, header=False
+            )
+            df.to_excel(writer, index=False, startrow=2)
+        broken = os.path.join(self.folder, "20240504 Engagement List.csv")
+        df.drop(columns="Client").to_csv(broken, index=False)
+
+        results = run_batch([preamble, broken], self.checkpoint_path, workers=0)
+
+        self.assertEqual(results[preamble]["status"], DONE)
+        self.assertEqual(
+            results[preamble]["rows"], (df["Engagement Status"] == "Released").sum()
+        )
+        self.assertEqual(results[broken]["status"], FAILED)
+        self.assertIn("Client", results[broken]["error"])
+
+    @patch("utils.batch.load_etc_history", return_value=0)
+    @patch("utils.batch.load_delta_to_db", return_value={})
+    def test_snapshot_names_ignore_case(self, mock_load_delta, mock_load_history):
+        """
+        Test a service line typed in any case shares the snapshot /process uses.
+        """
+        df = pd.DataFrame({"engagement_partner_service_line": ["Consulting"]})
+
+        load_processed(
+            df, "consulting", "test_table", datetime(2024, 5, 1), "u", "snaps", None
+        )
+
+        self.assertEqual(mock_load_delta.call_args[0][5], "test_table_Consulting")
+        self.assertIsNone(mock_load_delta.call_args[1]["label"])
+
+    @patch("utils.batch.load_etc_history", return_value=0)
+    @patch("utils.batch.load_delta_to_db", return_value={})
+    def test_all_lines_are_labelled(self, mock_load_delta, mock_load_history):
+        """
+        Test each service line's load messages are labelled with the line.
+        """
+        df = pd.DataFrame({"engagement_partner_service_line": ["Consulting", "Tax"]})
+
+        load_processed(
+            df, "All", "test_table", datetime(2024, 5, 1), "u", "snaps", None
+        )
+
+        labels = {
+            call[0][5]: call[1]["label"] for call in mock_load_delta.call_args_list
+        }
+        self.assertEqual(labels["test_table_Consulting"], "Consulting")
+        self.assertEqual(labels["test_table_Tax"], "Tax")
+
+    @patch("utils.batch.load_processed", side_effect=[False, True, True])
+    def test_failed_load_is_retried(self, mock_load_processed):
+        """
+        Test a file whose load failed is not checkpointed as done and is
+        loaded again on the next run.
+        """
+        results = run_batch(self.files, self.checkpoint_path, workers=0)
+        self.assertEqual(results[self.files[0]]["status"], FAILED)
+        self.assertEqual(results[self.files[1]]["status"], DONE)
+
+        results = run_batch(self.files, self.checkpoint_path, workers=0)
+        self.assertEqual(results[self.files[0]]["status"], DONE)
+        self.assertEqual(mock_load_processed.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
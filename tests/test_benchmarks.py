@@ -0,0 +1,29 @@
+import unittest
+from benchmarks.run import compare_to_baseline
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_compare_to_baseline(self):
+        """
+        Test stages beyond the tolerance and noise floor are reported, and
+        stages without a baseline are not.
+        """
+        baseline = {
+            "read": {"seconds": 1.0, "peak_mb": 100},
+            "export_xlsx": {"seconds": 0.01, "peak_mb": 1},
+        }
+        results = {
+            "read": {"seconds": 1.5, "peak_mb": 110},
+            "export_xlsx": {"seconds": 0.05, "peak_mb": 15},
+            "db_load_sqlite": {"seconds": 10, "peak_mb": 500},
+        }
+
+        regressions = compare_to_baseline(results, baseline, tolerance=0.25)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("read: seconds 1.50"))
+
+
+if __name__ == "__main__":
+    unittest.main()
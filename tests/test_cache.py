@@ -0,0 +1,234 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from utils.cache import (
+    cache_upload,
+    find_header_row,
+    file_hash,
+    read_cached_upload,
+    save_upload,
+    scan_header,
+    write_frame,
+    read_frame,
+)
+from utils.dataLoadFunction import KEEP_COLS, process_engagement_data
+
+
+class TestUploadCache(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Write an engagement list with a title row above the header.
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, "engagements.xlsx")
+        df = pd.DataFrame(
+            {
+                "Engagement ID": [1, 2, 3],
+                "Creation Date": pd.to_datetime(
+                    ["2024-05-10", "2024-05-11", "2024-05-12"]
+                ),
+                "Release Date": pd.to_datetime(
+                    ["2024-06-10", "2024-06-11", "2024-06-12"]
+                ),
+                "Last Time Charged Date": pd.to_datetime(
+                    ["2024-06-01", "2024-06-02", "2024-06-03"]
+                ),
+                "Last Expenses Charged Date": pd.to_datetime(
+                    ["2024-05-30", "2024-05-31", "2024-06-01"]
+                ),
+                "Last Active ETC-P Date": pd.to_datetime(
+                    ["2024-05-15", None, "2024-05-17"]
+                ),
+                "Engagement": ["Eng1", "Eng2", "Eng3"],
+                "Client": ["Client1", "Client2", "Client3"],
+                "Engagement Partner": ["P1", "P2", "P3"],
+                "Engagement Partner GUI": [101, 102, 103],
+                "Engagement Manager": ["M1", "M2", "M3"],
+                "Engagement Manager GUI": [201, 202, 203],
+                "Engagement Partner Service Line": ["Consulting", "Tax", "Consulting"],
+                "Engagement Status": ["Released", "Released", "Released"],
+            }
+        )
+        with pd.ExcelWriter(self.file_path) as writer:
+            pd.DataFrame([["Engagement List"]]).to_excel(
+                writer, index=False, header=False
+            )
+            df.to_excel(writer, index=False, startrow=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cache_upload_detects_header_and_writes_parquet(self):
+        """
+        Test the upload is parsed once into a Parquet file next to it.
+        """
+        header_row = cache_upload(self.file_path, required_cols=KEEP_COLS)
+
+        self.assertEqual(header_row, 1)
+        cached = [f for f in os.listdir(self.temp_dir) if f.endswith(".parquet")]
+        self.assertEqual(len(cached), 1)
+
+        df_preview = read_cached_upload(self.file_path, header_row, nrows=2)
+        self.assertEqual(len(df_preview), 2)
+        self.assertEqual(list(df_preview.columns), KEEP_COLS)
+
+    def test_cache_hit_skips_parse(self):
+        """
+        Test caching the same content a second time does not parse the workbook.
+        """
+        cache_upload(self.file_path, required_cols=KEEP_COLS)
+        copy_path = os.path.join(self.temp_dir, "copy.xlsx")
+        shutil.copy(self.file_path, copy_path)
+
+        with patch("utils.cache.pd.read_excel") as mock_read_excel:
+            header_row = cache_upload(copy_path, required_cols=KEEP_COLS)
+
+        mock_read_excel.assert_not_called()
+        self.assertEqual(header_row, 1)
+
+    def test_known_hash_skips_rehash(self):
+        """
+        Test a hash from save_upload is reused instead of reading the file again.
+        """
+        content_hash = file_hash(self.file_path)
+
+        with patch("utils.cache.file_hash") as mock_file_hash:
+            header_row = cache_upload(
+                self.file_path, required_cols=KEEP_COLS, content_hash=content_hash
+            )
+            df_cached = read_cached_upload(
+                self.file_path, header_row, content_hash=content_hash
+            )
+
+        mock_file_hash.assert_not_called()
+        self.assertEqual(list(df_cached.columns), KEEP_COLS)
+
+    def test_known_header_row_skips_scan(self):
+        """
+        Test a header row from scan_header is used instead of scanning again.
+        """
+        header_row, _ = scan_header(self.file_path, KEEP_COLS)
+
+        with patch("utils.cache.find_header_row") as mock_find_header_row:
+            cached_row = cache_upload(
+                self.file_path, required_cols=KEEP_COLS, header_row=header_row
+            )
+
+        mock_find_header_row.assert_not_called()
+        self.assertEqual(cached_row, 1)
+        self.assertEqual(list(read_cached_upload(self.file_path, 1).columns), KEEP_COLS)
+
+    def test_uncached_start_row(self):
+        """
+        Test a start_row the upload was not cached with is a cache miss.
+        """
+        cache_upload(self.file_path, required_cols=KEEP_COLS)
+
+        self.assertIsNone(read_cached_upload(self.file_path, 0))
+
+    def test_process_from_cache_matches_workbook(self):
+        """
+        Test processing the cached copy gives the same result as the workbook.
+        """
+        header_row = cache_upload(self.file_path, required_cols=KEEP_COLS)
+
+        with patch("utils.dataLoadFunction.pd.read_excel") as mock_read_excel:
+            df_cached = process_engagement_data(
+                self.file_path, start_row=header_row, use_cache=True
+            )
+        mock_read_excel.assert_not_called()
+
+        df_workbook = process_engagement_data(self.file_path, start_row=header_row)
+        pd.testing.assert_frame_equal(df_cached, df_workbook, check_dtype=False)
+
+    def test_mixed_column_falls_back_to_pickle(self):
+        """
+        Test a frame Parquet cannot store is written as a pickle instead.
+        """
+        df = pd.DataFrame({"mixed": [1, "a", 2.5]})
+
+        path = write_frame(df, os.path.join(self.temp_dir, "mixed"))
+
+        self.assertTrue(path.endswith(".pkl"))
+        pd.testing.assert_frame_equal(read_frame(path), df)
+
+    def test_feather_columns_read_schema_only(self):
+        """
+        Test a Feather frame's columns are checked without reading its data.
+        """
+        df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+        path = os.path.join(self.temp_dir, "frame.feather")
+        df.to_feather(path)
+
+        with patch("pyarrow.feather.read_table") as mock_read_table:
+            self.assertEqual(scan_header(path, ["a", "c"]), (0, ["c"]))
+        mock_read_table.assert_not_called()
+        pd.testing.assert_frame_equal(read_frame(path, columns=["b", "c"]), df[["b"]])
+
+    def test_find_header_row_default(self):
+        """
+        Test row 0 is used when no row contains the required columns.
+        """
+        df_grid = pd.DataFrame([["a", "b"], ["c", "d"]])
+
+        self.assertEqual(find_header_row(df_grid, ["Engagement ID"]), 0)
+
+    def test_find_header_row_most_columns(self):
+        """
+        Test the row holding the most required columns is used, as scan_header
+        reports it.
+        """
+        df_grid = pd.DataFrame([["a", "b"], ["Engagement ID", "c"]])
+
+        self.assertEqual(find_header_row(df_grid, ["Engagement ID", "Client"]), 1)
+
+    def test_scan_header_finds_row(self):
+        """
+        Test the header row is found without parsing the workbook.
+        """
+        with patch("utils.cache.pd.read_excel") as mock_read_excel:
+            header_row, missing = scan_header(self.file_path, KEEP_COLS)
+
+        mock_read_excel.assert_not_called()
+        self.assertEqual(header_row, 1)
+        self.assertEqual(missing, [])
+
+    def test_scan_header_reports_missing(self):
+        """
+        Test a wrong start row or a missing column is reported.
+        """
+        _, missing = scan_header(self.file_path, KEEP_COLS, start_row=0)
+        self.assertEqual(missing, KEEP_COLS)
+
+        header_row, missing = scan_header(self.file_path, KEEP_COLS + ["Missing"])
+        self.assertEqual(header_row, 1)
+        self.assertEqual(missing, ["Missing"])
+
+    def test_scan_header_csv(self):
+        """
+        Test the header row of a CSV with a title line is found.
+        """
+        csv_path = os.path.join(self.temp_dir, "engagements.csv")
+        with open(csv_path, "w") as f:
+            f.write("Engagement List\nEngagement ID,Client\n1,Client1\n")
+
+        self.assertEqual(scan_header(csv_path, ["Engagement ID", "Client"]), (1, []))
+
+    def test_save_upload_hashes_contents(self):
+        """
+        Test the streamed copy matches the upload and its hash.
+        """
+        copy_path = os.path.join(self.temp_dir, "copy.xlsx")
+        with open(self.file_path, "rb") as f:
+            content_hash = save_upload(f, copy_path, chunk_size=1024)
+
+        self.assertEqual(content_hash, file_hash(self.file_path))
+        self.assertEqual(file_hash(copy_path), content_hash)
+
+
+if __name__ == "__main__":
+    unittest.main()
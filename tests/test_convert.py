@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from utils.convert import convert_archive, convert_to_parquet
+from utils.dataLoadFunction import KEEP_COLS
+
+
+class TestConvertArchive(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Write two weekly lists with a title row above the header.
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.temp_dir, "parquet")
+        for week in ("20240503", "20240510"):
+            df = pd.DataFrame({col: [f"{col} {week}"] * 2 for col in KEEP_COLS})
+            # A column mixing numbers and text, as in real engagement lists
+            df["Engagement ID"] = [12345, "E-1"]
+            with pd.ExcelWriter(
+                os.path.join(self.temp_dir, f"{week} Engagement List.xlsx")
+            ) as writer:
+                pd.DataFrame([["Engagement List"]]).to_excel(
+                    writer, index=False, header=False
+                )
+                df.to_excel(writer, index=False, startrow=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_convert_archive(self):
+        """
+        Test every workbook is converted with its header row detected.
+        """
+        paths = convert_archive(self.temp_dir, self.output_dir)
+
+        self.assertEqual(
+            [os.path.basename(path) for path in paths],
+            ["20240503 Engagement List.parquet", "20240510 Engagement List.parquet"],
+        )
+        df = pd.read_parquet(paths[0])
+        self.assertEqual(list(df.columns), KEEP_COLS)
+        self.assertEqual(df["Client"].iloc[0], "Client 20240503")
+        self.assertEqual(df["Engagement ID"].tolist(), ["12345", "E-1"])
+
+    def test_up_to_date_output_is_skipped(self):
+        """
+        Test a source older than its Parquet file is not converted again.
+        """
+        source = os.path.join(self.temp_dir, "20240503 Engagement List.xlsx")
+        output_path = convert_to_parquet(source, self.output_dir)
+        modified = os.path.getmtime(output_path)
+
+        convert_to_parquet(source, self.output_dir)
+
+        self.assertEqual(os.path.getmtime(output_path), modified)
+
+
+if __name__ == "__main__":
+    unittest.main()
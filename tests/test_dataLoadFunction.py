@@ -1,11 +1,28 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch
 import pandas as pd
-from utils.dataLoadFunction import process_engagement_data
+from utils.dataLoadFunction import (
+    compact_frame,
+    memory_report,
+    parse_date_columns,
+    process_engagement_data,
+    read_engagement_rows,
+    split_by_service_line,
+)
 
 
 class TestProcessEngagementData(unittest.TestCase):
 
+    def setUp(self):
+        """
+        The header check opens the file, which these tests only mock.
+        """
+        patcher = patch("utils.dataLoadFunction.scan_header", return_value=(0, []))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch("utils.dataLoadFunction.os.path.exists")
     @patch("utils.dataLoadFunction.pd.read_excel")
     def test_successful_processing(self, mock_read_excel, mock_path_exists):
@@ -55,6 +72,101 @@ class TestProcessEngagementData(unittest.TestCase):
             ).days,
         )
 
+    @patch("utils.dataLoadFunction.os.path.exists")
+    @patch("utils.dataLoadFunction.pd.read_excel")
+    def test_date_columns_stay_datetime(self, mock_read_excel, mock_path_exists):
+        """
+        Test date columns are returned as datetime64 with NaT for missing
+        values, rather than converted to Python objects.
+        """
+        mock_path_exists.return_value = True
+        mock_read_excel.return_value = pd.DataFrame(
+            {
+                "Engagement ID": [1, 2],
+                "Creation Date": ["2024-05-10", "2024-05-11"],
+                "Release Date": ["2024-06-10", "2024-06-11"],
+                "Last Time Charged Date": ["2024-06-01", "2024-06-02"],
+                "Last Expenses Charged Date": ["2024-05-30", "2024-05-31"],
+                "Last Active ETC-P Date": ["2024-05-15", None],
+                "Engagement": ["Eng1", "Eng2"],
+                "Client": ["Client1", "Client2"],
+                "Engagement Partner": ["Partner1", "Partner2"],
+                "Engagement Partner GUI": [101, 102],
+                "Engagement Manager": ["Manager1", "Manager2"],
+                "Engagement Manager GUI": [201, 202],
+                "Engagement Partner Service Line": ["Consulting", "Consulting"],
+                "Engagement Status": ["Released", "Released"],
+            }
+        )
+
+        df_processed = process_engagement_data("dummy_path.xlsx")
+
+        for col in [
+            "creation_date",
+            "release_date",
+            "last_time_charged_date",
+            "last_expenses_charged_date",
+            "last_active_etc-p_date",
+            "last_etc_date",
+            "report_date",
+        ]:
+            self.assertTrue(
+                pd.api.types.is_datetime64_any_dtype(df_processed[col]), col
+            )
+        self.assertTrue(pd.isna(df_processed["last_active_etc-p_date"].iloc[1]))
+        self.assertEqual(df_processed["etc_age"].tolist(), [18, -9])
+
+    def test_compact_frame(self):
+        """
+        Test repetitive text columns become categoricals, unique ones are left
+        alone and integers are downcast, with the saving shown in the report.
+        """
+        df = pd.DataFrame(
+            {
+                "Engagement Status": ["Released"] * 6,
+                "Client": [f"Client {i}" for i in range(6)],
+                "Engagement": ["Eng"] * 6,
+                "ETC Age": pd.array([1, 2, None, 4, 5, 300], dtype="Int64"),
+            }
+        )
+
+        df_compact = compact_frame(df)
+
+        self.assertIsInstance(
+            df_compact["Engagement Status"].dtype, pd.CategoricalDtype
+        )
+        self.assertNotIsInstance(df_compact["Client"].dtype, pd.CategoricalDtype)
+        # Not in CATEGORY_COLS
+        self.assertNotIsInstance(df_compact["Engagement"].dtype, pd.CategoricalDtype)
+        self.assertEqual(df_compact["ETC Age"].dtype, "Int16")
+        pd.testing.assert_frame_equal(
+            df_compact, df, check_dtype=False, check_categorical=False
+        )
+
+        report = memory_report(df, df_compact)
+        self.assertLess(report.loc["Total", "after"], report.loc["Total", "before"])
+        self.assertGreater(report.loc["ETC Age", "saving"], 0)
+
+    def test_parse_date_columns_explicit_format(self):
+        """
+        Test text dates are parsed together with an explicit format and
+        unparseable values become NaT.
+        """
+        df = pd.DataFrame(
+            {
+                "A": ["10/05/2024", "not a date"],
+                "B": pd.to_datetime(["2024-01-01", None]),
+                "C": ["01/02/2024", None],
+            }
+        )
+
+        df_parsed = parse_date_columns(df, ["A", "B", "C"], date_format="%d/%m/%Y")
+
+        self.assertEqual(df_parsed["A"].iloc[0], pd.Timestamp("2024-05-10"))
+        self.assertTrue(pd.isna(df_parsed["A"].iloc[1]))
+        self.assertEqual(df_parsed["C"].iloc[0], pd.Timestamp("2024-02-01"))
+        pd.testing.assert_series_equal(df_parsed["B"], df["B"])
+
     @patch("utils.dataLoadFunction.os.path.exists")
     @patch("utils.dataLoadFunction.pd.read_excel")
     def test_custom_service_line_filter(self, mock_read_excel, mock_path_exists):
@@ -202,6 +314,155 @@ class TestProcessEngagementData(unittest.TestCase):
         )  # No rows should match the default filter criteria
 
 
+class TestStreamingRead(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Write a small engagement list with two title rows above the header.
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, "engagements.xlsx")
+        df = pd.DataFrame(
+            {
+                "Engagement ID": [1, 2, 3, 4],
+                "Unused": ["a", "b", "c", "d"],
+                "Creation Date": pd.to_datetime(
+                    ["2024-05-10", "2024-05-11", "2024-05-12", "2024-05-13"]
+                ),
+                "Release Date": pd.to_datetime(
+                    ["2024-06-10", "2024-06-11", "2024-06-12", "2024-06-13"]
+                ),
+                "Last Time Charged Date": pd.to_datetime(
+                    ["2024-06-01", "2024-06-02", "2024-06-03", "2024-06-04"]
+                ),
+                "Last Expenses Charged Date": pd.to_datetime(
+                    ["2024-05-30", "2024-05-31", "2024-06-01", "2024-06-02"]
+                ),
+                "Last Active ETC-P Date": pd.to_datetime(
+                    ["2024-05-15", None, "2024-05-17", None]
+                ),
+                "Engagement": ["Eng1", "Eng2", "Eng3", "Eng4"],
+                "Client": ["Client1", "Client2", "Client3", "Client4"],
+                "Engagement Partner": ["P1", "P2", "P3", "P4"],
+                "Engagement Partner GUI": [101, 102, 103, 104],
+                "Engagement Manager": ["M1", "M2", "M3", "M4"],
+                "Engagement Manager GUI": [201, 202, 203, 204],
+                "Engagement Partner Service Line": [
+                    "Consulting",
+                    "consulting",
+                    "Tax",
+                    "Consulting",
+                ],
+                "Engagement Status": ["Released", "Released", "Released", "Closed"],
+            }
+        )
+        with pd.ExcelWriter(self.file_path) as writer:
+            df.to_excel(writer, index=False, startrow=2)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_streaming_matches_full_read(self):
+        """
+        Test the streaming path produces the same output as the pandas path.
+        """
+        df_full = process_engagement_data(self.file_path, start_row=2)
+        df_streamed = process_engagement_data(
+            self.file_path, start_row=2, streaming=True
+        )
+
+        self.assertEqual(df_streamed.shape, (2, 17))
+        self.assertEqual(list(df_streamed["engagement_id"]), [1, 2])
+        pd.testing.assert_frame_equal(df_full, df_streamed, check_dtype=False)
+
+    def test_streaming_reads_only_keep_cols(self):
+        """
+        Test only the requested columns are returned.
+        """
+        df = read_engagement_rows(
+            self.file_path,
+            start_row=2,
+            keep_cols=[
+                "Engagement ID",
+                "Engagement Partner Service Line",
+                "Engagement Status",
+            ],
+            service_line="Tax",
+        )
+
+        self.assertEqual(
+            list(df.columns),
+            [
+                "Engagement ID",
+                "Engagement Partner Service Line",
+                "Engagement Status",
+            ],
+        )
+        self.assertEqual(df["Engagement ID"].tolist(), [3])
+
+    def test_columnar_and_csv_inputs_match_excel(self):
+        """
+        Test Parquet, Feather and CSV copies of the list give the same output.
+        """
+        df_excel = process_engagement_data(self.file_path, start_row=2)
+        df_source = pd.read_excel(self.file_path, skiprows=2)
+
+        parquet_path = os.path.join(self.temp_dir.name, "engagements.parquet")
+        feather_path = os.path.join(self.temp_dir.name, "engagements.feather")
+        csv_path = os.path.join(self.temp_dir.name, "engagements.csv")
+        df_source.to_parquet(parquet_path, index=False)
+        df_source.to_feather(feather_path)
+        df_source.to_csv(csv_path, index=False)
+
+        for path in (parquet_path, feather_path, csv_path):
+            with patch("utils.dataLoadFunction.pd.read_excel") as mock_read_excel:
+                df_processed = process_engagement_data(path, streaming=True)
+            mock_read_excel.assert_not_called()
+            pd.testing.assert_frame_equal(
+                df_processed, df_excel, check_dtype=False, obj=path
+            )
+
+    def test_all_service_lines_single_pass(self):
+        """
+        Test the "All" mode reads once and splits into per-service-line frames
+        matching the single service line runs.
+        """
+        for streaming in (False, True):
+            df_all = process_engagement_data(
+                self.file_path, start_row=2, service_line="All", streaming=streaming
+            )
+            self.assertEqual(len(df_all), 3)
+
+            frames = split_by_service_line(df_all, ["Consulting", "Tax", "SaT"])
+
+            self.assertEqual(list(frames), ["Consulting", "Tax", "SaT"])
+            self.assertEqual(len(frames["Consulting"]), 2)
+            self.assertEqual(frames["Tax"]["engagement_id"].tolist(), [3])
+            self.assertTrue(frames["SaT"].empty)
+            self.assertEqual(list(frames["SaT"].columns), list(df_all.columns))
+
+    def test_missing_column_fails_before_parse(self):
+        """
+        Test a wrong start_row fails from the header check without a full read.
+        """
+        with patch("utils.dataLoadFunction.pd.read_excel") as mock_read_excel:
+            with self.assertRaises(KeyError):
+                process_engagement_data(self.file_path, start_row=0, streaming=False)
+
+        mock_read_excel.assert_not_called()
+
+    def test_streaming_missing_column(self):
+        """
+        Test a missing key column raises a KeyError.
+        """
+        with self.assertRaises(KeyError):
+            read_engagement_rows(
+                self.file_path,
+                start_row=2,
+                keep_cols=["Engagement ID", "Missing Column"],
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -1,8 +1,21 @@
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock, call
 import pandas as pd
+from psycopg2.extensions import adapt
 from datetime import datetime
-from utils.database import create_table_if_not_exists, insert_data, load_data_to_db
+from utils.database import (
+    ENGAGEMENT_COLUMNS,
+    create_table_if_not_exists,
+    ensure_engagement_key,
+    insert_data,
+    bulk_insert_data,
+    load_data_to_db,
+    load_delta_to_db,
+    migrate_table,
+    upsert_data,
+)
 
 
 class TestDatabaseFunctions(unittest.TestCase):
@@ -23,6 +36,86 @@ class TestDatabaseFunctions(unittest.TestCase):
             in mock_cursor.execute.call_args[0][0]
         )
 
+    @patch("utils.database.psycopg2.connect")
+    def test_create_table_dedup_key_and_indexes(self, mock_connect):
+        """
+        Test the table is created with the dedup key and reporting indexes.
+        """
+        mock_connection = mock_connect.return_value
+        mock_cursor = mock_connection.cursor.return_value
+
+        create_table_if_not_exists(mock_connection, "test_table")
+
+        query = mock_cursor.execute.call_args[0][0]
+        self.assertIn("UNIQUE (engagement_id, creation_date)", query)
+        self.assertIn("test_table_upload_timestamp_idx", query)
+        self.assertIn("test_table_status_service_line_idx", query)
+        self.assertIn(
+            "test_table_partner_gui_keyset_idx\n        ON test_table "
+            "(engagement_partner_gui, upload_timestamp, engagement_id, creation_date)",
+            query,
+        )
+        self.assertNotIn("PARTITION BY", query)
+
+    @patch("utils.database.psycopg2.connect")
+    def test_create_table_partitioned(self, mock_connect):
+        """
+        Test the partitioned table has a default partition and no unique key.
+        """
+        mock_connection = mock_connect.return_value
+        mock_cursor = mock_connection.cursor.return_value
+
+        create_table_if_not_exists(mock_connection, "test_table", partitioned=True)
+
+        query = mock_cursor.execute.call_args[0][0]
+        self.assertIn("PARTITION BY RANGE (upload_timestamp)", query)
+        self.assertIn("test_table_default", query)
+        self.assertNotIn("UNIQUE", query)
+
+    @patch("utils.database.psycopg2.connect")
+    def test_migrate_table(self, mock_connect):
+        """
+        Test migrating an existing table removes duplicates and adds the key.
+        """
+        mock_connection = mock_connect.return_value
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.rowcount = 3
+
+        rows_removed = migrate_table(mock_connection, "test_table")
+
+        self.assertEqual(rows_removed, 3)
+        queries = [c[0][0] for c in mock_cursor.execute.call_args_list]
+        self.assertIn("DELETE FROM test_table", queries[1])
+        self.assertIn("ADD CONSTRAINT test_table_engagement_key", queries[2])
+        mock_connection.commit.assert_called_once()
+
+    @patch("utils.database.migrate_table")
+    def test_ensure_engagement_key(self, mock_migrate_table):
+        """
+        Test a table without the dedup key is migrated and one with it is not.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+
+        mock_cursor.fetchone.return_value = (1,)
+        self.assertFalse(ensure_engagement_key(mock_connection, "test_table"))
+        mock_migrate_table.assert_not_called()
+        self.assertEqual(
+            mock_cursor.execute.call_args[0][1],
+            ("test_table", "test_table_engagement_key"),
+        )
+
+        mock_cursor.fetchone.return_value = None
+        self.assertTrue(ensure_engagement_key(mock_connection, "test_table"))
+        mock_migrate_table.assert_called_once_with(mock_connection, "test_table")
+
+    def test_missing_values_adapt_to_null(self):
+        """
+        Test NaT and <NA> from typed columns are sent to Postgres as NULL.
+        """
+        self.assertEqual(adapt(pd.NaT).getquoted(), b"NULL")
+        self.assertEqual(adapt(pd.NA).getquoted(), b"NULL")
+
     @patch("utils.database.psycopg2.connect")
     def test_insert_data(self, mock_connect):
         """
@@ -63,17 +156,79 @@ class TestDatabaseFunctions(unittest.TestCase):
         self.assertEqual(mock_cursor.execute.call_count, len(df))
 
     @patch("utils.database.psycopg2.connect")
+    def test_bulk_insert_data(self, mock_connect):
+        """
+        Test bulk loading data through COPY and a single set-based merge.
+        """
+        mock_connection = mock_connect.return_value
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.rowcount = 1
+
+        # Create a sample DataFrame
+        data = {
+            "engagement_id": ["1", "2"],
+            "creation_date": [datetime(2024, 5, 10), datetime(2024, 5, 11)],
+            "release_date": [datetime(2024, 6, 10), datetime(2024, 6, 11)],
+            "last_time_charged_date": [datetime(2024, 6, 1), datetime(2024, 6, 2)],
+            "last_expenses_charged_date": [
+                datetime(2024, 5, 30),
+                datetime(2024, 5, 31),
+            ],
+            "last_active_etcp_date": [datetime(2024, 5, 15), None],
+            "engagement": ["Eng1", "Eng2"],
+            "client": ["Client1", "Client2"],
+            "engagement_partner": ["Partner1", "Partner2"],
+            "engagement_partner_gui": ["101", "102"],
+            "engagement_manager": ["Manager1", "Manager2"],
+            "engagement_manager_gui": ["201", "202"],
+            "engagement_partner_service_line": ["Consulting", "Advisory"],
+            "engagement_status": ["Released", "Released"],
+            "last_etc_date": [datetime(2024, 5, 15), datetime(2024, 6, 11)],
+            "report_date": [datetime(2024, 6, 1), datetime(2024, 6, 2)],
+            "etc_age": [10, 10],
+        }
+        df = pd.DataFrame(data)
+
+        result = bulk_insert_data(
+            mock_connection, df, "test_table", datetime(2024, 6, 10), "test_user"
+        )
+
+        self.assertEqual(result, (1, 1))
+        mock_cursor.copy_expert.assert_called_once()
+        copy_sql, buffer = mock_cursor.copy_expert.call_args[0]
+        self.assertIn("COPY test_table_staging", copy_sql)
+        lines = buffer.getvalue().splitlines()
+        self.assertEqual(len(lines), len(df))
+        # NaT/None dates are written as empty fields so COPY loads them as NULL
+        self.assertEqual(lines[1].split(",")[5], "")
+        self.assertTrue(lines[0].endswith(",10,2024-06-10 00:00:00,test_user"))
+        # One statement to create the staging table and one to merge
+        self.assertEqual(mock_cursor.execute.call_count, 2)
+        self.assertIn(
+            "ON CONFLICT (engagement_id, creation_date) DO NOTHING",
+            mock_cursor.execute.call_args[0][0],
+        )
+        mock_connection.commit.assert_called_once()
+
+    @patch("utils.database.get_pool")
     @patch("utils.database.create_table_if_not_exists")
-    @patch("utils.database.insert_data")
+    @patch("utils.database.write_upload_summary")
+    @patch("utils.database.bulk_insert_data")
     @patch("utils.database.flash")
     def test_load_data_to_db(
-        self, mock_flash, mock_insert_data, mock_create_table, mock_connect
+        self,
+        mock_flash,
+        mock_bulk_insert_data,
+        mock_write_upload_summary,
+        mock_create_table,
+        mock_get_pool,
     ):
         """
-        Test loading data to the database.
+        Test loading data to the database through the shared connection pool.
         """
-        mock_connection = mock_connect.return_value
-        mock_insert_data.return_value = None
+        mock_pool = mock_get_pool.return_value
+        mock_connection = mock_pool.connection.return_value.__enter__.return_value
+        mock_bulk_insert_data.return_value = (2, 0)
         mock_create_table.return_value = None
 
         # Create a sample DataFrame
@@ -101,19 +256,156 @@ class TestDatabaseFunctions(unittest.TestCase):
         }
         df = pd.DataFrame(data)
 
-        load_data_to_db(df, "test_table", datetime(2024, 6, 10), "test_user")
+        result = load_data_to_db(df, "test_table", datetime(2024, 6, 10), "test_user")
 
+        self.assertEqual(result, (2, 0))
         mock_create_table.assert_called_once_with(mock_connection, "test_table")
+        mock_bulk_insert_data.assert_called_once_with(
+            mock_connection,
+            df,
+            "test_table",
+            datetime(2024, 6, 10),
+            "test_user",
+            partitioned=False,
+        )
+        mock_write_upload_summary.assert_called_once_with(
+            mock_connection, "test_table", df, datetime(2024, 6, 10)
+        )
+        # The connection goes back to the pool rather than being closed
+        mock_pool.connection.return_value.__exit__.assert_called_once()
+        mock_connection.close.assert_not_called()
+        mock_flash.assert_called_once_with(
+            "Data loaded into the database successfully. "
+            "Rows inserted: 2, rows skipped: 0.",
+            "success",
+        )
+
+    @patch("utils.database.get_pool")
+    @patch("utils.database.create_table_if_not_exists")
+    @patch("utils.database.write_upload_summary")
+    @patch("utils.database.insert_data")
+    @patch("utils.database.flash")
+    def test_load_data_to_db_row_by_row(
+        self,
+        mock_flash,
+        mock_insert_data,
+        mock_write_upload_summary,
+        mock_create_table,
+        mock_get_pool,
+    ):
+        """
+        Test loading data to the database with the row-by-row fallback.
+        """
+        mock_pool = mock_get_pool.return_value
+        mock_connection = mock_pool.connection.return_value.__enter__.return_value
+        df = pd.DataFrame({"engagement_id": ["1", "2"]})
+
+        load_data_to_db(
+            df, "test_table", datetime(2024, 6, 10), "test_user", bulk=False
+        )
+
         mock_insert_data.assert_called_once_with(
             mock_connection, df, "test_table", datetime(2024, 6, 10), "test_user"
         )
-        mock_connection.close.assert_called_once()
-        mock_flash.assert_called_once_with(
-            "Data loaded into the database successfully.", "success"
+
+    @patch("utils.database.psycopg2.connect")
+    def test_upsert_data(self, mock_connect):
+        """
+        Test existing rows are updated rather than skipped, and inserts and
+        updates are counted separately.
+        """
+        mock_connection = mock_connect.return_value
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.fetchall.return_value = [(True,), (False,)]
+        df = pd.DataFrame(
+            {col: [None, None] for col in ENGAGEMENT_COLUMNS[:17]}
+        ).assign(engagement_id=["1", "2"], creation_date=datetime(2024, 5, 10))
+
+        result = upsert_data(
+            mock_connection, df, "test_table", datetime(2024, 6, 10), "test_user"
+        )
+
+        self.assertEqual(result, (1, 1))
+        query = mock_cursor.execute.call_args[0][0]
+        self.assertIn("ON CONFLICT (engagement_id, creation_date) DO UPDATE", query)
+        self.assertIn("last_etc_date = EXCLUDED.last_etc_date", query)
+        mock_connection.commit.assert_not_called()
+
+    @patch("utils.database.get_pool")
+    @patch("utils.database.create_table_if_not_exists")
+    @patch("utils.database.create_change_table_if_not_exists")
+    @patch("utils.database.write_upload_summary")
+    @patch("utils.database.record_changes")
+    @patch("utils.database.upsert_data", return_value=(1, 0))
+    def test_load_delta_to_db(
+        self,
+        mock_upsert_data,
+        mock_record_changes,
+        mock_write_upload_summary,
+        mock_create_change_table,
+        mock_create_table,
+        mock_get_pool,
+    ):
+        """
+        Test a repeated upload writes nothing, and the snapshot only advances
+        when the load succeeds.
+        """
+        snapshot_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_folder)
+        mock_connection = (
+            mock_get_pool.return_value.connection.return_value.__enter__.return_value
+        )
+        messages = []
+        df = pd.DataFrame(
+            {
+                "engagement_id": ["1", "2"],
+                "creation_date": [datetime(2024, 5, 10)] * 2,
+                "last_etc_date": [datetime(2024, 5, 15), datetime(2024, 5, 16)],
+            }
+        )
+
+        def load(frame):
+            return load_delta_to_db(
+                frame,
+                "test_table",
+                datetime(2024, 6, 10),
+                "test_user",
+                snapshot_folder,
+                "test_table_Consulting",
+                notify=lambda message, category: messages.append(category),
+            )
+
+        self.assertEqual(load(df)["added"], 2)
+        self.assertEqual(len(mock_upsert_data.call_args[0][1]), 2)
+        mock_connection.commit.assert_called_once()
+
+        mock_upsert_data.reset_mock()
+        self.assertEqual(load(df)["unchanged"], 2)
+        mock_upsert_data.assert_not_called()
+
+        changed = df.assign(last_etc_date=datetime(2024, 6, 1))
+        mock_record_changes.side_effect = Exception("Database error")
+        self.assertIsNone(load(changed))
+        mock_record_changes.side_effect = None
+        self.assertEqual(load(changed)["changed"], 2)
+        self.assertEqual(messages, ["success", "success", "danger", "success"])
+
+        # Loads of one upload per service line say which line they were for
+        texts = []
+        load_delta_to_db(
+            df,
+            "test_table",
+            datetime(2024, 6, 11),
+            "test_user",
+            snapshot_folder,
+            "test_table_Tax",
+            notify=lambda message, category: texts.append(message),
+            label="Tax",
         )
+        self.assertTrue(texts[0].startswith("Tax: Data loaded"))
 
 
 if __name__ == "__main__":
     unittest.main()
 
-# to run: python -m unittest discover -s tests -p "test_database_utils.py"
\ No newline at end of file
+# to run: python -m unittest discover -s tests -p "test_database_utils.py"
@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+from utils.dataLoadFunction import ALL_SERVICE_LINES, process_engagement_data
+from utils.delta import (
+    compute_delta,
+    delta_counts,
+    load_snapshot,
+    row_hashes,
+    save_snapshot,
+)
+from utils.synthetic import generate_engagements, write_engagement_list
+
+
+class TestDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.previous = pd.DataFrame(
+            {
+                "engagement_id": ["1", "2", "3"],
+                "creation_date": [datetime(2024, 5, 10)] * 3,
+                "client": ["Client1", "Client2", "Client3"],
+                "last_etc_date": [datetime(2024, 5, 15), None, datetime(2024, 5, 17)],
+                "report_date": [datetime(2024, 6, 1)] * 3,
+                "etc_age": pd.array([17, None, 15], dtype="Int64"),
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_first_load_adds_everything(self):
+        """
+        Test every row is new when there is no snapshot.
+        """
+        rows, change_feed, snapshot = compute_delta(self.previous)
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(change_feed["change_type"].tolist(), ["added"] * 3)
+        self.assertIn("row_hash", snapshot.columns)
+
+    def test_added_changed_and_removed(self):
+        """
+        Test only new and changed rows are written and the change feed names
+        the changed fields.
+        """
+        current = self.previous.iloc[1:].copy()
+        current.loc[1, "last_etc_date"] = datetime(2024, 6, 3)
+        current = pd.concat(
+            [current, self.previous.iloc[[0]].assign(engagement_id="4")],
+            ignore_index=True,
+        )
+        # A new report date on its own is not a change
+        current["report_date"] = datetime(2024, 6, 8)
+        current["etc_age"] = pd.array([5, 22, 24], dtype="Int64")
+
+        _, _, snapshot = compute_delta(self.previous)
+        rows, change_feed, _ = compute_delta(current, snapshot)
+
+        self.assertEqual(sorted(rows["engagement_id"]), ["2", "4"])
+        self.assertEqual(list(rows.columns), list(current.columns))
+        changes = change_feed.set_index("engagement_id")
+        self.assertEqual(changes.loc["1", "change_type"], "removed")
+        self.assertEqual(changes.loc["2", "change_type"], "changed")
+        self.assertEqual(changes.loc["2", "changed_fields"], "last_etc_date")
+        # Changed fields can be recorded under the database column names
+        _, renamed_feed, _ = compute_delta(
+            current, snapshot, column_names={"last_etc_date": "last_etcp_date"}
+        )
+        self.assertIn("last_etcp_date", renamed_feed["changed_fields"].tolist())
+        self.assertEqual(changes.loc["4", "change_type"], "added")
+        self.assertNotIn("3", changes.index)
+        self.assertEqual(
+            delta_counts(change_feed, len(current)),
+            {"added": 1, "changed": 1, "removed": 1, "unchanged": 1},
+        )
+
+    def test_snapshot_round_trip_is_unchanged(self):
+        """
+        Test a saved snapshot compares equal to a compacted copy of the same
+        upload.
+        """
+        _, _, snapshot = compute_delta(self.previous)
+        save_snapshot(snapshot, self.temp_dir, "engagement_data_Consulting")
+
+        current = self.previous.astype({"client": "category"})
+        rows, change_feed, _ = compute_delta(
+            current, load_snapshot(self.temp_dir, "engagement_data_Consulting")
+        )
+
+        self.assertTrue(rows.empty)
+        self.assertTrue(change_feed.empty)
+        self.assertIsNone(load_snapshot(self.temp_dir, "engagement_data_Tax"))
+
+    def test_hashes_do_not_depend_on_the_reader(self):
+        """
+        Test the same list read by the streaming reader, pd.read_excel and
+        read_csv hashes the same, although GUI columns come back as text from
+        one and integers from the others.
+        """
+        df = generate_engagements(50)
+        frames = [
+            process_engagement_data(
+                write_engagement_list(df, self.temp_dir, extension, "list"),
+                service_line=ALL_SERVICE_LINES,
+                streaming=streaming,
+                verbose=False,
+            )
+            for extension, streaming in [
+                ("xlsx", True),
+                ("xlsx", False),
+                ("csv", False),
+            ]
+        ]
+
+        hashes = [row_hashes(frame).tolist() for frame in frames]
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertEqual(hashes[0], hashes[2])
+        _, _, snapshot = compute_delta(frames[0])
+        for frame in frames[1:]:
+            _, change_feed, _ = compute_delta(frame, snapshot)
+            self.assertTrue(change_feed.empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from utils.export import (
+    ensure_export,
+    save_processed_frame,
+    split_export_name,
+    write_export,
+)
+from utils.metrics import stage
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.df = pd.DataFrame(
+            {
+                "engagement_id": ["1", "2", "3"],
+                "last_etc_date": pd.to_datetime(["2024-05-15", None, "2024-05-17"]),
+                "engagement_status": pd.Categorical(["Released"] * 3),
+                "etc_age": pd.array([10, None, 8], dtype="Int16"),
+            }
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_split_export_name(self):
+        """
+        Test compound extensions are matched before their suffixes.
+        """
+        self.assertEqual(
+            split_export_name("processed_data_1.csv.gz"), ("processed_data_1", "csv.gz")
+        )
+        self.assertEqual(
+            split_export_name("processed_data_1.csv"), ("processed_data_1", "csv")
+        )
+        self.assertEqual(split_export_name("app.log"), ("app.log", None))
+
+    def test_formats_round_trip(self):
+        """
+        Test every export format can be read back with the same rows.
+        """
+        readers = {
+            "xlsx": pd.read_excel,
+            "csv": pd.read_csv,
+            "csv.gz": pd.read_csv,
+            "parquet": pd.read_parquet,
+        }
+        for fmt, reader in readers.items():
+            path = os.path.join(self.temp_dir, f"export.{fmt}")
+            write_export(self.df, path, fmt)
+            df_read = reader(path)
+            self.assertEqual(df_read.shape, self.df.shape, fmt)
+            self.assertEqual(df_read["etc_age"].isna().sum(), 1, fmt)
+
+        with open(os.path.join(self.temp_dir, "export.csv.gz"), "rb") as f:
+            self.assertEqual(f.read(2), b"\x1f\x8b")
+
+    def test_xlsx_without_xlsxwriter(self):
+        """
+        Test xlsx falls back to an openpyxl write-only workbook.
+        """
+        path = os.path.join(self.temp_dir, "export.xlsx")
+        with patch.dict(sys.modules, {"xlsxwriter": None}):
+            write_export(self.df, path, "xlsx")
+
+        df_read = pd.read_excel(path)
+        self.assertEqual(df_read["engagement_id"].tolist(), [1, 2, 3])
+        self.assertTrue(pd.isna(df_read["last_etc_date"].iloc[1]))
+
+    def test_export_generated_once_on_demand(self):
+        """
+        Test nothing is exported until the download is requested, and the
+        export is then reused.
+        """
+        with patch("utils.export.stage", wraps=stage) as mock_stage:
+            save_processed_frame(self.df, self.temp_dir, "processed_data_1")
+            self.assertFalse(
+                os.path.exists(os.path.join(self.temp_dir, "processed_data_1.csv"))
+            )
+
+            with patch("utils.export.write_export", wraps=write_export) as mock_write:
+                path = ensure_export(self.temp_dir, "processed_data_1.csv")
+                self.assertEqual(
+                    ensure_export(self.temp_dir, "processed_data_1.csv"), path
+                )
+
+        mock_write.assert_called_once()
+        self.assertEqual(len(pd.read_csv(path)), 3)
+        # Storing the frame and generating the download are timed apart
+        stages = [call.args[0] for call in mock_stage.call_args_list]
+        self.assertEqual(stages, ["save", "export"])
+        self.assertEqual(
+            sorted(os.listdir(self.temp_dir)),
+            ["processed_data_1.csv", "processed_data_1.frame.parquet"],
+        )
+
+    def test_unknown_download(self):
+        """
+        Test a download with no file and no stored frame is not found.
+        """
+        self.assertIsNone(ensure_export(self.temp_dir, "processed_data_2.csv"))
+
+
+if __name__ == "__main__":
+    unittest.main()
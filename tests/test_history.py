@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from datetime import datetime
+import pandas as pd
+from utils.history import append_etc_history, engagement_etc_trend, load_etc_history
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "engagement_id": ["1", "2"],
+                "creation_date": [datetime(2024, 5, 10)] * 2,
+                "engagement_partner": pd.Categorical(["Partner1", "Partner1"]),
+                "engagement_partner_service_line": ["Consulting", "Consulting"],
+                "last_etc_date": [datetime(2024, 5, 15), None],
+                "report_date": [datetime(2024, 6, 1)] * 2,
+                "etc_age": pd.array([17, None], dtype="Int16"),
+            }
+        )
+
+    def test_append_etc_history(self):
+        """
+        Test only the narrow history columns are copied and existing
+        (engagement_id, report_date) rows are left alone.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.rowcount = 2
+
+        result = append_etc_history(mock_connection, self.df, "test_table")
+
+        self.assertEqual(result, 2)
+        copy_sql, buffer = mock_cursor.copy_expert.call_args[0]
+        self.assertIn("COPY test_table_etc_history_staging", copy_sql)
+        self.assertEqual(
+            buffer.getvalue().splitlines(),
+            [
+                "1,2024-06-01 00:00:00,Partner1,Consulting,2024-05-15 00:00:00,17",
+                "2,2024-06-01 00:00:00,Partner1,Consulting,,",
+            ],
+        )
+        self.assertIn(
+            "ON CONFLICT (engagement_id, report_date) DO NOTHING",
+            mock_cursor.execute.call_args[0][0],
+        )
+        mock_connection.commit.assert_not_called()
+
+    @patch("utils.history.get_pool")
+    def test_load_etc_history_error(self, mock_get_pool):
+        """
+        Test a failed history load is reported rather than raised.
+        """
+        mock_get_pool.return_value.connection.side_effect = Exception("Database error")
+        messages = []
+
+        result = load_etc_history(
+            self.df, "test_table", notify=lambda *message: messages.append(message)
+        )
+
+        self.assertIsNone(result)
+        self.assertEqual(
+            messages, [("Error recording ETC age history: Database error", "danger")]
+        )
+
+    def test_engagement_etc_trend(self):
+        """
+        Test the latest report dates are returned oldest first.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.description = [("report_date",), ("last_etc_date",), ("etc_age",)]
+        mock_cursor.fetchall.return_value = [
+            (datetime(2024, 6, 8), datetime(2024, 5, 15), 24),
+            (datetime(2024, 6, 1), datetime(2024, 5, 15), 17),
+        ]
+
+        df = engagement_etc_trend(mock_connection, "test_table", "1", weeks=2)
+
+        self.assertEqual(df["etc_age"].tolist(), [17, 24])
+        self.assertEqual(mock_cursor.execute.call_args[0][1], ("1", 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
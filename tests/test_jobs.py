@@ -0,0 +1,98 @@
+import threading
+import unittest
+from utils.jobs import JobQueue, DONE, FAILED, QUEUED, RUNNING
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def test_job_runs_in_background(self):
+        """
+        Test submit returns before the job finishes and the result is recorded.
+        """
+        queue = JobQueue(max_workers=1)
+        release = threading.Event()
+
+        def work(job, value):
+            job.set_stage("parse")
+            release.wait(5)
+            job.set_stage("db load")
+            job.add_message("Loaded", "success")
+            return value * 2
+
+        job = queue.submit(work, 21, stages=["parse", "transform", "db load"])
+        self.assertIn(job.status, (QUEUED, RUNNING))
+
+        release.set()
+        queue._executor.shutdown(wait=True)
+
+        self.assertEqual(job.status, DONE)
+        self.assertEqual(job.result, 42)
+        status = queue.get(job.id).to_dict()
+        self.assertEqual(status["progress"], 1.0)
+        self.assertEqual(status["messages"], ["Loaded"])
+
+    def test_failed_job_records_error(self):
+        """
+        Test an exception in the job marks it failed with the error message.
+        """
+        queue = JobQueue(max_workers=0)
+
+        def work(job):
+            raise KeyError("Engagement ID")
+
+        job = queue.submit(work)
+
+        self.assertEqual(job.status, FAILED)
+        self.assertIn("Engagement ID", job.error)
+
+    def test_concurrency_is_bounded(self):
+        """
+        Test no more than max_workers jobs run at the same time.
+        """
+        queue = JobQueue(max_workers=2)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work(job):
+            with lock:
+                running.append(job.id)
+                peak.append(len(running))
+            threading.Event().wait(0.05)
+            with lock:
+                running.remove(job.id)
+
+        for _ in range(6):
+            queue.submit(work)
+        queue._executor.shutdown(wait=True)
+
+        self.assertEqual(max(peak), 2)
+
+    def test_history_is_bounded(self):
+        """
+        Test only the most recent jobs are kept for status lookups.
+        """
+        queue = JobQueue(max_workers=0, max_history=2)
+
+        jobs = [queue.submit(lambda job: None) for _ in range(3)]
+
+        self.assertIsNone(queue.get(jobs[0].id))
+        self.assertIs(queue.get(jobs[2].id), jobs[2])
+
+    def test_add_done(self):
+        """
+        Test a job added as done is served with its result and messages.
+        """
+        queue = JobQueue(max_workers=0)
+
+        job = queue.add_done({"size": 3}, [("Reused", "info")], stages=["parse"])
+
+        self.assertIs(queue.get(job.id), job)
+        self.assertEqual(job.status, DONE)
+        self.assertEqual(job.result, {"size": 3})
+        self.assertEqual(job.to_dict()["progress"], 1.0)
+        self.assertEqual(job.to_dict()["messages"], ["Reused"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from logging.handlers import QueueHandler
+import unittest
+from utils.logs import APP_LOG, configure_logging, run_log, stop_logging
+
+
+class TestLogs(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        # The app configures logging on import; start from a clean listener
+        stop_logging()
+        configure_logging(self.folder)
+        self.addCleanup(stop_logging)
+
+    def read(self, name):
+        with open(os.path.join(self.folder, name)) as f:
+            return f.read()
+
+    def test_run_logs_are_separate(self):
+        """
+        Test each run's file holds only its own records while app.log holds all.
+        """
+        logger = logging.getLogger("tests.logs")
+
+        def work(name):
+            with run_log(self.folder, f"{name}.log"):
+                logger.info(f"inside {name}")
+
+        threads = [threading.Thread(target=work, args=(name,)) for name in "ab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.info("outside")
+        stop_logging()
+
+        self.assertIn("inside a", self.read("a.log"))
+        self.assertNotIn("inside b", self.read("a.log"))
+        self.assertNotIn("outside", self.read("b.log"))
+        app_log = self.read(APP_LOG)
+        for message in ("inside a", "inside b", "outside"):
+            self.assertIn(message, app_log)
+
+    def test_run_log_complete_on_exit(self):
+        """
+        Test a run's file is written out by the time its context exits.
+        """
+        with run_log(self.folder, "run.log") as path:
+            logging.getLogger("tests.logs").warning("finished")
+
+        self.assertEqual(path, os.path.join(self.folder, "run.log"))
+        self.assertIn("WARNING", self.read("run.log"))
+        self.assertIn("finished", self.read("run.log"))
+
+    def test_configure_is_idempotent(self):
+        """
+        Test configuring again keeps a single queue handler.
+        """
+        listener = configure_logging(self.folder)
+
+        self.assertIs(configure_logging(self.folder), listener)
+        handlers = [
+            handler
+            for handler in logging.getLogger().handlers
+            if isinstance(handler, QueueHandler)
+        ]
+        self.assertEqual(len(handlers), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
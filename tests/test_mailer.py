@@ -0,0 +1,141 @@
+import tempfile
+import unittest
+from datetime import datetime
+from email import message_from_binary_file
+from email.policy import default
+from unittest.mock import patch
+import pandas as pd
+from utils.mailer import (
+    DUE_LATER,
+    DUE_SOON,
+    ESCALATION,
+    EXCEPTION,
+    MANAGER,
+    OVERDUE,
+    PARTNER,
+    build_outreach_emails,
+    etc_status,
+    render_outbox,
+    send_outbox,
+)
+
+
+class TestMailer(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "engagement_id": ["1", "2", "3", "4", "5"],
+                "engagement": ["Eng1", "Eng2", "Eng3", "Eng4", "Eng<5>"],
+                "client": ["Client1"] * 5,
+                "engagement_partner": ["Partner1"] * 4 + ["Partner2"],
+                "engagement_partner_gui": ["P1"] * 4 + ["P2"],
+                "engagement_manager": [
+                    "Manager1",
+                    "Manager1",
+                    "Manager2",
+                    "Manager2",
+                    "Manager3",
+                ],
+                "engagement_manager_gui": ["M1", "M1", "M2", "M2", "M3"],
+                "last_etc_date": [datetime(2024, 5, 1)] * 5,
+                "report_date": [datetime(2024, 6, 1)] * 5,
+                "etc_age": pd.array([70, 40, 25, 10, 70], dtype="Int16"),
+                "delegate1_email": ["d1@example.com", None, None, None, None],
+                "exception_until": [None] * 4 + [datetime(2024, 7, 1)],
+            }
+        )
+
+    def test_etc_status(self):
+        """
+        Test ages are classified by threshold and an active exception wins.
+        """
+        self.assertEqual(
+            etc_status(self.df).tolist(),
+            [ESCALATION, OVERDUE, DUE_SOON, DUE_LATER, EXCEPTION],
+        )
+
+    def test_build_outreach_emails(self):
+        """
+        Test one email per manager with stale ETCs, addressed from the address
+        book and copied to delegates.
+        """
+        emails = build_outreach_emails(
+            self.df, MANAGER, {"M1": "manager1@example.com"}, sender="etc@example.com"
+        )
+
+        self.assertEqual(
+            [email["recipient_name"] for email in emails], ["Manager1", "Manager2"]
+        )
+        manager1, manager2 = emails
+        self.assertEqual(manager1["to"], "Manager1 <manager1@example.com>")
+        self.assertEqual(manager1["cc"], ["d1@example.com"])
+        self.assertEqual(
+            [section["status"] for section in manager1["sections"]],
+            [ESCALATION, OVERDUE],
+        )
+        self.assertEqual(
+            manager1["sections"][0]["rows"],
+            [["1", "Eng1", "Client1", "01/05/2024", "70"]],
+        )
+        self.assertEqual(manager2["to"], "Manager2")
+        self.assertEqual(
+            [section["status"] for section in manager2["sections"]], [DUE_SOON]
+        )
+
+    def test_partner_email_sections(self):
+        """
+        Test partners get the information-only sections too, and a partner
+        with only excepted engagements gets no email.
+        """
+        emails = build_outreach_emails(self.df, PARTNER)
+
+        self.assertEqual(len(emails), 1)
+        self.assertEqual(
+            [section["status"] for section in emails[0]["sections"]],
+            [ESCALATION, OVERDUE, DUE_SOON, DUE_LATER],
+        )
+
+    def test_render_outbox(self):
+        """
+        Test emails are rendered to .eml files with escaped values.
+        """
+        self.df.loc[4, "exception_until"] = None
+        emails = build_outreach_emails(self.df, MANAGER, sender="etc@example.com")
+
+        with tempfile.TemporaryDirectory() as outbox:
+            paths = render_outbox(emails, MANAGER, outbox, workers=0)
+
+            self.assertEqual(len(paths), 3)
+            with open(paths[2], "rb") as f:
+                message = message_from_binary_file(f, policy=default)
+        self.assertEqual(message["From"], "etc@example.com")
+        self.assertEqual(message["To"], "Manager3")
+        html = message.get_body(("html",)).get_content()
+        self.assertIn("Manager3", html)
+        self.assertIn("Eng&lt;5&gt;", html)
+        self.assertIn("ETCs that have been escalated to your EP", html)
+
+    @patch("utils.mailer.smtplib.SMTP")
+    def test_send_outbox(self, mock_smtp):
+        """
+        Test all messages go over one connection and unaddressed ones are
+        skipped.
+        """
+        emails = build_outreach_emails(self.df, MANAGER, {"M1": "manager1@example.com"})
+        smtp = mock_smtp.return_value.__enter__.return_value
+
+        with tempfile.TemporaryDirectory() as outbox:
+            paths = render_outbox(emails, MANAGER, outbox, workers=0)
+            sent = send_outbox(paths, "localhost", 1025)
+
+        self.assertEqual(sent, 1)
+        mock_smtp.assert_called_once_with("localhost", 1025)
+        smtp.send_message.assert_called_once()
+        self.assertEqual(
+            smtp.send_message.call_args[0][0]["To"], "Manager1 <manager1@example.com>"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
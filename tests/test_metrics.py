@@ -0,0 +1,60 @@
+import unittest
+from utils.metrics import (
+    STAGE_DURATION,
+    STAGE_ROWS_IN,
+    STAGE_ROWS_OUT,
+    render_metrics,
+    stage,
+)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_stage(self):
+        """
+        Test a stage records its duration and rows in and out, and a stage
+        that raises is not recorded.
+        """
+        with stage("test_stage", rows_in=100) as record:
+            record.rows_out = 40
+        with self.assertRaises(ValueError):
+            with stage("test_stage", rows_in=100):
+                raise ValueError("failed")
+
+        samples = list(STAGE_ROWS_OUT.samples())
+        self.assertIn(
+            'pipeline_stage_rows_out_bucket{stage="test_stage",le="10"} 0', samples
+        )
+        self.assertIn(
+            'pipeline_stage_rows_out_bucket{stage="test_stage",le="100"} 1', samples
+        )
+        self.assertIn('pipeline_stage_rows_out_sum{stage="test_stage"} 40.0', samples)
+        self.assertIn(
+            'pipeline_stage_rows_in_count{stage="test_stage"} 1',
+            list(STAGE_ROWS_IN.samples()),
+        )
+        self.assertIn(
+            'pipeline_stage_duration_seconds_bucket{stage="test_stage",le="+Inf"} 1',
+            list(STAGE_DURATION.samples()),
+        )
+
+    def test_render_metrics(self):
+        """
+        Test every metric is rendered with its help and type lines.
+        """
+        body = render_metrics()
+
+        self.assertTrue(body.endswith("\n"))
+        for name in [
+            "pipeline_stage_duration_seconds",
+            "pipeline_stage_rows_in",
+            "pipeline_stage_rows_out",
+            "pipeline_stage_resident_memory_bytes",
+            "http_request_duration_seconds",
+        ]:
+            self.assertIn(f"# TYPE {name} histogram", body)
+        self.assertIn("# TYPE process_peak_resident_memory_bytes gauge", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
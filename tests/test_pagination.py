@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+from utils.cache import write_frame
+from utils.pagination import MAX_PAGE_SIZE, frame_columns, load_frame, page_frame
+
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "engagement_id": ["1", "2", "3", "4"],
+                "client": pd.Categorical(["Acme", "Beta", "acme ltd", None]),
+                "last_etc_date": [
+                    datetime(2024, 5, 15),
+                    None,
+                    datetime(2024, 5, 17),
+                    datetime(2024, 5, 1),
+                ],
+                "etc_age": pd.array([17, None, 15, 31], dtype="Int64"),
+            }
+        )
+
+    def test_page(self):
+        """
+        Test offset and limit select the page and values are JSON friendly.
+        """
+        page = page_frame(self.df, offset=1, limit=2)
+
+        self.assertEqual(page["total"], 4)
+        self.assertEqual(page["totalNotFiltered"], 4)
+        self.assertEqual([row["engagement_id"] for row in page["rows"]], ["2", "3"])
+        self.assertIsNone(page["rows"][0]["last_etc_date"])
+        self.assertIsNone(page["rows"][0]["etc_age"])
+        self.assertEqual(page["rows"][1]["last_etc_date"], "2024-05-17T00:00:00")
+        self.assertEqual(len(page_frame(self.df, limit=10**6)["rows"]), 4)
+        self.assertGreaterEqual(MAX_PAGE_SIZE, 4)
+
+    def test_search(self):
+        """
+        Test search matches any column case insensitively, categoricals included.
+        """
+        page = page_frame(self.df, search="ACME")
+
+        self.assertEqual(page["total"], 2)
+        self.assertEqual(page["totalNotFiltered"], 4)
+        self.assertEqual([row["engagement_id"] for row in page["rows"]], ["1", "3"])
+        self.assertEqual(page_frame(self.df, search="31")["total"], 1)
+
+    def test_sort(self):
+        """
+        Test sorting puts missing values last and ignores unknown columns.
+        """
+        page = page_frame(self.df, sort="etc_age", order="desc")
+        self.assertEqual([row["etc_age"] for row in page["rows"]], [31, 17, 15, None])
+
+        page = page_frame(self.df, sort="not_a_column")
+        self.assertEqual(
+            [row["engagement_id"] for row in page["rows"]], ["1", "2", "3", "4"]
+        )
+
+    def test_load_frame(self):
+        """
+        Test cached frames are read once and re-read when the file changes.
+        """
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = write_frame(self.df, os.path.join(temp_dir, "frame"))
+
+        self.assertIs(load_frame(path), load_frame(path))
+        self.assertEqual(
+            frame_columns(path), ["engagement_id", "client", "last_etc_date", "etc_age"]
+        )
+
+        write_frame(self.df.head(1), os.path.join(temp_dir, "frame"))
+        os.utime(path, (0, 0))
+        self.assertEqual(len(load_frame(path)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from utils.pool import ConnectionPool
+
+
+def make_connection():
+    connection = MagicMock()
+    connection.closed = 0
+    connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return connection
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    @patch("utils.pool.psycopg2.connect")
+    def test_connections_are_reused(self, mock_connect):
+        """
+        Test a returned connection is handed out again instead of reconnecting.
+        """
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(maxconn=2, dbname="test")
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        mock_connect.assert_called_once_with(dbname="test")
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["idle"], 1)
+
+    @patch("utils.pool.psycopg2.connect")
+    def test_acquire_timeout(self, mock_connect):
+        """
+        Test checkout raises PoolError once max size is reached and no
+        connection is returned within the timeout.
+        """
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(maxconn=1, timeout=0.05)
+
+        connection = pool.getconn()
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+        pool.putconn(connection)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    @patch("utils.pool.psycopg2.connect")
+    def test_waiter_gets_returned_connection(self, mock_connect):
+        """
+        Test a caller blocked on a full pool receives the next returned
+        connection and the wait is counted.
+        """
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(maxconn=1, timeout=5)
+        connection = pool.getconn()
+
+        release = threading.Timer(0.05, pool.putconn, args=(connection,))
+        release.start()
+        self.assertIs(pool.getconn(), connection)
+        release.join()
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    @patch("utils.pool.psycopg2.connect")
+    def test_unhealthy_connection_is_replaced(self, mock_connect):
+        """
+        Test an idle connection that fails its health check is discarded.
+        """
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(maxconn=1, health_check_interval=0)
+
+        first = pool.getconn()
+        pool.putconn(first)
+        first.closed = 2
+
+        second = pool.getconn()
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.stats()["failed_health_checks"], 1)
+
+    @patch("utils.pool.psycopg2.connect")
+    def test_open_transaction_rolled_back_on_return(self, mock_connect):
+        """
+        Test a connection returned mid-transaction is rolled back.
+        """
+        connection = make_connection()
+        connection.get_transaction_status.return_value = (
+            extensions.TRANSACTION_STATUS_INTRANS
+        )
+        mock_connect.return_value = connection
+        pool = ConnectionPool(maxconn=1)
+
+        pool.putconn(pool.getconn())
+
+        connection.rollback.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
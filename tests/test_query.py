@@ -0,0 +1,132 @@
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from utils.query import (
+    build_engagement_query,
+    decode_cursor,
+    encode_cursor,
+    parse_fields,
+    stream_engagements,
+)
+
+
+class TestQuery(unittest.TestCase):
+
+    def test_parse_fields(self):
+        """
+        Test fields are validated against the table, deduplicated and ordered.
+        """
+        self.assertEqual(
+            parse_fields("client, engagement_id,client"), ["client", "engagement_id"]
+        )
+        self.assertIn("etc_age", parse_fields(None))
+        with self.assertRaises(ValueError):
+            parse_fields("client,password")
+
+    def test_cursor_round_trip(self):
+        """
+        Test a cursor decodes to the keyset values it was made from.
+        """
+        key = (datetime(2024, 6, 28, 9, 30), "E-1", datetime(2024, 1, 5))
+
+        self.assertEqual(decode_cursor(encode_cursor(key)), key)
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_build_query_filters_and_keyset(self):
+        """
+        Test filters become parameters and a single-value filter leads the
+        keyset comparison, so its index is read in page order.
+        """
+        cursor = encode_cursor((datetime(2024, 6, 28), "E-1", datetime(2024, 1, 5)))
+
+        query, params = build_engagement_query(
+            "test_table",
+            ["client"],
+            partner_guis=["1000001"],
+            manager_guis=["5000001", "5000002"],
+            etc_age_min=30,
+            cursor=cursor,
+            limit=10,
+        )
+
+        self.assertIn(
+            "SELECT client, upload_timestamp, engagement_id, creation_date", query
+        )
+        self.assertIn("engagement_partner_gui = %s", query)
+        self.assertIn("engagement_manager_gui = ANY(%s)", query)
+        self.assertIn(
+            "(engagement_partner_gui, upload_timestamp, engagement_id, creation_date) > (%s, %s, %s, %s)",
+            query,
+        )
+        self.assertIn("ORDER BY upload_timestamp, engagement_id, creation_date", query)
+        # NULL keys cannot be ordered or resumed after, so they are excluded
+        self.assertIn("creation_date IS NOT NULL", query)
+        self.assertNotIn("OFFSET", query)
+        self.assertEqual(
+            params,
+            [
+                "1000001",
+                ["5000001", "5000002"],
+                30,
+                "1000001",
+                datetime(2024, 6, 28),
+                "E-1",
+                datetime(2024, 1, 5),
+                11,
+            ],
+        )
+
+    def test_build_query_limit(self):
+        """
+        Test limits outside 1 to MAX_LIMIT are rejected.
+        """
+        with self.assertRaises(ValueError):
+            build_engagement_query("test_table", ["client"], limit=0)
+
+    def test_stream_pages(self):
+        """
+        Test the streamed page holds only the requested fields and a cursor
+        when the extra row shows there is a next page.
+        """
+        rows = [
+            ("Client1", datetime(2024, 6, 28), "E-1", datetime(2024, 1, 5)),
+            ("Client2", datetime(2024, 6, 28), "E-2", datetime(2024, 1, 6)),
+        ]
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.fetchmany.return_value = rows[:1]
+        mock_cursor.fetchone.return_value = rows[1]
+
+        page = json.loads(
+            "".join(stream_engagements(mock_connection, "SELECT", [], ["client"], 1))
+        )
+
+        self.assertEqual(page["data"], [{"client": "Client1"}])
+        self.assertEqual(page["count"], 1)
+        self.assertEqual(decode_cursor(page["next_cursor"]), rows[0][1:])
+        mock_connection.cursor.assert_called_once_with(name="engagement_page")
+        mock_cursor.close.assert_called_once()
+
+    def test_stream_last_page(self):
+        """
+        Test the last page has no next cursor.
+        """
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.fetchmany.side_effect = [
+            [("Client1", datetime(2024, 6, 28), "E-1", datetime(2024, 1, 5))],
+            [],
+        ]
+
+        page = json.loads(
+            "".join(stream_engagements(mock_connection, "SELECT", [], ["client"], 5))
+        )
+
+        self.assertEqual(page["count"], 1)
+        self.assertIsNone(page["next_cursor"])
+
+
+if __name__ == "__main__":
+    unittest.main()
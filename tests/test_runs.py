@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from utils.jobs import JobQueue
+from utils.runs import RunRegistry, run_fingerprint
+
+
+class TestRunRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.path = os.path.join(self.folder, "runs.json")
+
+    def test_fingerprint(self):
+        """
+        Test the fingerprint changes with the contents and start row but not
+        with the case of the service line.
+        """
+        fingerprint = run_fingerprint("abc", 0, "Consulting")
+
+        self.assertEqual(fingerprint, run_fingerprint("abc", "0", " consulting"))
+        self.assertNotEqual(fingerprint, run_fingerprint("abd", 0, "Consulting"))
+        self.assertNotEqual(fingerprint, run_fingerprint("abc", 1, "Consulting"))
+        self.assertNotEqual(fingerprint, run_fingerprint("abc", 0, "Tax"))
+
+    def test_fingerprint_options(self):
+        """
+        Test the fingerprint changes with the log option and the versions of
+        the lists the outreach export is joined to.
+        """
+        versions = {"delegates": "2024-06-10 00:00:00:5", "exceptions": None}
+        fingerprint = run_fingerprint("abc", 0, "Consulting", False, versions)
+
+        self.assertEqual(
+            fingerprint, run_fingerprint("abc", 0, "Consulting", False, dict(versions))
+        )
+        self.assertNotEqual(
+            fingerprint, run_fingerprint("abc", 0, "Consulting", True, versions)
+        )
+        self.assertNotEqual(
+            fingerprint,
+            run_fingerprint(
+                "abc", 0, "Consulting", False, {**versions, "exceptions": "x:1"}
+            ),
+        )
+        self.assertNotEqual(fingerprint, run_fingerprint("abc", 0, "Consulting"))
+
+    def test_record_persists(self):
+        """
+        Test a recorded run is found by a new registry on the same file and
+        can be forgotten.
+        """
+        RunRegistry(self.path).record(
+            "fp", {"download_name": "x"}, [("Done", "success")]
+        )
+
+        registry = RunRegistry(self.path)
+        entry = registry.completed("fp")
+        self.assertEqual(entry["result"], {"download_name": "x"})
+        self.assertEqual(entry["messages"], [["Done", "success"]])
+
+        registry.forget("fp")
+        self.assertIsNone(RunRegistry(self.path).completed("fp"))
+
+    def test_referenced_names_and_expire(self):
+        """
+        Test a run's outputs are referenced until the run expires.
+        """
+        registry = RunRegistry(self.path)
+        registry.record(
+            "fp",
+            {
+                "download_name": "processed_data_1",
+                "outreach_name": None,
+                "log_link": "process_1.log",
+                "service_line_results": [{"download_name": "processed_data_1_Tax"}],
+            },
+            [],
+        )
+
+        self.assertEqual(
+            registry.referenced_names(),
+            {"processed_data_1", "process_1.log", "processed_data_1_Tax"},
+        )
+        self.assertEqual(registry.expire(datetime.now() - timedelta(days=1)), 0)
+        self.assertEqual(registry.expire(datetime.now() + timedelta(days=1)), 1)
+        self.assertEqual(registry.referenced_names(), set())
+
+    def test_register_upload(self):
+        """
+        Test an identical upload returns the earlier file while it exists.
+        """
+        registry = RunRegistry(self.path)
+        first = os.path.join(self.folder, "first.xlsx")
+        open(first, "w").close()
+
+        self.assertEqual(registry.register_upload("abc", first), first)
+        self.assertEqual(registry.register_upload("abc", "second.xlsx"), first)
+
+        os.remove(first)
+        self.assertEqual(registry.register_upload("abc", "second.xlsx"), "second.xlsx")
+
+    def test_claim_shares_running_job(self):
+        """
+        Test identical requests share the running job and a finished one is
+        not reused.
+        """
+        registry = RunRegistry(self.path)
+        queue = JobQueue(max_workers=1)
+
+        class Running:
+            finished_at = None
+
+        running = Running()
+        self.assertIs(registry.claim("fp", lambda: running), running)
+        self.assertIs(registry.claim("fp", lambda: self.fail("started twice")), running)
+
+        running.finished_at = "now"
+        job = registry.claim("fp", lambda: queue.submit(lambda job: 1))
+        self.assertIsNot(job, running)
+        queue._executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
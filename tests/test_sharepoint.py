@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import pandas as pd
+from utils.sharepoint import (
+    DELEGATES,
+    EXCEPTIONS,
+    enrich_engagements,
+    read_sharepoint_export,
+    sharepoint_versions,
+)
+
+
+class TestSharePoint(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_delegates_export(self):
+        """
+        Test SharePoint fields are selected and renamed, and rows without any
+        delegate are dropped.
+        """
+        path = os.path.join(self.temp_dir, "delegates.xlsx")
+        pd.DataFrame(
+            {
+                "Title": [1001, 1002, 1003],
+                "field_15": ["Delegate A", None, None],
+                "field_16": ["a@example.com", None, None],
+                "field_17": ["2024-05-01", None, None],
+                "field_18": [None, None, None],
+                "field_19": [None, None, None],
+                "field_20": [None, None, "Delegate C"],
+                "field_21": [None, None, "c@example.com"],
+                "field_22": [None, None, None],
+                "field_23": [None, None, None],
+                "Modified": ["x", "y", "z"],
+            }
+        ).to_excel(path, index=False)
+
+        df = read_sharepoint_export(path, DELEGATES)
+
+        self.assertEqual(df["engagement_id"].tolist(), ["1001", "1003"])
+        self.assertEqual(df.columns[1], "delegate1")
+        self.assertNotIn("Modified", df.columns)
+        self.assertEqual(df["delegate1_date"].iloc[0], pd.Timestamp("2024-05-01"))
+
+    def test_read_exceptions_export(self):
+        """
+        Test Power Query column names are accepted and rows without a category
+        or end date are dropped.
+        """
+        path = os.path.join(self.temp_dir, "exceptions.csv")
+        pd.DataFrame(
+            {
+                "EngagementID": ["E1", "E2"],
+                "ExceptionCategory": ["Long running", None],
+                "ExceptionUntil": ["2024-07-31", None],
+                "ExceptionExplanation": ["Explanation", "Other"],
+                "ExceptionReviewedbyPartner": ["Yes", None],
+                "ExceptionApprovedbyFinance": ["No", None],
+                "ExceptionDateApproved": [None, None],
+                "Comments": [None, "Comment"],
+                "ExceptionSubmitterEmail": ["s@example.com", None],
+            }
+        ).to_csv(path, index=False)
+
+        df = read_sharepoint_export(path, EXCEPTIONS)
+
+        self.assertEqual(df["engagement_id"].tolist(), ["E1"])
+        self.assertEqual(df["exception_until"].iloc[0], pd.Timestamp("2024-07-31"))
+
+        pd.DataFrame({"EngagementID": ["E1"]}).to_csv(path, index=False)
+        with self.assertRaises(KeyError):
+            read_sharepoint_export(path, EXCEPTIONS)
+
+    def test_enrich_engagements(self):
+        """
+        Test delegates and exceptions are joined on engagement ID, numeric IDs
+        match text IDs and the latest entry for an engagement wins.
+        """
+        df = pd.DataFrame({"engagement_id": ["1001", "1002"], "client": ["A", "B"]})
+        delegates = pd.DataFrame(
+            {"engagement_id": [1001.0, 1001.0], "delegate1": ["Old", "New"]}
+        )
+        exceptions = pd.DataFrame(
+            {"engagement_id": ["1002"], "exception_category": ["Long running"]}
+        )
+
+        enriched = enrich_engagements(df, delegates, exceptions)
+
+        self.assertEqual(len(enriched), 2)
+        self.assertEqual(enriched["engagement_id"].tolist(), ["1001", "1002"])
+        self.assertEqual(enriched["delegate1"].tolist()[0], "New")
+        self.assertTrue(pd.isna(enriched["delegate1"].iloc[1]))
+        self.assertEqual(enriched["exception_category"].iloc[1], "Long running")
+        self.assertIn("exception_submitter_email", enriched.columns)
+
+    @patch("utils.sharepoint.get_pool")
+    def test_sharepoint_versions(self, mock_get_pool):
+        """
+        Test each list is versioned by its last load, None if never loaded.
+        """
+        mock_pool = mock_get_pool.return_value
+        mock_connection = mock_pool.connection.return_value.__enter__.return_value
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.fetchone.side_effect = [
+            ("delegates",),
+            (datetime(2024, 6, 10), 5),
+            (None,),
+        ]
+
+        versions = sharepoint_versions()
+
+        self.assertEqual(
+            versions, {DELEGATES: "2024-06-10 00:00:00:5", EXCEPTIONS: None}
+        )
+
+    @patch("utils.sharepoint.get_pool")
+    def test_sharepoint_versions_error(self, mock_get_pool):
+        """
+        Test unreadable lists get a version of their own rather than raising.
+        """
+        mock_get_pool.return_value.connection.side_effect = Exception("Database error")
+
+        self.assertEqual(
+            sharepoint_versions(),
+            {DELEGATES: "unavailable", EXCEPTIONS: "unavailable"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from utils.storage import StorageManager, artifact_names
+
+
+class TestStorageManager(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.index_path = os.path.join(self.folder, "storage.json")
+
+    def write(self, name, size=1000):
+        path = os.path.join(self.folder, name)
+        with open(path, "w") as f:
+            f.write("a," * (size // 2))
+        return path
+
+    def manager(self, **kwargs):
+        kwargs.setdefault("max_age_days", 30)
+        kwargs.setdefault("compress_after_days", 2)
+        return StorageManager(self.index_path, **kwargs)
+
+    def later(self, days):
+        return datetime.now() + timedelta(days=days)
+
+    def test_compresses_unused_files(self):
+        """
+        Test an unused CSV is gzipped, resolved to the compressed copy and
+        restored intact, while an xlsx is left alone.
+        """
+        storage = self.manager()
+        csv_path = self.write("export.csv")
+        xlsx_path = self.write("export.xlsx")
+        with open(csv_path) as f:
+            contents = f.read()
+        storage.track(csv_path)
+        storage.track(xlsx_path)
+
+        result = storage.sweep(now=self.later(3))
+
+        self.assertEqual(result["compressed"], 1)
+        self.assertFalse(os.path.exists(csv_path))
+        self.assertTrue(os.path.exists(xlsx_path))
+        stored_path, compressed = storage.resolve(csv_path)
+        self.assertTrue(compressed)
+        with gzip.open(stored_path, "rt") as f:
+            self.assertEqual(f.read(), contents)
+
+        self.assertTrue(storage.restore(csv_path))
+        with open(csv_path) as f:
+            self.assertEqual(f.read(), contents)
+        self.assertEqual(storage.resolve(csv_path), (csv_path, False))
+
+    def test_evicts_by_age(self):
+        """
+        Test files unused for longer than the maximum age are deleted, and the
+        index survives a restart.
+        """
+        storage = self.manager()
+        path = self.write("processed_data_1.frame.parquet")
+        storage.track(path)
+
+        self.assertEqual(storage.sweep(now=self.later(1))["evicted"], 0)
+        self.assertEqual(self.manager().sweep(now=self.later(31))["evicted"], 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(storage.resolve(path))
+
+    def test_evicts_least_recently_used_over_size(self):
+        """
+        Test the least recently used files go first when over the size limit.
+        """
+        storage = self.manager(max_bytes=2500)
+        paths = [self.write(f"upload_{i}.xlsx") for i in range(3)]
+        for path in paths:
+            storage.track(path)
+        # Used most recently, so kept over the newer uploads
+        storage._index[os.path.abspath(paths[0])]["last_access"] = "2999-01-01T00:00:00"
+
+        result = storage.sweep()
+
+        self.assertEqual(result["evicted"], 1)
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertEqual(sum(os.path.exists(path) for path in paths[1:]), 1)
+
+    def test_pinned_and_protected_files_are_kept(self):
+        """
+        Test files being served or referenced by a cached run are not evicted.
+        """
+        storage = self.manager(protected=lambda: {"processed_data_1"})
+        protected = self.write("processed_data_1.csv")
+        pinned = self.write("upload.csv")
+        storage.track(protected)
+        storage.track(pinned)
+
+        with storage.pin(pinned):
+            result = storage.sweep(now=self.later(60))
+
+        self.assertEqual(result["evicted"], 0)
+        self.assertTrue(os.path.exists(protected))
+        self.assertTrue(os.path.exists(pinned))
+
+    def test_compresses_outside_the_lock(self):
+        """
+        Test files can be pinned while a sweep compresses, and a file pinned
+        meanwhile is left uncompressed.
+        """
+        storage = self.manager()
+        csv_path = self.write("export.csv")
+        storage.track(csv_path)
+        gzip_file = storage._gzip
+
+        def pin_during_gzip(key):
+            pinned = threading.Event()
+            release = threading.Event()
+
+            def reader():
+                with storage.pin(csv_path):
+                    pinned.set()
+                    release.wait(5)
+
+            thread = threading.Thread(target=reader)
+            thread.start()
+            self.assertTrue(pinned.wait(5))
+            self.addCleanup(thread.join)
+            self.addCleanup(release.set)
+            return gzip_file(key)
+
+        storage._gzip = pin_during_gzip
+        result = storage.sweep(now=self.later(3))
+
+        self.assertEqual(result["compressed"], 0)
+        self.assertEqual(storage.resolve(csv_path), (csv_path, False))
+        self.assertFalse(os.path.exists(csv_path + ".gz.tmp"))
+
+    def test_untracked_and_missing_files(self):
+        """
+        Test untracked files are never touched and deleted ones leave the index.
+        """
+        storage = self.manager()
+        untracked = self.write("other.csv")
+        tracked = self.write("tracked.csv")
+        storage.track(tracked)
+        os.remove(tracked)
+
+        storage.sweep(now=self.later(60))
+
+        self.assertTrue(os.path.exists(untracked))
+        self.assertEqual(storage.stats()["files"], 0)
+
+    def test_artifact_names(self):
+        """
+        Test an artifact is referenced by its file name and its run name.
+        """
+        self.assertEqual(
+            artifact_names("/data/processed_data_1.frame.parquet"),
+            {"processed_data_1.frame.parquet", "processed_data_1"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
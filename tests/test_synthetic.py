@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from utils.dataLoadFunction import ALL_SERVICE_LINES, KEEP_COLS, process_engagement_data
+from utils.synthetic import (
+    ENGAGEMENT_LIST_COLUMNS,
+    generate_engagements,
+    write_engagement_list,
+)
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def test_generate_engagements(self):
+        """
+        Test the generated list has the export's columns, unique IDs, ordered
+        dates and is the same for the same seed.
+        """
+        df = generate_engagements(2000, seed=1)
+
+        self.assertEqual(list(df.columns), ENGAGEMENT_LIST_COLUMNS)
+        self.assertTrue(set(KEEP_COLS).issubset(df.columns))
+        self.assertEqual(len(df), 2000)
+        self.assertTrue(df["Engagement ID"].is_unique)
+        self.assertTrue((df["Release Date"] >= df["Creation Date"]).all())
+        charged = df["Last Time Charged Date"].dropna()
+        self.assertTrue((charged >= df.loc[charged.index, "Release Date"]).all())
+        self.assertLess(
+            df["Engagement Partner"].nunique(), df["Engagement Manager"].nunique()
+        )
+        pd.testing.assert_frame_equal(df, generate_engagements(2000, seed=1))
+
+    def test_generated_file_is_processed(self):
+        """
+        Test a generated workbook goes through process_engagement_data.
+        """
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        df = generate_engagements(200)
+
+        path = write_engagement_list(df, folder, "xlsx")
+
+        self.assertTrue(os.path.exists(path))
+        processed = process_engagement_data(
+            path, service_line=ALL_SERVICE_LINES, verbose=False
+        )
+        self.assertEqual(len(processed), (df["Engagement Status"] == "Released").sum())
+        self.assertTrue(processed["etc_age"].notna().all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+import logging
+import pandas as pd
+
+# Upper bound (inclusive) in days and label of each ETC age bucket. Negative
+# ages (an ETC dated after the report date) fall in the first bucket.
+ETC_AGE_BUCKETS = [
+    (30, "0-30"),
+    (60, "31-60"),
+    (90, "61-90"),
+    (180, "91-180"),
+    (None, "180+"),
+]
+UNKNOWN_BUCKET = "Unknown"
+
+SUMMARY_DIMENSIONS = [
+    "upload_timestamp",
+    "engagement_partner_service_line",
+    "engagement_partner",
+    "engagement_status",
+    "etc_age_bucket",
+]
+
+
+def _bucket_sql():
+    cases = " ".join(
+        f"WHEN etc_age <= {upper} THEN '{label}'"
+        for upper, label in ETC_AGE_BUCKETS
+        if upper is not None
+    )
+    return f"CASE WHEN etc_age IS NULL THEN '{UNKNOWN_BUCKET}' {cases} ELSE '{ETC_AGE_BUCKETS[-1][1]}' END"
+
+
+def create_summary_table_if_not_exists(connection, table_name):
+    """
+    Creates `<table_name>_summary`, the engagement counts per upload, service
+    line, partner, status and ETC age bucket that /reports reads from.
+    """
+    summary_table = f"{table_name}_summary"
+    cursor = connection.cursor()
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {summary_table} (
+        upload_timestamp TIMESTAMP,
+        engagement_partner_service_line TEXT,
+        engagement_partner TEXT,
+        engagement_status TEXT,
+        etc_age_bucket TEXT,
+        engagements INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS {summary_table}_upload_timestamp_idx
+        ON {summary_table} (upload_timestamp);
+    """)
+    cursor.close()
+    return summary_table
+
+
+def summarize_upload(df):
+    """
+    Returns the summary rows of a processed list: engagements per service line,
+    partner, status and ETC age bucket, each engagement counted once.
+    """
+    df = df.drop_duplicates(["engagement_id", "creation_date"])
+    bounds = [upper for upper, _ in ETC_AGE_BUCKETS if upper is not None]
+    buckets = pd.cut(
+        df["etc_age"].astype("Float64"),
+        bins=[float("-inf")] + bounds + [float("inf")],
+        labels=[label for _, label in ETC_AGE_BUCKETS],
+    )
+    dimensions = SUMMARY_DIMENSIONS[1:-1]
+    summary = (
+        df[dimensions]
+        .astype(object)
+        .assign(etc_age_bucket=buckets.astype(object).fillna(UNKNOWN_BUCKET))
+        .groupby(dimensions + ["etc_age_bucket"], dropna=False)
+        .size()
+        .reset_index(name="engagements")
+    )
+    return summary.astype(object).where(summary.notna(), None)
+
+
+def write_upload_summary(connection, table_name, df, upload_timestamp):
+    """
+    Replaces the summary rows of an upload with the counts of its whole
+    processed list (see summarize_upload), for the service lines in the list.
+
+    The loaders only write new and changed rows, so the rows stored with an
+    upload are not the list it contained, and unchanged rows keep the ETC age
+    of the load that wrote them. Summarising the list itself gives each
+    upload's counts and ETC ages as of its report date, and leaves out
+    engagements that have dropped off the list. Does not commit.
+
+    Returns:
+        int: Number of summary rows written.
+    """
+    summary_table = create_summary_table_if_not_exists(connection, table_name)
+    summary = summarize_upload(df)
+    service_lines = df["engagement_partner_service_line"].dropna().unique().tolist()
+    cursor = connection.cursor()
+    # Service lines loaded separately under one upload keep each other's rows
+    cursor.execute(
+        f"""
+        DELETE FROM {summary_table}
+        WHERE upload_timestamp = %s::timestamp
+        AND (engagement_partner_service_line = ANY(%s)
+            OR (%s AND engagement_partner_service_line IS NULL));
+        """,
+        (
+            upload_timestamp,
+            [str(line) for line in service_lines],
+            bool(df["engagement_partner_service_line"].isna().any()),
+        ),
+    )
+    columns = ", ".join(SUMMARY_DIMENSIONS + ["engagements"])
+    cursor.executemany(
+        f"""
+        INSERT INTO {summary_table} ({columns})
+        VALUES (%s::timestamp, %s, %s, %s, %s, %s);
+        """,
+        [(upload_timestamp, *row) for row in summary.itertuples(index=False)],
+    )
+    cursor.close()
+    logging.info(
+        f"Wrote {len(summary)} {summary_table} rows for upload {upload_timestamp}"
+    )
+    return len(summary)
+
+
+def refresh_summary(connection, table_name, upload_timestamps=None):
+    """
+    Recomputes the summary rows for the given uploads from the engagement table.
+
+    Only rows with those upload timestamps are read, through the table's
+    upload_timestamp index, so a refresh costs as much as the uploads it covers
+    rather than the whole history. With upload_timestamps=None the summary is
+    rebuilt from scratch. Counts are of the rows stored with each upload, so
+    for lists loaded by the delta loader write_upload_summary is exact where
+    this is not. Does not commit.
+
+    Returns:
+        int: Number of summary rows written.
+    """
+    summary_table = create_summary_table_if_not_exists(connection, table_name)
+    dimensions = ", ".join(SUMMARY_DIMENSIONS)
+    cursor = connection.cursor()
+    if upload_timestamps is None:
+        where, params = "", ()
+        cursor.execute(f"TRUNCATE {summary_table};")
+    else:
+        where, params = "WHERE upload_timestamp = ANY(%s::timestamp[])", (
+            list(upload_timestamps),
+        )
+        cursor.execute(f"DELETE FROM {summary_table} {where};", params)
+    cursor.execute(
+        f"""
+        INSERT INTO {summary_table} ({dimensions}, engagements)
+        SELECT {dimensions}, COUNT(*)
+        FROM (
+            SELECT upload_timestamp, engagement_partner_service_line,
+                engagement_partner, engagement_status,
+                {_bucket_sql()} AS etc_age_bucket
+            FROM {table_name} {where}
+        ) AS e
+        GROUP BY {dimensions};
+        """,
+        params,
+    )
+    rows_written = max(cursor.rowcount, 0)
+    cursor.close()
+    logging.info(
+        f"Refreshed {summary_table} for "
+        f"{'all uploads' if upload_timestamps is None else list(upload_timestamps)}: "
+        f"{rows_written} rows"
+    )
+    return rows_written
+
+
+def query_frame(connection, query, params=()):
+    """
+    Runs a query and returns its result as a DataFrame.
+    """
+    cursor = connection.cursor()
+    cursor.execute(query, params)
+    df = pd.DataFrame(
+        cursor.fetchall(), columns=[column[0] for column in cursor.description]
+    )
+    cursor.close()
+    return df
+
+
+def upload_summary(connection, table_name):
+    """
+    Returns engagements per upload, with the released and released Consulting
+    counts, newest upload first.
+    """
+    return query_frame(
+        connection,
+        f"""
+        SELECT upload_timestamp,
+            SUM(engagements) AS engagements,
+            SUM(engagements) FILTER (WHERE engagement_status = 'Released') AS released,
+            SUM(engagements) FILTER (
+                WHERE engagement_status = 'Released'
+                AND engagement_partner_service_line = 'Consulting'
+            ) AS released_consulting
+        FROM {table_name}_summary
+        GROUP BY upload_timestamp
+        ORDER BY upload_timestamp DESC;
+        """,
+    )
+
+
+def engagement_breakdown(connection, table_name, dimension):
+    """
+    Returns released engagements by dimension (e.g. engagement_partner) and
+    ETC age bucket, one column per bucket, largest total first.
+
+    Counts come from the latest upload of each service line, i.e. the
+    engagements on its current list with their ETC age as of that list.
+    """
+    if dimension not in SUMMARY_DIMENSIONS:
+        raise ValueError(f"Unknown summary dimension: {dimension}")
+    df = query_frame(
+        connection,
+        f"""
+        SELECT {dimension}, etc_age_bucket, SUM(engagements) AS engagements
+        FROM {table_name}_summary
+        WHERE engagement_status = 'Released'
+        AND (engagement_partner_service_line, upload_timestamp) IN (
+            SELECT engagement_partner_service_line, MAX(upload_timestamp)
+            FROM {table_name}_summary
+            GROUP BY engagement_partner_service_line
+        )
+        GROUP BY {dimension}, etc_age_bucket;
+        """,
+    )
+    buckets = [label for _, label in ETC_AGE_BUCKETS] + [UNKNOWN_BUCKET]
+    pivot = df.pivot_table(
+        index=dimension,
+        columns="etc_age_bucket",
+        values="engagements",
+        aggfunc="sum",
+        fill_value=0,
+    ).reindex(columns=buckets, fill_value=0)
+    pivot["Total"] = pivot.sum(axis=1)
+    return pivot.sort_values("Total", ascending=False).reset_index()
+
+
+# Rebuild the summary from the full engagement table:
+# python -m utils.aggregates engagement_data
+if __name__ == "__main__":
+    import sys
+    from utils.pool import get_pool
+
+    logging.basicConfig(level=logging.INFO)
+    with get_pool().connection() as connection:
+        refresh_summary(
+            connection, sys.argv[1] if len(sys.argv) > 1 else "engagement_data"
+        )
+        connection.commit()
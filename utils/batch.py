@@ -0,0 +1,335 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from werkzeug.utils import secure_filename
+from utils.cache import HEADER_SCAN_ROWS, file_hash, scan_header
+from utils.dataLoadFunction import (
+    ALL_SERVICE_LINES,
+    KEEP_COLS,
+    SERVICE_LINES,
+    normalize_service_line,
+    process_engagement_data,
+    split_by_service_line,
+)
+from utils.database import load_delta_to_db
+from utils.history import load_etc_history
+
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_CHECKPOINT = "./data/batch_checkpoint.json"
+
+
+def find_engagement_lists(source, pattern="*.xlsx"):
+    """
+    Returns the engagement lists in a directory matching pattern, or matching
+    source itself if it is a glob, sorted by path. Weekly lists are named by
+    date, so this is the order they were issued in.
+    """
+    if os.path.isdir(source):
+        source = os.path.join(source, pattern)
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+
+def load_checkpoint(path):
+    """
+    Returns the checkpoint written by save_checkpoint: file path to its content
+    hash, status and outcome. Empty if there is none yet.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint, path):
+    """
+    Writes the checkpoint to a temporary file and renames it into place, so an
+    interrupted run never leaves a truncated checkpoint behind.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def is_done(checkpoint, file_path, content_hash):
+    """
+    Returns True if file_path was loaded by an earlier run with the same
+    contents. A file that failed or has been replaced since is processed again.
+    """
+    entry = checkpoint.get(os.path.abspath(file_path))
+    return (
+        entry is not None and entry["status"] == DONE and entry["hash"] == content_hash
+    )
+
+
+def list_timestamp(file_path, df=None):
+    """
+    Returns the date a weekly list was issued, to stamp its upload with: the
+    YYYYMMDD date its file is named by, else its report date (the latest time
+    charged), else the file's modification time. Back-filled lists then keep
+    their own dates and order in the upload history.
+    """
+    match = re.search(r"(?<!\d)(\d{8})(?!\d)", os.path.basename(file_path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d")
+        except ValueError:
+            pass
+    if df is not None and "report_date" in df and df["report_date"].notna().any():
+        return df["report_date"].max().to_pydatetime()
+    return datetime.fromtimestamp(os.path.getmtime(file_path))
+
+
+def _process_file(file_path, start_row, service_line):
+    """
+    Worker: parses and transforms one engagement list. Only the processed
+    frame is sent back; the database is loaded by the parent process.
+
+    With start_row None the header row is detected as /load does (see
+    scan_header), and a list without the required columns fails.
+    """
+    start_time = time.time()
+    if start_row is None:
+        start_row, missing = scan_header(file_path, KEEP_COLS)
+        if missing:
+            raise KeyError(
+                f"No header row with all required columns in the first "
+                f"{HEADER_SCAN_ROWS} rows; row {start_row} is missing: "
+                f"{', '.join(missing)}"
+            )
+    df = process_engagement_data(
+        file_path,
+        start_row=start_row,
+        service_line=service_line,
+        streaming=True,
+        optimize=True,
+        verbose=False,
+    )
+    return df, time.time() - start_time
+
+
+def load_processed(
+    df,
+    service_line,
+    table_name,
+    upload_timestamp,
+    upload_user,
+    snapshot_folder,
+    notify,
+):
+    """
+    Loads a processed list the way /process does: the changes since the last
+    upload per service line (see load_delta_to_db), then the ETC age history.
+    Snapshots are named by the SERVICE_LINES spelling, as /process names them.
+
+    Returns:
+        bool: True if every load succeeded.
+    """
+    service_line = normalize_service_line(service_line)
+    if service_line == ALL_SERVICE_LINES:
+        frames = split_by_service_line(df, SERVICE_LINES)
+    else:
+        frames = {service_line: df}
+    succeeded = True
+    for line, df_line in frames.items():
+        counts = load_delta_to_db(
+            df_line,
+            table_name,
+            upload_timestamp,
+            upload_user,
+            snapshot_folder,
+            f"{table_name}_{secure_filename(line)}",
+            notify=notify,
+            label=line if service_line == ALL_SERVICE_LINES else None,
+        )
+        succeeded = succeeded and counts is not None
+    rows_added = load_etc_history(df, table_name, notify=notify)
+    return succeeded and rows_added is not None
+
+
+def run_batch(
+    files,
+    checkpoint_path=DEFAULT_CHECKPOINT,
+    workers=None,
+    start_row=None,
+    service_line=ALL_SERVICE_LINES,
+    table_name="engagement_data",
+    upload_user="batch",
+    snapshot_folder="./data/snapshots",
+    load=True,
+    restart=False,
+):
+    """
+    Processes engagement lists across a pool of worker processes and loads the
+    results through a single database path in this process, one file at a
+    time and in file order, so each weekly list's changes are computed against
+    the one before it.
+
+    After each file is loaded it is recorded in the checkpoint with its content
+    hash, so an interrupted run can be started again and skips the files that
+    were already done. At most two files per worker are held in memory waiting
+    to be loaded.
+
+    Args:
+        files (list): Engagement list paths, in the order to load them.
+        checkpoint_path (str, optional): Checkpoint JSON file.
+        workers (int, optional): Worker processes. Defaults to one per CPU;
+            0 processes files in this process.
+        start_row (int, optional): Header row of every list. Defaults to None,
+            which detects each list's header row.
+        service_line (str, optional): Service line to load, in any case, or
+            ALL_SERVICE_LINES. Defaults to ALL_SERVICE_LINES.
+        load (bool, optional): If False, only process the files, without
+            touching the checkpoint. Defaults to True.
+        restart (bool, optional): If True, ignore the existing checkpoint.
+
+    Returns:
+        dict: File path to its checkpoint entry, for the files of this run.
+    """
+    service_line = normalize_service_line(service_line)
+    checkpoint = {} if restart else load_checkpoint(checkpoint_path)
+    pending = []
+    results = {}
+    for file_path in files:
+        content_hash = file_hash(file_path)
+        if is_done(checkpoint, file_path, content_hash):
+            logging.info(f"Skipping {file_path}: already loaded")
+            results[file_path] = checkpoint[os.path.abspath(file_path)]
+        else:
+            pending.append((file_path, content_hash))
+
+    def notify(message, category="info"):
+        level = logging.ERROR if category == "danger" else logging.INFO
+        logging.log(level, message)
+
+    def record(file_path, content_hash, **entry):
+        entry.update(hash=content_hash, finished_at=datetime.now().isoformat())
+        results[file_path] = entry
+        # Only loads are checkpointed, so processing alone never skips a load later
+        if load:
+            checkpoint[os.path.abspath(file_path)] = entry
+            save_checkpoint(checkpoint, checkpoint_path)
+
+    def finish(file_path, content_hash, get_result):
+        try:
+            df, seconds = get_result()
+        except Exception as e:
+            logging.error(f"Error processing {file_path}: {str(e)}")
+            record(file_path, content_hash, status=FAILED, error=str(e))
+            return
+        loaded = not load or load_processed(
+            df,
+            service_line,
+            table_name,
+            list_timestamp(file_path, df),
+            upload_user,
+            snapshot_folder,
+            notify,
+        )
+        if loaded:
+            record(
+                file_path,
+                content_hash,
+                status=DONE,
+                rows=len(df),
+                seconds=round(seconds, 2),
+            )
+            logging.info(f"Loaded {file_path}: {len(df)} rows")
+        else:
+            record(file_path, content_hash, status=FAILED, error="database load failed")
+
+    if workers == 0:
+        for file_path, content_hash in pending:
+            finish(
+                file_path,
+                content_hash,
+                lambda: _process_file(file_path, start_row, service_line),
+            )
+        return results
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Results are loaded in file order as they complete; submitting at most
+        # two per worker ahead bounds the frames waiting in memory
+        queue = deque()
+        files_left = iter(pending)
+        for file_path, content_hash in files_left:
+            queue.append(
+                (
+                    file_path,
+                    content_hash,
+                    executor.submit(_process_file, file_path, start_row, service_line),
+                )
+            )
+            if len(queue) >= workers * 2:
+                break
+        while queue:
+            file_path, content_hash, future = queue.popleft()
+            finish(file_path, content_hash, future.result)
+            next_file = next(files_left, None)
+            if next_file is not None:
+                queue.append(
+                    (
+                        *next_file,
+                        executor.submit(
+                            _process_file, next_file[0], start_row, service_line
+                        ),
+                    )
+                )
+    return results
+
+
+# Example usage:
+# python -m utils.batch "./inputData/PreviousWeeksEngagementLists" --workers 4
+# python -m utils.batch "./inputData/parquet/*.parquet" --service-line Consulting
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Process and load a directory or glob of weekly engagement lists."
+    )
+    parser.add_argument("source", help="Directory or glob of engagement lists")
+    parser.add_argument(
+        "--pattern", default="*.xlsx", help="Pattern within a directory"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--start-row", type=int, default=None, help="Header row (default: detect)"
+    )
+    parser.add_argument("--service-line", default=ALL_SERVICE_LINES)
+    parser.add_argument("--table", default="engagement_data")
+    parser.add_argument("--user", default=os.getenv("USER", "batch"))
+    parser.add_argument("--snapshot-folder", default="./data/snapshots")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--no-load", action="store_true", help="Only process the files")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    files = find_engagement_lists(args.source, args.pattern)
+    results = run_batch(
+        files,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        start_row=args.start_row,
+        service_line=args.service_line,
+        table_name=args.table,
+        upload_user=args.user,
+        snapshot_folder=args.snapshot_folder,
+        load=not args.no_load,
+        restart=args.restart,
+    )
+    failed = [path for path, entry in results.items() if entry["status"] == FAILED]
+    print(f"{len(results) - len(failed)} of {len(files)} files loaded")
+    for path in failed:
+        print(f"Failed: {path}: {results[path].get('error')}")
+    sys.exit(1 if failed else 0)
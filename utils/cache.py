@@ -0,0 +1,322 @@
+import csv
+import glob
+import hashlib
+import logging
+import os
+import pandas as pd
+
+EXCEL_EXTENSIONS = [".xlsx", ".xlsm", ".xls"]
+CSV_EXTENSIONS = [".csv"]
+PARQUET_EXTENSIONS = [".parquet"]
+FEATHER_EXTENSIONS = [".feather", ".arrow"]
+COLUMNAR_EXTENSIONS = PARQUET_EXTENSIONS + FEATHER_EXTENSIONS
+SUPPORTED_EXTENSIONS = EXCEL_EXTENSIONS + CSV_EXTENSIONS + COLUMNAR_EXTENSIONS
+# Rows read from the top of an upload to find and check its header row
+HEADER_SCAN_ROWS = 50
+
+
+def file_extension(file_path):
+    """
+    Returns the lower-cased extension of file_path, e.g. '.xlsx'.
+    """
+    return os.path.splitext(file_path)[1].lower()
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """
+    Returns the SHA-256 hex digest of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_upload(stream, file_path, chunk_size=1024 * 1024):
+    """
+    Copies an upload stream to file_path in chunks, hashing it on the way, so
+    the upload is never held in memory or read back to fingerprint it.
+
+    Returns:
+        str: The SHA-256 hex digest of the contents, as from file_hash.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as f:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def write_frame(df, path_stem):
+    """
+    Writes a DataFrame to `<path_stem>.parquet`. If pyarrow is not installed or
+    the frame cannot be represented in Parquet (e.g. a column mixing text and
+    numbers), it is written to `<path_stem>.pkl` instead.
+
+    Returns:
+        str: The path written.
+    """
+    path = f"{path_stem}.parquet"
+    try:
+        df.to_parquet(path, index=False)
+        return path
+    except (ImportError, ValueError, TypeError) as e:
+        logging.info(f"Parquet cache not available ({e}), falling back to pickle")
+        if os.path.exists(path):
+            os.remove(path)
+    path = f"{path_stem}.pkl"
+    df.to_pickle(path)
+    return path
+
+
+def find_frame(path_stem):
+    """
+    Returns the path of a frame written by write_frame, or None if there is none.
+    """
+    for ext in (".parquet", ".pkl"):
+        if os.path.exists(f"{path_stem}{ext}"):
+            return f"{path_stem}{ext}"
+    return None
+
+
+def read_frame(path, columns=None, nrows=None):
+    """
+    Reads a frame written by write_frame, or a Parquet/Feather/Arrow IPC file.
+
+    Args:
+        path (str): Path to a .parquet, .feather, .arrow or .pkl file.
+        columns (list, optional): Only read these columns. Columns that are not
+            present are ignored, so callers can report them themselves.
+        nrows (int, optional): Only read the first nrows rows. For Parquet this
+            reads a single batch instead of the whole file.
+
+    Returns:
+        pd.DataFrame: The cached frame.
+    """
+    if path.endswith(".pkl"):
+        df = pd.read_pickle(path)
+        if columns is not None:
+            df = df[[col for col in columns if col in df.columns]]
+        return df if nrows is None else df.head(nrows)
+
+    if file_extension(path) in FEATHER_EXTENSIONS:
+        from pyarrow import feather
+
+        if columns is not None:
+            columns = [col for col in columns if col in _feather_names(path)]
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        if nrows is not None:
+            table = table.slice(0, nrows)
+        return table.to_pandas()
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    if columns is not None:
+        columns = [col for col in columns if col in parquet_file.schema_arrow.names]
+    if nrows is None:
+        return parquet_file.read(columns=columns).to_pandas()
+    batch = next(parquet_file.iter_batches(batch_size=nrows, columns=columns), None)
+    if batch is None:
+        return parquet_file.schema_arrow.empty_table().to_pandas()
+    return batch.to_pandas()
+
+
+def find_header_row(df_grid, required_cols=None, max_rows=HEADER_SCAN_ROWS):
+    """
+    Returns the index of the first row in a header-less grid holding the most
+    of required_cols, looking at the first max_rows rows: the first row with
+    all of them if there is one, 0 if no row has any. This is the one header
+    rule for uploads; scan_header and parse_engagement_file both use it.
+    """
+    if not required_cols:
+        return 0
+    required = set(required_cols)
+    rows = [set(row) for row in df_grid.head(max_rows).itertuples(index=False)]
+    return max(range(len(rows)), key=lambda i: len(required & rows[i]), default=0)
+
+
+def to_parquet_safe(df):
+    """
+    Returns a copy of df that Parquet can store: object columns holding mixed
+    types (e.g. numbers and text) are converted to strings, keeping nulls.
+    """
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def read_header_grid(file_path, max_rows=HEADER_SCAN_ROWS):
+    """
+    Returns the first max_rows rows of an Excel or CSV file as a header-less
+    grid, without parsing the rest of the file. .xlsx and .xlsm workbooks are
+    streamed in openpyxl read-only mode.
+    """
+    extension = file_extension(file_path)
+    if extension in CSV_EXTENSIONS:
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            return pd.DataFrame([row for _, row in zip(range(max_rows), csv.reader(f))])
+    if extension in [".xlsx", ".xlsm"]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(max_row=max_rows, values_only=True)
+            return pd.DataFrame(list(rows))
+        finally:
+            workbook.close()
+    return pd.read_excel(file_path, header=None, nrows=max_rows)
+
+
+def _feather_names(path):
+    # Only the schema is read from the file footer, not the record batches
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def _columnar_names(file_path):
+    if file_extension(file_path) in FEATHER_EXTENSIONS:
+        return _feather_names(file_path)
+    import pyarrow.parquet as pq
+
+    return pq.read_schema(file_path).names
+
+
+def scan_header(file_path, required_cols, start_row=None, max_rows=HEADER_SCAN_ROWS):
+    """
+    Checks an upload's header row for required_cols from the first max_rows
+    rows only (the schema for Parquet and Feather/Arrow files), so a wrong
+    start row or a missing column is found before the file is parsed.
+
+    Args:
+        start_row (int, optional): The header row to check. Defaults to None,
+            which picks the row find_header_row does.
+
+    Returns:
+        tuple: (header_row, missing), where missing lists the required_cols
+            not in that row, in order. Empty if the header is usable.
+    """
+    if file_extension(file_path) in COLUMNAR_EXTENSIONS:
+        names = set(_columnar_names(file_path))
+        return 0, [col for col in required_cols if col not in names]
+
+    df_grid = read_header_grid(file_path, max(max_rows, (start_row or 0) + 1))
+    if start_row is None:
+        start_row = find_header_row(df_grid, required_cols, max_rows)
+    header = set(df_grid.iloc[start_row]) if start_row < len(df_grid) else set()
+    return start_row, [col for col in required_cols if col not in header]
+
+
+def parse_engagement_file(file_path, required_cols=None, header_row=None):
+    """
+    Parses an Excel or CSV engagement list into a typed frame.
+
+    Args:
+        header_row (int, optional): The header row, e.g. from scan_header.
+            Defaults to None, which finds it with find_header_row.
+
+    Returns:
+        tuple: (pd.DataFrame, header_row)
+    """
+    if header_row is None:
+        header_row = find_header_row(read_header_grid(file_path), required_cols)
+    if file_extension(file_path) in CSV_EXTENSIONS:
+        return pd.read_csv(file_path, skiprows=header_row), header_row
+
+    df_grid = pd.read_excel(file_path, header=None)
+
+    df = df_grid.iloc[header_row + 1 :].reset_index(drop=True)
+    df.columns = [
+        f"Unnamed: {i}" if pd.isna(name) else str(name)
+        for i, name in enumerate(df_grid.iloc[header_row])
+    ]
+    return df.infer_objects(), header_row
+
+
+def _cache_stem(file_path, content_hash, header_row):
+    return os.path.join(
+        os.path.dirname(file_path), f"{content_hash}.{header_row}.upload"
+    )
+
+
+def cache_upload(file_path, required_cols=None, content_hash=None, header_row=None):
+    """
+    Parses an uploaded workbook or CSV once and caches it as a typed, columnar
+    frame next to the upload, keyed by the file's content hash.
+
+    The header row is the one scan_header found, if given, else the row
+    find_header_row picks. If the same content has already been cached, the
+    file is not parsed again. Parquet and Feather/Arrow uploads are already
+    columnar and are read directly, so nothing is cached for them.
+
+    Args:
+        content_hash (str, optional): The file's hash from save_upload, so the
+            file is not read again to hash it.
+        header_row (int, optional): The header row from scan_header, so the
+            file is not scanned again.
+
+    Returns:
+        int: The header row of the cached frame, i.e. the start_row to pass to
+            read_cached_upload and process_engagement_data.
+    """
+    if file_extension(file_path) in COLUMNAR_EXTENSIONS:
+        return 0
+
+    content_hash = content_hash or file_hash(file_path)
+    existing = glob.glob(
+        os.path.join(
+            os.path.dirname(file_path),
+            f"{content_hash}.{'*' if header_row is None else header_row}.upload.*",
+        )
+    )
+    if existing:
+        header_row = int(os.path.basename(existing[0]).split(".")[1])
+        logging.info(f"Upload cache hit for {file_path} ({content_hash})")
+        return header_row
+
+    df, header_row = parse_engagement_file(file_path, required_cols, header_row)
+    path = write_frame(df, _cache_stem(file_path, content_hash, header_row))
+    logging.info(f"Cached upload {file_path} to {path}")
+    return header_row
+
+
+def cached_upload_path(file_path, start_row, content_hash=None):
+    """
+    Returns the path of the cached frame for an upload parsed with header row
+    start_row. Parquet and Feather/Arrow uploads are their own cached frame.
+    The file is hashed unless content_hash, as from save_upload, is given.
+
+    Returns:
+        str or None: The path, or None if the file has not been cached with
+            that header row.
+    """
+    if not os.path.exists(file_path):
+        return None
+    if file_extension(file_path) in COLUMNAR_EXTENSIONS:
+        return file_path
+    content_hash = content_hash or file_hash(file_path)
+    return find_frame(_cache_stem(file_path, content_hash, start_row))
+
+
+def read_cached_upload(
+    file_path, start_row, columns=None, nrows=None, content_hash=None
+):
+    """
+    Reads the cached frame for an upload parsed with header row start_row.
+    Parquet and Feather/Arrow uploads are read directly. content_hash is as
+    for cached_upload_path.
+
+    Returns:
+        pd.DataFrame or None: The cached frame, or None if the file has not been
+            cached with that header row.
+    """
+    path = cached_upload_path(file_path, start_row, content_hash)
+    if path is None:
+        return None
+    return read_frame(path, columns=columns, nrows=nrows)
@@ -0,0 +1,88 @@
+import argparse
+import glob
+import logging
+import os
+import time
+from utils.cache import parse_engagement_file, to_parquet_safe
+from utils.dataLoadFunction import KEEP_COLS
+
+
+def convert_to_parquet(file_path, output_dir=None, required_cols=None, overwrite=False):
+    """
+    Converts an Excel or CSV engagement list to Parquet.
+
+    The header row is detected as the first row containing all required_cols, so
+    the Parquet file can be processed with start_row=0. Existing output that is
+    newer than the source is kept unless overwrite is True.
+
+    Args:
+        file_path (str): The path to the Excel or CSV file.
+        output_dir (str, optional): Directory for the Parquet file. Defaults to
+            the source file's directory.
+        required_cols (list, optional): Columns identifying the header row.
+            Defaults to KEEP_COLS.
+        overwrite (bool, optional): Re-convert even if the output is up to date.
+            Defaults to False.
+
+    Returns:
+        str: The path of the Parquet file.
+    """
+    if required_cols is None:
+        required_cols = KEEP_COLS
+    if output_dir is None:
+        output_dir = os.path.dirname(file_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    output_path = os.path.join(
+        output_dir, os.path.splitext(os.path.basename(file_path))[0] + ".parquet"
+    )
+    if (
+        not overwrite
+        and os.path.exists(output_path)
+        and os.path.getmtime(output_path) >= os.path.getmtime(file_path)
+    ):
+        logging.info(f"Skipping {file_path}, {output_path} is up to date")
+        return output_path
+
+    start_time = time.time()
+    df, header_row = parse_engagement_file(file_path, required_cols)
+    to_parquet_safe(df).to_parquet(output_path, index=False)
+    logging.info(
+        f"Converted {file_path} (header row {header_row}, {len(df)} rows) to "
+        f"{output_path} in {time.time() - start_time:.2f} seconds"
+    )
+    return output_path
+
+
+def convert_archive(
+    input_dir, output_dir=None, pattern="*.xlsx", required_cols=None, overwrite=False
+):
+    """
+    Converts every engagement list in input_dir matching pattern to Parquet.
+
+    Returns:
+        list: The paths of the Parquet files, in source file order.
+    """
+    return [
+        convert_to_parquet(file_path, output_dir, required_cols, overwrite)
+        for file_path in sorted(glob.glob(os.path.join(input_dir, pattern)))
+    ]
+
+
+# Example usage:
+# python -m utils.convert "./inputData/PreviousWeeksEngagementLists" --output-dir "./inputData/parquet"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert an archive of weekly engagement lists to Parquet."
+    )
+    parser.add_argument("input_dir")
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument("--pattern", default="*.xlsx")
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    paths = convert_archive(
+        args.input_dir, args.output_dir, args.pattern, overwrite=args.overwrite
+    )
+    print(f"Converted {len(paths)} files")
@@ -2,6 +2,215 @@ import os
 import pandas as pd
 import logging
 import time
+from openpyxl import load_workbook
+from utils.cache import (
+    read_cached_upload,
+    read_frame,
+    file_extension,
+    scan_header,
+    CSV_EXTENSIONS,
+    COLUMNAR_EXTENSIONS,
+)
+from utils.metrics import stage
+
+KEEP_COLS = [
+    "Engagement ID",
+    "Creation Date",
+    "Release Date",
+    "Last Time Charged Date",
+    "Last Expenses Charged Date",
+    "Last Active ETC-P Date",
+    "Engagement",
+    "Client",
+    "Engagement Partner",
+    "Engagement Partner GUI",
+    "Engagement Manager",
+    "Engagement Manager GUI",
+    "Engagement Partner Service Line",
+    "Engagement Status",
+]
+
+# Passing this as service_line keeps released engagements of every service line
+ALL_SERVICE_LINES = "All"
+
+# Service lines as they are spelled in the lists, the form choices and the
+# delta snapshot names
+SERVICE_LINES = ["CBS & Elim", "Assurance", "Consulting", "Tax", "SaT"]
+
+# Repetitive text columns stored as categoricals by process_engagement_data(optimize=True)
+CATEGORY_COLS = [
+    "Client",
+    "Engagement Partner",
+    "Engagement Partner GUI",
+    "Engagement Manager",
+    "Engagement Manager GUI",
+    "Engagement Partner Service Line",
+    "Engagement Status",
+]
+
+DATE_COLS = [
+    "Creation Date",
+    "Release Date",
+    "Last Time Charged Date",
+    "Last Expenses Charged Date",
+    "Last Active ETC-P Date",
+]
+
+
+def read_engagement_rows(
+    file_path, start_row=0, keep_cols=None, service_line="Consulting"
+):
+    """
+    Streams an Excel engagement list row by row and keeps only released
+    engagements for the given service line, reading only the keep_cols columns.
+
+    The workbook is opened in openpyxl read-only mode, so cells are parsed as the
+    sheet is iterated and rows that fail the filter are discarded immediately.
+    Memory therefore scales with the filtered output rather than the workbook.
+
+    Args:
+        file_path (str): The path to the Excel file.
+        start_row (int, optional): Number of rows above the header row, as for
+            pd.read_excel(skiprows=start_row). Defaults to 0.
+        keep_cols (list, optional): List of columns to keep. Defaults to KEEP_COLS.
+        service_line (str, optional): The service line to filter by (case
+            insensitive), or ALL_SERVICE_LINES to keep every service line.
+            Defaults to 'Consulting'.
+
+    Returns:
+        pd.DataFrame: The filtered rows with keep_cols as columns.
+
+    Raises:
+        KeyError: If any of keep_cols is missing from the header row.
+    """
+    if keep_cols is None:
+        keep_cols = KEEP_COLS
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(min_row=start_row + 1, values_only=True)
+        header = next(rows, ())
+        positions = {name: i for i, name in enumerate(header) if name is not None}
+
+        missing = [col for col in keep_cols if col not in positions]
+        if missing:
+            raise KeyError(f"{missing} not in index")
+
+        col_index = [positions[col] for col in keep_cols]
+        service_line_pos = keep_cols.index("Engagement Partner Service Line")
+        status_pos = keep_cols.index("Engagement Status")
+        service_line = service_line.lower()
+        all_lines = service_line == ALL_SERVICE_LINES.lower()
+
+        records = []
+        for row in rows:
+            record = [row[i] if i < len(row) else None for i in col_index]
+            if record[status_pos] == "Released" and (
+                all_lines or str(record[service_line_pos]).lower() == service_line
+            ):
+                record[service_line_pos] = str(record[service_line_pos])
+                records.append(record)
+    finally:
+        workbook.close()
+
+    return pd.DataFrame(records, columns=keep_cols)
+
+
+def parse_date_columns(df, date_cols, date_format=None):
+    """
+    Converts date_cols to datetime64 in one pass. Columns that are already datetime64 (as read
+    from Excel or Parquet) are left alone; the rest are parsed together with a single
+    pd.to_datetime call, so one format is given or inferred for all of them. Values that
+    cannot be parsed become NaT.
+
+    Returns:
+        pd.DataFrame: df with the date columns converted.
+    """
+    pending = [
+        col for col in date_cols if not pd.api.types.is_datetime64_any_dtype(df[col])
+    ]
+    if not pending:
+        return df
+
+    # Flatten column by column so each column's values stay contiguous
+    parsed = pd.to_datetime(
+        pd.Series(df[pending].to_numpy(dtype=object).ravel(order="F")),
+        format=date_format,
+        errors="coerce",
+    ).to_numpy()
+    n_rows = len(df)
+    return df.assign(
+        **{col: parsed[i * n_rows : (i + 1) * n_rows] for i, col in enumerate(pending)}
+    )
+
+
+def compact_frame(df, category_cols=None):
+    """
+    Returns a smaller copy of a frame: text columns in category_cols whose values repeat
+    become categoricals and integer columns are downcast to the smallest integer dtype that holds their values.
+    Date columns are already datetime64 and are left as they are.
+
+    Args:
+        df (pd.DataFrame): The frame to compact.
+        category_cols (list, optional): Columns to convert to categoricals, if present.
+            Defaults to CATEGORY_COLS.
+
+    Returns:
+        pd.DataFrame: The compacted frame.
+    """
+    if category_cols is None:
+        category_cols = CATEGORY_COLS
+
+    compacted = {}
+    for col in df.columns:
+        if col in category_cols:
+            # Only worth it when values repeat; mostly unique columns grow as categoricals
+            if df[col].nunique(dropna=False) <= len(df) / 2:
+                compacted[col] = df[col].astype("category")
+        elif pd.api.types.is_integer_dtype(df[col]):
+            compacted[col] = pd.to_numeric(df[col], downcast="integer")
+    return df.assign(**compacted)
+
+
+def memory_report(df_before, df_after):
+    """
+    Compares the memory used per row by each column of two versions of a frame.
+
+    Returns:
+        pd.DataFrame: Bytes per row 'before' and 'after' for each column, the 'saving' as a
+            fraction of 'before', and a 'Total' row.
+    """
+    rows = max(len(df_before), 1)
+    report = pd.DataFrame(
+        {
+            "before": df_before.memory_usage(deep=True, index=False) / rows,
+            "after": df_after.memory_usage(deep=True, index=False) / rows,
+        }
+    )
+    report.loc["Total"] = report.sum()
+    report["saving"] = 1 - report["after"] / report["before"]
+    return report
+
+
+def read_engagement_file(file_path, start_row=0, keep_cols=None):
+    """
+    Reads an engagement list into a DataFrame, choosing the reader by file type.
+
+    Parquet and Feather/Arrow IPC files are read column-pruned to keep_cols, CSV
+    files are read with usecols, and anything else is read with pd.read_excel.
+    start_row only applies to Excel and CSV files.
+
+    Returns:
+        pd.DataFrame: The raw data. Columns of keep_cols that are missing are not
+            reported here; selecting them raises the KeyError.
+    """
+    extension = file_extension(file_path)
+    if extension in COLUMNAR_EXTENSIONS:
+        return read_frame(file_path, columns=keep_cols)
+    if extension in CSV_EXTENSIONS:
+        usecols = None if keep_cols is None else (lambda col: col in keep_cols)
+        return pd.read_csv(file_path, skiprows=start_row, usecols=usecols)
+    return pd.read_excel(file_path, skiprows=start_row)
 
 
 def process_engagement_data(
@@ -11,17 +220,37 @@ def process_engagement_data(
     date_cols=None,
     service_line="Consulting",
     verbose=True,
+    streaming=False,
+    use_cache=False,
+    progress=None,
+    date_format=None,
+    optimize=False,
+    content_hash=None,
 ):
     """
-    Processes an Excel file containing engagement data, filters and formats the data, and adds calculated columns.
+    Processes a file containing engagement data, filters and formats the data, and adds calculated columns.
 
     Args:
-        file_path (str): The path to the Excel file.
+        file_path (str): The path to the Excel, CSV, Parquet or Feather/Arrow file.
         start_row (int, optional): The row to start reading data from. Defaults to 0.
         keep_cols (list, optional): List of columns to keep. Defaults to a predefined list.
         date_cols (list, optional): List of columns to convert to datetime. Defaults to a predefined list.
-        service_line (str, optional): The service line to filter by. Defaults to 'Consulting'.
-        verbose (bool, optional): If True, print and log additional information. Defaults to True.
+        service_line (str, optional): The service line to filter by, or ALL_SERVICE_LINES to keep
+            every service line (see split_by_service_line). Defaults to 'Consulting'.
+        verbose (bool, optional): If True, log progress at INFO rather than DEBUG. Defaults to True.
+        streaming (bool, optional): If True, read the workbook with read_engagement_rows, which
+            only parses keep_cols and filters while reading. Defaults to False.
+        use_cache (bool, optional): If True and the upload was cached by utils.cache.cache_upload
+            with header row start_row, read the cached columnar copy instead of the workbook.
+            Defaults to False.
+        progress (callable, optional): Called with the stage name ('parse', then 'transform') as
+            processing moves between stages. Defaults to None.
+        date_format (str, optional): strftime format of text dates, e.g. '%d/%m/%Y'. Defaults to
+            None, which infers one format for all date columns.
+        optimize (bool, optional): If True, store CATEGORY_COLS as categoricals and downcast
+            integer columns (see compact_frame), and log a memory report. Defaults to False.
+        content_hash (str, optional): The file's hash from utils.cache.save_upload, so the
+            cache lookup does not hash the file again. Defaults to None.
 
     Returns:
         pd.DataFrame: The processed DataFrame.
@@ -31,9 +260,9 @@ def process_engagement_data(
         ValueError: If invalid arguments are provided.
         Exception: For other errors that occur during processing.
     """
-    # Configure logging
+    # Logging is set up by the caller (see utils.logs); verbose picks the level
     logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING)
+    info = logger.info if verbose else logger.debug
 
     if not isinstance(start_row, int) or start_row < 0:
         raise ValueError("start_row must be a non-negative integer.")
@@ -42,95 +271,125 @@ def process_engagement_data(
         raise FileNotFoundError(f"The file {file_path} does not exist.")
 
     if keep_cols is None:
-        keep_cols = [
-            "Engagement ID",
-            "Creation Date",
-            "Release Date",
-            "Last Time Charged Date",
-            "Last Expenses Charged Date",
-            "Last Active ETC-P Date",
-            "Engagement",
-            "Client",
-            "Engagement Partner",
-            "Engagement Partner GUI",
-            "Engagement Manager",
-            "Engagement Manager GUI",
-            "Engagement Partner Service Line",
-            "Engagement Status",
-        ]
+        keep_cols = KEEP_COLS
 
     if date_cols is None:
-        date_cols = [
-            "Creation Date",
-            "Release Date",
-            "Last Time Charged Date",
-            "Last Expenses Charged Date",
-            "Last Active ETC-P Date",
-        ]
+        date_cols = DATE_COLS
+
+    if progress is None:
+        progress = lambda stage: None
 
     try:
-        logger.info(f"File Path: {file_path}")
+        info(f"File Path: {file_path}")
+        progress("parse")
 
-        # Load the Excel data into a DataFrame
-        start_time = time.time()
-        df_raw = pd.read_excel(file_path, skiprows=start_row)
-        logger.info(f"Data loaded with shape (rows and columns): {df_raw.shape}")
-        logger.info(f"Data loading time: {time.time() - start_time:.2f} seconds")
+        # The cache lookup, workbook streaming or full read are one read stage
+        df_raw = None
+        df_filtered = None
+        with stage("read") as read_record:
+            if use_cache:
+                df_raw = read_cached_upload(
+                    file_path, start_row, columns=keep_cols, content_hash=content_hash
+                )
+                if df_raw is not None:
+                    info(
+                        f"Data loaded from upload cache with shape (rows and columns): {df_raw.shape}"
+                    )
 
-        # Reduce columns to only the ones needed
-        start_time = time.time()
-        df_filtered = df_raw[keep_cols]
-        logger.info(f"Data reduced to key columns only: {df_filtered.shape}")
-        logger.info(f"Column reduction time: {time.time() - start_time:.2f} seconds")
-
-        # Ensure the column to be filtered is of string type
-        df_filtered.loc[:, "Engagement Partner Service Line"] = df_filtered.loc[
-            :, "Engagement Partner Service Line"
-        ].astype(str)
-
-        # Filter the data
-        df_filtered = df_filtered[
-            (
-                df_filtered.loc[:, "Engagement Partner Service Line"].str.lower()
-                == service_line.lower()
+            if df_raw is None:
+                # Check the header row from the top of the file before parsing all
+                # of it, so a wrong start_row or a missing column fails at once
+                _, missing = scan_header(file_path, keep_cols, start_row=start_row)
+                if missing:
+                    raise KeyError(f"{missing} not in header row {start_row}")
+
+            if (
+                df_raw is None
+                and streaming
+                and file_extension(file_path) in [".xlsx", ".xlsm"]
+            ):
+                # Read only the key columns and filter while streaming the workbook
+                df_filtered = read_engagement_rows(
+                    file_path,
+                    start_row=start_row,
+                    keep_cols=keep_cols,
+                    service_line=service_line,
+                )
+                read_record.rows_out = len(df_filtered)
+                info(
+                    f"Data streamed, filtered by EP service line and released eng. codes only. Filtered data shape: {df_filtered.shape}"
+                )
+            else:
+                if df_raw is None:
+                    # Load the data into a DataFrame
+                    df_raw = read_engagement_file(file_path, start_row, keep_cols)
+                    info(f"Data loaded with shape (rows and columns): {df_raw.shape}")
+                read_record.rows_out = len(df_raw)
+        info(f"Data loading time: {read_record.elapsed():.2f} seconds")
+
+        if df_filtered is None:
+            # Reduce to the key columns and filter in a single selection, casting only the
+            # service line values of released rows to string
+            with stage("filter", rows_in=len(df_raw)) as filter_record:
+                released = df_raw.index[df_raw["Engagement Status"] == "Released"]
+                service_lines = df_raw.loc[
+                    released, "Engagement Partner Service Line"
+                ].astype(str)
+                if service_line.lower() != ALL_SERVICE_LINES.lower():
+                    service_lines = service_lines[
+                        service_lines.str.lower() == service_line.lower()
+                    ]
+                filter_record.rows_out = len(service_lines)
+            with stage("prune", rows_in=len(service_lines)) as prune_record:
+                df_filtered = df_raw.loc[service_lines.index, keep_cols].assign(
+                    **{"Engagement Partner Service Line": service_lines}
+                )
+                prune_record.rows_out = len(df_filtered)
+            info(
+                f"Data reduced to key columns, filtered by EP service line and released eng. codes only. Filtered data shape: {df_filtered.shape}"
+            )
+            info(
+                f"Column reduction and filter time: {filter_record.elapsed():.2f} seconds"
             )
-            & (df_filtered["Engagement Status"] == "Released")
-        ]
-        logger.info(
-            f"Data filtered by EP service line and released eng. codes only. Filtered data shape: {df_filtered.shape}"
-        )
+
+        progress("transform")
 
         # Convert date columns to datetime in a single step
         start_time = time.time()
-        for col in date_cols:
-            df_filtered[col] = pd.to_datetime(df_filtered[col], errors="coerce")
+        with stage("dates", rows_in=len(df_filtered)) as record:
+            df_filtered = parse_date_columns(df_filtered, date_cols, date_format)
+            record.rows_out = len(df_filtered)
 
-        # Add calculated columns
-        df_filtered["Last ETC Date"] = df_filtered["Last Active ETC-P Date"].fillna(
-            df_filtered["Release Date"]
-        )
-        df_filtered["Report Date"] = df_filtered["Last Time Charged Date"].max()
-
-        # Calculate the age of ETC in days using date offset
-        df_filtered["ETC Age"] = (
-            df_filtered["Report Date"] - df_filtered["Last ETC Date"]
-        ).dt.days
-
-        # Convert NAT values to none in date columns
-        df_filtered[date_cols] = (
-            df_filtered[date_cols]
-            .astype(object)
-            .where(pd.notnull(df_filtered[date_cols]), None)
-        )
+        with stage("calc", rows_in=len(df_filtered)) as record:
+            # Add calculated columns
+            df_filtered["Last ETC Date"] = df_filtered["Last Active ETC-P Date"].fillna(
+                df_filtered["Release Date"]
+            )
+            df_filtered["Report Date"] = df_filtered["Last Time Charged Date"].max()
+
+            # Calculate the age of ETC in days using date offset
+            # Nullable integer, so a missing Last ETC Date gives <NA> rather than a float NaN
+            df_filtered["ETC Age"] = (
+                df_filtered["Report Date"] - df_filtered["Last ETC Date"]
+            ).dt.days.astype("Int64")
 
-        # TODO: #11 Fix issue above to allow upload of NAT values to SQL. Currently coverting dtype to object to allow upload @line 119
+            # Date columns stay datetime64; the database loaders write NaT as NULL
 
-        # Replace space with underscore from column headers and convert to lowercase
-        df_filtered.columns = df_filtered.columns.str.replace(" ", "_").str.lower()
+            if optimize:
+                df_before = df_filtered
+                df_filtered = compact_frame(df_filtered)
+                report = memory_report(df_before, df_filtered)
+                info(
+                    f"Compacted frame from {report.loc['Total', 'before']:.0f} to {report.loc['Total', 'after']:.0f} bytes per row"
+                )
 
-        # Reset index
-        df_filtered.reset_index(drop=True, inplace=True)
-        logger.info(
+            # Replace space with underscore from column headers and convert to lowercase
+            df_filtered.columns = df_filtered.columns.str.replace(" ", "_").str.lower()
+
+            # Reset index
+            df_filtered.reset_index(drop=True, inplace=True)
+            record.rows_out = len(df_filtered)
+        info(
             f"Added calculated columns, new data shape: {df_filtered.shape} and time taken: {time.time() - start_time:.2f} seconds"
         )
 
@@ -147,5 +406,48 @@ def process_engagement_data(
         raise
 
 
+def normalize_service_line(service_line):
+    """
+    Returns the SERVICE_LINES or ALL_SERVICE_LINES spelling of a service line
+    name, matched case insensitively, or the name as given if it is not one.
+    """
+    for line in [ALL_SERVICE_LINES] + SERVICE_LINES:
+        if line.lower() == service_line.strip().lower():
+            return line
+    return service_line
+
+
+def split_by_service_line(df, service_lines=None):
+    """
+    Splits a processed DataFrame into one frame per service line with a single groupby.
+
+    Used with process_engagement_data(service_line=ALL_SERVICE_LINES), so the workbook is read
+    and the date and ETC age calculations are done once for every service line.
+
+    Args:
+        df (pd.DataFrame): Output of process_engagement_data.
+        service_lines (list, optional): Service lines to return, matched case insensitively. Lines
+            with no rows get an empty frame. Defaults to every service line present in df.
+
+    Returns:
+        dict: Service line name to processed DataFrame, with the index reset.
+    """
+    groups = {
+        key: frame.reset_index(drop=True)
+        for key, frame in df.groupby(
+            df["engagement_partner_service_line"].str.lower(), sort=False
+        )
+    }
+    if service_lines is None:
+        return {
+            frame["engagement_partner_service_line"].iloc[0]: frame
+            for frame in groups.values()
+        }
+    return {
+        line: groups.get(line.lower(), df.iloc[0:0].reset_index(drop=True))
+        for line in service_lines
+    }
+
+
 # Example usage:
 # df_processed = process_engagement_data("./inputData/PreviousWeeksEngagementLists/20240510 Engagement List.xlsx")
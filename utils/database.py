@@ -1,11 +1,107 @@
 import psycopg2
+from psycopg2.extensions import register_adapter, AsIs
 from flask import flash
+import pandas as pd
+import io
 import logging
-import os
+from utils.pool import get_pool
+from utils.metrics import stage
+from utils.aggregates import write_upload_summary
+from utils.delta import (
+    CHANGE_FEED_COLUMNS,
+    compute_delta,
+    delta_counts,
+    load_snapshot,
+    save_snapshot,
+)
 
+ENGAGEMENT_COLUMNS = [
+    "engagement_id",
+    "creation_date",
+    "release_date",
+    "last_time_charged_date",
+    "last_expenses_charged_date",
+    "last_active_etcp_date",
+    "engagement",
+    "client",
+    "engagement_partner",
+    "engagement_partner_gui",
+    "engagement_manager",
+    "engagement_manager_gui",
+    "engagement_partner_service_line",
+    "engagement_status",
+    "last_etc_date",
+    "report_date",
+    "etc_age",
+    "upload_timestamp",
+    "upload_user",
+]
 
-def create_table_if_not_exists(connection, table_name):
+INTEGER_COLUMNS = ["etc_age"]
+
+# Order in which the engagement table is paged: unique per row, and rows
+# re-stamped by a later upload move to the end
+KEYSET_ORDER = ["upload_timestamp", "engagement_id", "creation_date"]
+
+# Missing values in datetime64 and nullable integer columns are sent as NULL
+register_adapter(type(pd.NaT), lambda value: AsIs("NULL"))
+register_adapter(type(pd.NA), lambda value: AsIs("NULL"))
+
+
+def _index_ddl(table_name):
+    """
+    Index definitions shared by new and migrated tables. They support the
+    dedup lookup, the reporting queries (rows per upload_timestamp, filtered
+    by engagement status and service line) and the /api/engagements pages
+    (see utils.query), which are read in KEYSET_ORDER, optionally for one
+    service line, partner or manager.
+    """
+    keyset = ", ".join(KEYSET_ORDER)
+    return f"""
+    CREATE INDEX IF NOT EXISTS {table_name}_upload_timestamp_idx
+        ON {table_name} (upload_timestamp);
+    CREATE INDEX IF NOT EXISTS {table_name}_status_service_line_idx
+        ON {table_name} (
+            engagement_status, engagement_partner_service_line, upload_timestamp
+        );
+    CREATE INDEX IF NOT EXISTS {table_name}_keyset_idx
+        ON {table_name} ({keyset});
+    CREATE INDEX IF NOT EXISTS {table_name}_service_line_keyset_idx
+        ON {table_name} (engagement_partner_service_line, {keyset});
+    CREATE INDEX IF NOT EXISTS {table_name}_partner_gui_keyset_idx
+        ON {table_name} (engagement_partner_gui, {keyset});
+    CREATE INDEX IF NOT EXISTS {table_name}_manager_gui_keyset_idx
+        ON {table_name} (engagement_manager_gui, {keyset});
+    """
+
+
+def create_table_if_not_exists(connection, table_name, partitioned=False):
+    """
+    Creates the engagement table with its dedup key and reporting indexes.
+
+    (engagement_id, creation_date) is enforced as a UNIQUE constraint so the
+    loaders can resolve duplicates with ON CONFLICT. When partitioned is True the
+    table is range partitioned by upload_timestamp with a default partition.
+    Postgres requires unique constraints on partitioned tables to include the
+    partition key, so in that case the dedup key is a plain index and the
+    loaders fall back to a NOT EXISTS check against it.
+    """
     cursor = connection.cursor()
+    if partitioned:
+        key_ddl = ""
+        table_options = "PARTITION BY RANGE (upload_timestamp)"
+        partition_ddl = f"""
+    CREATE TABLE IF NOT EXISTS {table_name}_default
+        PARTITION OF {table_name} DEFAULT;
+    CREATE INDEX IF NOT EXISTS {table_name}_engagement_key_idx
+        ON {table_name} (engagement_id, creation_date);
+    """
+    else:
+        key_ddl = f""",
+        CONSTRAINT {table_name}_engagement_key UNIQUE (engagement_id, creation_date)"""
+        table_options = ""
+        partition_ddl = ""
+
     create_table_query = f"""
     CREATE TABLE IF NOT EXISTS {table_name} (
         engagement_id TEXT,
@@ -26,11 +122,158 @@ def create_table_if_not_exists(connection, table_name):
         report_date TIMESTAMP,
         etc_age INTEGER,
         upload_timestamp TIMESTAMP,
-        upload_user TEXT
+        upload_user TEXT{key_ddl}
+    ) {table_options};
+    {partition_ddl}{_index_ddl(table_name)}"""
+    cursor.execute(create_table_query)
+    cursor.close()
+
+
+def create_upload_partition(connection, table_name, upload_timestamp):
+    """
+    Creates the monthly partition covering upload_timestamp on a partitioned
+    engagement table, if it does not exist yet.
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        f"""
+        SELECT date_trunc('month', %s::timestamp),
+               date_trunc('month', %s::timestamp) + interval '1 month';
+        """,
+        (upload_timestamp, upload_timestamp),
+    )
+    range_start, range_end = cursor.fetchone()
+    partition_name = f"{table_name}_{range_start:%Y%m}"
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {partition_name}
+            PARTITION OF {table_name} FOR VALUES FROM (%s) TO (%s);
+        """,
+        (range_start, range_end),
+    )
+    cursor.close()
+    return partition_name
+
+
+def migrate_table(connection, table_name):
+    """
+    Brings an existing, unindexed engagement table up to the managed schema.
+
+    Duplicate (engagement_id, creation_date) rows are removed (the first loaded
+    row is kept), then the UNIQUE constraint and the reporting indexes are added.
+    Safe to run more than once.
+
+    Returns:
+        int: Number of duplicate rows removed.
+    """
+    cursor = connection.cursor()
+    # Index the key first so the duplicate scan below is not quadratic
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS {table_name}_engagement_key_idx
+            ON {table_name} (engagement_id, creation_date);
+        """)
+    cursor.execute(f"""
+        DELETE FROM {table_name} AS a
+        USING {table_name} AS b
+        WHERE a.engagement_id = b.engagement_id
+        AND a.creation_date = b.creation_date
+        AND a.ctid > b.ctid;
+        """)
+    rows_removed = max(cursor.rowcount, 0)
+    cursor.execute(f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = '{table_name}_engagement_key'
+            ) THEN
+                ALTER TABLE {table_name}
+                    ADD CONSTRAINT {table_name}_engagement_key
+                    UNIQUE (engagement_id, creation_date);
+            END IF;
+        END $$;
+        DROP INDEX IF EXISTS {table_name}_engagement_key_idx;
+        {_index_ddl(table_name)}""")
+    connection.commit()
+    cursor.close()
+    logging.info(f"Migrated {table_name}: {rows_removed} duplicate rows removed")
+    return rows_removed
+
+
+def ensure_engagement_key(connection, table_name):
+    """
+    Migrates a table created before the dedup key existed (see migrate_table),
+    so the loaders' ON CONFLICT on (engagement_id, creation_date) has its
+    UNIQUE constraint to resolve against. CREATE TABLE IF NOT EXISTS leaves
+    existing tables as they are.
+
+    Returns:
+        bool: True if the table had to be migrated.
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = %s::regclass AND conname = %s;
+        """,
+        (table_name, f"{table_name}_engagement_key"),
+    )
+    has_key = cursor.fetchone() is not None
+    cursor.close()
+    if has_key:
+        return False
+    logging.info(f"{table_name} has no engagement key, migrating it")
+    migrate_table(connection, table_name)
+    return True
+
+
+def create_change_table_if_not_exists(connection, table_name):
+    """
+    Creates the change feed table for an engagement table, `<table_name>_changes`,
+    with one row per engagement added, changed or removed by each upload.
+    """
+    changes_table = f"{table_name}_changes"
+    cursor = connection.cursor()
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {changes_table} (
+        upload_timestamp TIMESTAMP,
+        upload_user TEXT,
+        engagement_id TEXT,
+        creation_date TIMESTAMP,
+        change_type TEXT,
+        changed_fields TEXT
     );
+    CREATE INDEX IF NOT EXISTS {changes_table}_upload_timestamp_idx
+        ON {changes_table} (upload_timestamp);
+    CREATE INDEX IF NOT EXISTS {changes_table}_engagement_key_idx
+        ON {changes_table} (engagement_id, creation_date);
+    """)
+    cursor.close()
+    return changes_table
+
+
+def record_changes(connection, change_feed, table_name, upload_timestamp, upload_user):
     """
-    cursor.execute(create_table_query)
+    COPYs a change feed from utils.delta.compute_delta into `<table_name>_changes`.
+    Does not commit.
+
+    Returns:
+        int: Number of change rows written.
+    """
+    changes_table = f"{table_name}_changes"
+    columns = ["upload_timestamp", "upload_user"] + CHANGE_FEED_COLUMNS
+    buffer = io.StringIO()
+    change_feed.assign(upload_timestamp=upload_timestamp, upload_user=upload_user)[
+        columns
+    ].to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S")
+    buffer.seek(0)
+    cursor = connection.cursor()
+    cursor.copy_expert(
+        f"COPY {changes_table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
     cursor.close()
+    return len(change_feed)
 
 
 # TODO: #10 Reorder the columns into a more logical order
@@ -70,19 +313,336 @@ def insert_data(connection, df, table_name, upload_timestamp, upload_user):
     cursor.close()
 
 
-def load_data_to_db(df, table_name, upload_timestamp, upload_user):
+def database_columns(columns):
+    """
+    Returns the database column names of a processed frame's columns, which
+    are matched to ENGAGEMENT_COLUMNS by position.
+    """
+    return ENGAGEMENT_COLUMNS[: len(columns)]
+
+
+def _copy_buffer(df, upload_timestamp, upload_user):
+    """
+    Serialises the processed DataFrame into an in-memory CSV buffer for COPY.
+
+    Columns are matched to ENGAGEMENT_COLUMNS by position, the same way
+    insert_data does. Date columns are written straight from datetime64 and
+    missing values (NaT, <NA>, None) become empty fields, which COPY reads as
+    NULL.
+    """
+    df_copy = df.set_axis(database_columns(df.columns), axis=1).assign(
+        upload_timestamp=upload_timestamp, upload_user=upload_user
+    )
+    for col in INTEGER_COLUMNS:
+        if pd.api.types.is_float_dtype(df_copy[col]):
+            df_copy[col] = df_copy[col].astype("Int64")
+
+    buffer = io.StringIO()
+    df_copy[ENGAGEMENT_COLUMNS].to_csv(
+        buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S"
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def _stage_rows(cursor, df, table_name, upload_timestamp, upload_user):
+    """
+    Creates a temporary staging table shaped like table_name, dropped on commit,
+    and COPYs the DataFrame into it.
+
+    Returns:
+        str: The staging table name.
+    """
+    staging_table = f"{table_name}_staging"
+    cursor.execute(f"""
+        CREATE TEMP TABLE {staging_table}
+        (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP;
+        """)
+    cursor.copy_expert(
+        f"COPY {staging_table} ({', '.join(ENGAGEMENT_COLUMNS)}) "
+        f"FROM STDIN WITH (FORMAT csv)",
+        _copy_buffer(df, upload_timestamp, upload_user),
+    )
+    return staging_table
+
+
+def bulk_insert_data(
+    connection, df, table_name, upload_timestamp, upload_user, partitioned=False
+):
+    """
+    Streams the DataFrame into a temporary staging table with COPY FROM STDIN and
+    merges it into the target table with a single set-based INSERT.
+
+    Rows whose (engagement_id, creation_date) already exist in the target table,
+    or appear more than once in the upload, are skipped. Conflicts are resolved
+    with ON CONFLICT against the table's unique key; partitioned tables have no
+    unique key, so a NOT EXISTS check against the key index is used instead.
+
+    Returns:
+        tuple: (rows_inserted, rows_skipped)
+    """
+    cursor = connection.cursor()
+    staging_table = _stage_rows(cursor, df, table_name, upload_timestamp, upload_user)
+    columns = ", ".join(ENGAGEMENT_COLUMNS)
+    if partitioned:
+        merge_query = f"""
+        INSERT INTO {table_name} ({columns})
+        SELECT DISTINCT ON (s.engagement_id, s.creation_date) {columns}
+        FROM {staging_table} AS s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table_name} AS t
+            WHERE t.engagement_id = s.engagement_id
+            AND t.creation_date = s.creation_date
+        );
+        """
+    else:
+        merge_query = f"""
+        INSERT INTO {table_name} ({columns})
+        SELECT {columns} FROM {staging_table}
+        ON CONFLICT (engagement_id, creation_date) DO NOTHING;
+        """
+    cursor.execute(merge_query)
+    rows_inserted = max(cursor.rowcount, 0)
+    connection.commit()
+    cursor.close()
+
+    rows_skipped = len(df) - rows_inserted
+    logging.info(
+        f"Bulk loaded {table_name}: {rows_inserted} rows inserted, {rows_skipped} skipped"
+    )
+    return rows_inserted, rows_skipped
+
+
+def upsert_data(
+    connection, df, table_name, upload_timestamp, upload_user, partitioned=False
+):
+    """
+    Like bulk_insert_data, but rows whose (engagement_id, creation_date) already
+    exist are updated with the uploaded values instead of skipped. Used by the
+    delta loader, which only passes new and changed rows.
+
+    Does not commit; the caller commits once the change feed is written too.
+
+    Returns:
+        tuple: (rows_inserted, rows_updated)
+    """
+    cursor = connection.cursor()
+    staging_table = _stage_rows(cursor, df, table_name, upload_timestamp, upload_user)
+    columns = ", ".join(ENGAGEMENT_COLUMNS)
+    value_columns = [
+        col
+        for col in ENGAGEMENT_COLUMNS
+        if col not in ("engagement_id", "creation_date")
+    ]
+    staged_rows = f"""
+        SELECT DISTINCT ON (engagement_id, creation_date) {columns}
+        FROM {staging_table}
+    """
+    if partitioned:
+        set_clause = ", ".join(f"{col} = s.{col}" for col in value_columns)
+        cursor.execute(f"""
+            UPDATE {table_name} AS t SET {set_clause}
+            FROM ({staged_rows}) AS s
+            WHERE t.engagement_id = s.engagement_id
+            AND t.creation_date = s.creation_date;
+            """)
+        rows_updated = max(cursor.rowcount, 0)
+        cursor.execute(f"""
+            INSERT INTO {table_name} ({columns})
+            SELECT {columns} FROM ({staged_rows}) AS s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table_name} AS t
+                WHERE t.engagement_id = s.engagement_id
+                AND t.creation_date = s.creation_date
+            );
+            """)
+        rows_inserted = max(cursor.rowcount, 0)
+    else:
+        set_clause = ", ".join(f"{col} = EXCLUDED.{col}" for col in value_columns)
+        # xmax is 0 for freshly inserted rows and set for updated ones
+        cursor.execute(f"""
+            INSERT INTO {table_name} ({columns})
+            {staged_rows}
+            ON CONFLICT (engagement_id, creation_date) DO UPDATE SET {set_clause}
+            RETURNING (xmax = 0);
+            """)
+        inserted_flags = [row[0] for row in cursor.fetchall()]
+        rows_inserted = sum(inserted_flags)
+        rows_updated = len(inserted_flags) - rows_inserted
+    cursor.close()
+    return rows_inserted, rows_updated
+
+
+def load_data_to_db(
+    df,
+    table_name,
+    upload_timestamp,
+    upload_user,
+    bulk=True,
+    partitioned=False,
+    notify=None,
+):
+    """
+    Loads the processed DataFrame into the database and refreshes the reporting
+    summary for this upload (see utils.aggregates).
+
+    Args:
+        bulk (bool, optional): If True, load through COPY and a set-based merge
+            (bulk_insert_data). If False, fall back to row-by-row inserts
+            (insert_data). Defaults to True.
+        partitioned (bool, optional): If True, the table is created range
+            partitioned by upload_timestamp and the monthly partition for this
+            upload is created before loading. Defaults to False.
+        notify (callable, optional): Called with (message, category) to report
+            the outcome. Defaults to flask.flash; background jobs pass their own.
+
+    Returns:
+        tuple: (rows_inserted, rows_skipped), or None if the load failed. The
+            row-by-row path does not count skipped rows and reports (len(df), 0).
+    """
+    if notify is None:
+        notify = flash
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
+        with get_pool().connection() as connection:
+            rows_inserted, rows_skipped = _load_with_connection(
+                connection,
+                df,
+                table_name,
+                upload_timestamp,
+                upload_user,
+                bulk,
+                partitioned,
+            )
+        notify(
+            f"Data loaded into the database successfully. "
+            f"Rows inserted: {rows_inserted}, rows skipped: {rows_skipped}.",
+            "success",
         )
-        create_table_if_not_exists(connection, table_name)
-        insert_data(connection, df, table_name, upload_timestamp, upload_user)
-        connection.close()
-        flash("Data loaded into the database successfully.", "success")
+        return rows_inserted, rows_skipped
     except Exception as e:
-        flash(f"Error loading data into database: {str(e)}", "danger")
+        notify(f"Error loading data into database: {str(e)}", "danger")
         logging.error(f"Error loading data into database: {str(e)}")
+
+
+def _load_with_connection(
+    connection, df, table_name, upload_timestamp, upload_user, bulk, partitioned
+):
+    if partitioned:
+        create_table_if_not_exists(connection, table_name, partitioned=True)
+        create_upload_partition(connection, table_name, upload_timestamp)
+    else:
+        create_table_if_not_exists(connection, table_name)
+        ensure_engagement_key(connection, table_name)
+    with stage("db_insert", rows_in=len(df)) as record:
+        if bulk:
+            rows_inserted, rows_skipped = bulk_insert_data(
+                connection,
+                df,
+                table_name,
+                upload_timestamp,
+                upload_user,
+                partitioned=partitioned,
+            )
+        else:
+            insert_data(connection, df, table_name, upload_timestamp, upload_user)
+            rows_inserted, rows_skipped = len(df), 0
+        record.rows_out = rows_inserted
+    write_upload_summary(connection, table_name, df, upload_timestamp)
+    connection.commit()
+    return rows_inserted, rows_skipped
+
+
+def load_delta_to_db(
+    df,
+    table_name,
+    upload_timestamp,
+    upload_user,
+    snapshot_folder,
+    snapshot_name,
+    partitioned=False,
+    notify=None,
+    label=None,
+):
+    """
+    Loads only what changed since the last upload into the database.
+
+    The processed DataFrame is compared with the snapshot saved by the previous
+    load (see utils.delta.compute_delta). New and changed rows are upserted and
+    the change feed, including engagements no longer in the list, is written to
+    `<table_name>_changes` and the reporting summary is refreshed, all in the
+    same transaction. The snapshot is replaced only after the commit, so a
+    failed load is retried in full.
+
+    Args:
+        snapshot_folder (str): Directory holding the snapshots.
+        snapshot_name (str): Snapshot to compare with, e.g. one per table and
+            service line so uploads for different service lines do not report
+            each other's engagements as removed.
+        partitioned (bool, optional): As for load_data_to_db. Defaults to False.
+        notify (callable, optional): As for load_data_to_db. Defaults to
+            flask.flash.
+        label (str, optional): Prefix for the messages, e.g. the service line
+            when one upload is loaded per service line.
+
+    Returns:
+        dict: Counts of added, changed, removed and unchanged engagements, or
+            None if the load failed.
+    """
+    prefix = f"{label}: " if label else ""
+    if notify is None:
+        notify = flash
+    try:
+        rows, change_feed, snapshot = compute_delta(
+            df,
+            load_snapshot(snapshot_folder, snapshot_name),
+            column_names=dict(zip(df.columns, database_columns(df.columns))),
+        )
+        counts = delta_counts(change_feed, len(snapshot))
+        with get_pool().connection() as connection:
+            create_table_if_not_exists(connection, table_name, partitioned=partitioned)
+            if partitioned:
+                create_upload_partition(connection, table_name, upload_timestamp)
+            else:
+                ensure_engagement_key(connection, table_name)
+            create_change_table_if_not_exists(connection, table_name)
+            record_changes(
+                connection, change_feed, table_name, upload_timestamp, upload_user
+            )
+            if not rows.empty:
+                with stage("db_insert", rows_in=len(rows)) as record:
+                    rows_inserted, rows_updated = upsert_data(
+                        connection,
+                        rows,
+                        table_name,
+                        upload_timestamp,
+                        upload_user,
+                        partitioned=partitioned,
+                    )
+                    record.rows_out = rows_inserted + rows_updated
+            write_upload_summary(connection, table_name, df, upload_timestamp)
+            connection.commit()
+        save_snapshot(snapshot, snapshot_folder, snapshot_name)
+        logging.info(f"Delta loaded {table_name} ({snapshot_name}): {counts}")
+        notify(
+            f"{prefix}Data loaded into the database successfully. "
+            f"Added: {counts['added']}, changed: {counts['changed']}, "
+            f"removed from list: {counts['removed']}, "
+            f"unchanged: {counts['unchanged']}.",
+            "success",
+        )
+        return counts
+    except Exception as e:
+        notify(f"{prefix}Error loading data into database: {str(e)}", "danger")
+        logging.error(f"{prefix}Error loading data into database: {str(e)}")
+
+
+# Migrate an existing table to the managed schema:
+# python -m utils.database engagement_data
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    with get_pool().connection() as connection:
+        migrate_table(
+            connection, sys.argv[1] if len(sys.argv) > 1 else "engagement_data"
+        )
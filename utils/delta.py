@@ -0,0 +1,204 @@
+import logging
+import os
+import pandas as pd
+from utils.cache import find_frame, read_frame, write_frame
+
+# An engagement is identified by the same key the database deduplicates on
+KEY_COLS = ["engagement_id", "creation_date"]
+
+# Recalculated from the report date on every upload, so comparing them would
+# mark every row as changed each week
+DERIVED_COLS = ["report_date", "etc_age"]
+
+HASH_COL = "row_hash"
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+CHANGE_FEED_COLUMNS = KEY_COLS + ["change_type", "changed_fields"]
+
+
+def compare_columns(df):
+    """
+    Returns the columns of a processed frame whose values are compared between
+    uploads: everything except the key and the derived columns.
+    """
+    return [
+        col for col in df.columns if col not in KEY_COLS + DERIVED_COLS + [HASH_COL]
+    ]
+
+
+def canonical_values(df, columns):
+    """
+    Returns df[columns] with one dtype per kind of value, so the same list
+    compares equal however it was read: the streaming and cache readers return
+    ID columns such as engagement_partner_gui as text where pd.read_excel and
+    read_csv return integers.
+
+    Dates are brought to one datetime64 resolution. Every other column becomes
+    pandas' string dtype, with integral floats (integers with missing values)
+    written without a decimal point, and categoricals as their values.
+    """
+    values = {}
+    for col in columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values[col] = series.astype("datetime64[ns]")
+            continue
+        if pd.api.types.is_float_dtype(series):
+            present = series.dropna()
+            if (present == present.round()).all():
+                series = series.astype("Int64")
+        values[col] = series.astype("string")
+    return pd.DataFrame(values, index=df.index)
+
+
+def row_hashes(df, columns=None):
+    """
+    Returns a 64-bit hash of each row's values in columns, for comparing rows
+    between uploads without comparing every field. Values are hashed in their
+    canonical_values form, so compacted and uncompacted frames, and frames from
+    different readers, hash the same.
+    """
+    if columns is None:
+        columns = compare_columns(df)
+    return pd.util.hash_pandas_object(canonical_values(df, columns), index=False)
+
+
+def _changed_fields(current, previous, columns, column_names=None):
+    """
+    Returns a comma separated list of the columns that differ between aligned
+    rows of current and previous, renamed through column_names if given.
+    """
+    current = canonical_values(current, columns).astype(object).reset_index(drop=True)
+    previous = canonical_values(previous, columns).astype(object)
+    previous = previous.reset_index(drop=True)
+    differs = (current != previous) & ~(current.isna() & previous.isna())
+    names = pd.Index([(column_names or {}).get(col, col) for col in columns])
+    return differs.dot(names + ",").str.rstrip(",")
+
+
+def compute_delta(current, previous=None, column_names=None):
+    """
+    Compares a processed upload with the last loaded snapshot.
+
+    Rows are matched on KEY_COLS and compared by the hash of their
+    compare_columns. Duplicate keys in the upload keep their first row, as the
+    database loaders do.
+
+    Args:
+        current (pd.DataFrame): Output of process_engagement_data.
+        previous (pd.DataFrame, optional): The last snapshot, as returned by
+            load_snapshot. If None, every row is new.
+        column_names (dict, optional): Names to record in changed_fields for
+            the frame's columns, e.g. the database column names. Defaults to
+            the frame's own column names.
+
+    Returns:
+        tuple: (rows, change_feed, snapshot). rows holds the new and changed
+            rows of current to write. change_feed has CHANGE_FEED_COLUMNS with
+            one row per added, changed or removed engagement. snapshot is current
+            with its row hashes, to be saved once the rows have been loaded.
+    """
+    columns = compare_columns(current)
+    # Keys are matched in canonical form, as values are hashed
+    snapshot = current.assign(**canonical_values(current, KEY_COLS))
+    snapshot = snapshot.drop_duplicates(KEY_COLS).reset_index(drop=True)
+    snapshot = snapshot.assign(**{HASH_COL: row_hashes(snapshot, columns).values})
+
+    if previous is None or previous.empty:
+        change_feed = snapshot[KEY_COLS].assign(change_type=ADDED, changed_fields="")
+        return snapshot.drop(columns=HASH_COL), change_feed, snapshot
+
+    previous = previous.assign(**canonical_values(previous, KEY_COLS))
+    previous = previous.drop_duplicates(KEY_COLS).reset_index(drop=True)
+    # Rehashed rather than read from the snapshot, so snapshots saved by another
+    # reader or an older version of row_hashes still compare by value
+    previous_values = previous.reindex(columns=columns)
+    previous = previous.assign(
+        **{HASH_COL: row_hashes(previous_values, columns).values}
+    )
+
+    merged = snapshot[KEY_COLS + [HASH_COL]].merge(
+        previous[KEY_COLS + [HASH_COL]],
+        on=KEY_COLS,
+        how="outer",
+        suffixes=("", "_previous"),
+        indicator=True,
+        sort=False,
+    )
+    added = merged["_merge"] == "left_only"
+    removed = merged["_merge"] == "right_only"
+    changed = (merged["_merge"] == "both") & (
+        merged[HASH_COL] != merged[f"{HASH_COL}_previous"]
+    )
+
+    changed_keys = merged.loc[changed, KEY_COLS]
+    current_changed = changed_keys.merge(snapshot, on=KEY_COLS, how="left")
+    previous_changed = changed_keys.merge(previous, on=KEY_COLS, how="left")
+    shared_columns = [col for col in columns if col in previous.columns]
+
+    change_feed = pd.concat(
+        [
+            merged.loc[added, KEY_COLS].assign(change_type=ADDED, changed_fields=""),
+            changed_keys.assign(
+                change_type=CHANGED,
+                changed_fields=_changed_fields(
+                    current_changed, previous_changed, shared_columns, column_names
+                ).values,
+            ),
+            merged.loc[removed, KEY_COLS].assign(
+                change_type=REMOVED, changed_fields=""
+            ),
+        ],
+        ignore_index=True,
+    )
+
+    write_keys = merged.loc[added | changed, KEY_COLS]
+    rows = write_keys.merge(snapshot, on=KEY_COLS, how="left").drop(columns=HASH_COL)
+    return rows[current.columns], change_feed, snapshot
+
+
+def _snapshot_stem(folder, name):
+    return os.path.join(folder, f"{name}.snapshot")
+
+
+def load_snapshot(folder, name):
+    """
+    Returns the last loaded snapshot called name, or None if there is none.
+    """
+    path = find_frame(_snapshot_stem(folder, name))
+    if path is None:
+        return None
+    return read_frame(path)
+
+
+def save_snapshot(snapshot, folder, name):
+    """
+    Replaces the snapshot called name. Only call this once the delta has been
+    committed, so a failed load is retried against the old snapshot.
+
+    Returns:
+        str: The path written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = write_frame(snapshot, _snapshot_stem(folder, name))
+    logging.info(f"Saved snapshot {name} ({len(snapshot)} rows) to {path}")
+    return path
+
+
+def delta_counts(change_feed, total_rows):
+    """
+    Summarises a change feed as counts of added, changed, removed and unchanged
+    engagements.
+    """
+    counts = change_feed["change_type"].value_counts()
+    added = int(counts.get(ADDED, 0))
+    changed = int(counts.get(CHANGED, 0))
+    return {
+        ADDED: added,
+        CHANGED: changed,
+        REMOVED: int(counts.get(REMOVED, 0)),
+        "unchanged": total_rows - added - changed,
+    }
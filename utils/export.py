@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+import time
+from utils.cache import find_frame, read_frame, to_parquet_safe, write_frame
+from utils.metrics import stage
+
+# Download formats, checked in order so "csv.gz" is matched before "csv"
+EXPORT_FORMATS = ["xlsx", "csv.gz", "csv", "parquet"]
+
+# Suffix of the stored frame that exports are generated from
+FRAME_SUFFIX = ".frame"
+
+XLSX_CHUNK_ROWS = 10000
+
+
+def save_processed_frame(df, folder, name):
+    """
+    Stores a processed frame so downloads in any format can be generated from it
+    later, instead of exporting on every process call.
+
+    Returns:
+        str: The path of the stored frame.
+    """
+    with stage("save", rows_in=len(df)) as record:
+        path = write_frame(df, os.path.join(folder, f"{name}{FRAME_SUFFIX}"))
+        record.rows_out = len(df)
+    return path
+
+
+def find_processed_frame(folder, name):
+    """
+    Returns the path of a frame stored by save_processed_frame, or None.
+    """
+    return find_frame(os.path.join(folder, f"{name}{FRAME_SUFFIX}"))
+
+
+def split_export_name(filename):
+    """
+    Splits a download filename into its base name and export format.
+
+    Returns:
+        tuple: (base name, format), or (filename, None) if the extension is not
+            an export format.
+    """
+    for fmt in EXPORT_FORMATS:
+        if filename.endswith(f".{fmt}"):
+            return filename[: -len(fmt) - 1], fmt
+    return filename, None
+
+
+def _xlsx_rows(df):
+    """
+    Yields the header and then each row of df as a list, in chunks of
+    XLSX_CHUNK_ROWS rows, with missing values as None.
+    """
+    yield list(df.columns)
+    for start in range(0, len(df), XLSX_CHUNK_ROWS):
+        chunk = df.iloc[start : start + XLSX_CHUNK_ROWS].astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False):
+            yield list(row)
+
+
+def _write_xlsx(df, path):
+    """
+    Writes xlsx row by row without holding the whole sheet in memory:
+    XlsxWriter in constant_memory mode if it is installed, otherwise an
+    openpyxl write-only workbook.
+
+    constant_memory only keeps the current row, so rows are written here in
+    order rather than through DataFrame.to_excel, which writes column by column.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(
+            path,
+            {"constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"},
+        )
+        sheet = workbook.add_worksheet()
+        for i, row in enumerate(_xlsx_rows(df)):
+            sheet.write_row(i, 0, row)
+        workbook.close()
+        return
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in _xlsx_rows(df):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_export(df, path, fmt):
+    """
+    Writes df to path in one of EXPORT_FORMATS.
+    """
+    if fmt == "xlsx":
+        _write_xlsx(df, path)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "csv.gz":
+        df.to_csv(path, index=False, compression="gzip")
+    elif fmt == "parquet":
+        to_parquet_safe(df).to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def ensure_export(folder, filename):
+    """
+    Returns the path of a download, generating it from the stored processed
+    frame on first request.
+
+    The export is written to a temporary file and renamed into place, so
+    concurrent first downloads never see a partial file.
+
+    Returns:
+        str or None: The path to send, or None if filename is neither an
+            existing file nor an export of a stored frame.
+    """
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        return path
+
+    name, fmt = split_export_name(filename)
+    frame_path = find_processed_frame(folder, name)
+    if fmt is None or frame_path is None:
+        return None
+
+    start_time = time.time()
+    df = read_frame(frame_path)
+    # Keep the extension on the temporary file, writers choose by it
+    temp_path = os.path.join(
+        folder, f"{name}.{os.getpid()}-{threading.get_ident()}.tmp.{fmt}"
+    )
+    with stage("export", rows_in=len(df)) as record:
+        write_export(df, temp_path, fmt)
+        record.rows_out = len(df)
+    os.replace(temp_path, path)
+    logging.info(
+        f"Generated {filename} ({len(df)} rows) in {time.time() - start_time:.2f} seconds"
+    )
+    return path
@@ -0,0 +1,150 @@
+import io
+import logging
+from flask import flash
+from utils.aggregates import query_frame
+from utils.pool import get_pool
+
+# Columns of process_engagement_data output kept per engagement and report date
+HISTORY_COLUMNS = [
+    "engagement_id",
+    "report_date",
+    "engagement_partner",
+    "engagement_partner_service_line",
+    "last_etc_date",
+    "etc_age",
+]
+
+
+def create_history_table_if_not_exists(connection, table_name):
+    """
+    Creates `<table_name>_etc_history`, a narrow append-only table with one row
+    per engagement and report date.
+
+    The primary key serves per-engagement trend lookups and the partner index
+    serves per-partner ones.
+    """
+    history_table = f"{table_name}_etc_history"
+    cursor = connection.cursor()
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {history_table} (
+        engagement_id TEXT,
+        report_date TIMESTAMP,
+        engagement_partner TEXT,
+        engagement_partner_service_line TEXT,
+        last_etc_date TIMESTAMP,
+        etc_age INTEGER,
+        PRIMARY KEY (engagement_id, report_date)
+    );
+    CREATE INDEX IF NOT EXISTS {history_table}_partner_idx
+        ON {history_table} (engagement_partner, report_date);
+    """)
+    cursor.close()
+    return history_table
+
+
+def append_etc_history(connection, df, table_name):
+    """
+    Appends the ETC age of each engagement in a processed DataFrame for its
+    report date. Engagements already recorded for that report date are left
+    as they are, so re-running an upload adds nothing. Does not commit.
+
+    Returns:
+        int: Number of history rows added.
+    """
+    history_table = create_history_table_if_not_exists(connection, table_name)
+    staging_table = f"{history_table}_staging"
+    columns = ", ".join(HISTORY_COLUMNS)
+
+    buffer = io.StringIO()
+    df[HISTORY_COLUMNS].to_csv(
+        buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S"
+    )
+    buffer.seek(0)
+
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        CREATE TEMP TABLE {staging_table}
+        (LIKE {history_table} INCLUDING DEFAULTS) ON COMMIT DROP;
+        """)
+    cursor.copy_expert(
+        f"COPY {staging_table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+    cursor.execute(f"""
+        INSERT INTO {history_table} ({columns})
+        SELECT {columns} FROM {staging_table}
+        ON CONFLICT (engagement_id, report_date) DO NOTHING;
+        """)
+    rows_added = max(cursor.rowcount, 0)
+    cursor.close()
+    return rows_added
+
+
+def load_etc_history(df, table_name, notify=None):
+    """
+    Records the ETC ages of a processed DataFrame in the history table.
+
+    Args:
+        notify (callable, optional): Called with (message, category) if the
+            load fails. Defaults to flask.flash.
+
+    Returns:
+        int: Number of history rows added, or None if the load failed.
+    """
+    if notify is None:
+        notify = flash
+    try:
+        with get_pool().connection() as connection:
+            rows_added = append_etc_history(connection, df, table_name)
+            connection.commit()
+        logging.info(f"Added {rows_added} rows to {table_name}_etc_history")
+        return rows_added
+    except Exception as e:
+        notify(f"Error recording ETC age history: {str(e)}", "danger")
+        logging.error(f"Error recording ETC age history: {str(e)}")
+
+
+def engagement_etc_trend(connection, table_name, engagement_id, weeks=12):
+    """
+    Returns an engagement's ETC age for its last `weeks` report dates, oldest
+    first.
+    """
+    df = query_frame(
+        connection,
+        f"""
+        SELECT report_date, last_etc_date, etc_age
+        FROM {table_name}_etc_history
+        WHERE engagement_id = %s
+        ORDER BY report_date DESC
+        LIMIT %s;
+        """,
+        (engagement_id, weeks),
+    )
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def partner_etc_trend(connection, table_name, engagement_partner, weeks=12):
+    """
+    Returns, for a partner's last `weeks` report dates (oldest first), the number
+    of engagements and their average and maximum ETC age.
+    """
+    return query_frame(
+        connection,
+        f"""
+        SELECT report_date,
+            COUNT(*) AS engagements,
+            AVG(etc_age)::float AS avg_etc_age,
+            MAX(etc_age) AS max_etc_age
+        FROM {table_name}_etc_history
+        WHERE engagement_partner = %s
+        AND report_date IN (
+            SELECT DISTINCT report_date
+            FROM {table_name}_etc_history
+            WHERE engagement_partner = %s
+            ORDER BY report_date DESC
+            LIMIT %s
+        )
+        GROUP BY report_date
+        ORDER BY report_date;
+        """,
+        (engagement_partner, engagement_partner, weeks),
+    )
@@ -0,0 +1,153 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime
+import logging
+import threading
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """
+    A unit of background work with stage progress, messages for the user and a
+    result once it has finished.
+    """
+
+    def __init__(self, stages=None):
+        self.id = uuid.uuid4().hex
+        self.stages = list(stages or [])
+        self.status = QUEUED
+        self.stage = None
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage):
+        """
+        Marks the job as having reached stage.
+        """
+        with self._lock:
+            if stage not in self.stages:
+                self.stages.append(stage)
+            self.stage = stage
+        logging.info(f"Job {self.id} stage: {stage}")
+
+    def add_message(self, message, category="info"):
+        """
+        Records a message for the user, with the same arguments as flask.flash.
+        """
+        with self._lock:
+            self.messages.append((message, category))
+
+    def to_dict(self):
+        with self._lock:
+            completed = (
+                self.stages.index(self.stage) if self.stage in self.stages else 0
+            )
+            if self.status == DONE:
+                completed = len(self.stages)
+            return {
+                "id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": list(self.stages),
+                "progress": completed / len(self.stages) if self.stages else 0.0,
+                "messages": [message for message, _ in self.messages],
+                "error": self.error,
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at and self.started_at.isoformat(),
+                "finished_at": self.finished_at and self.finished_at.isoformat(),
+            }
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded pool of background worker threads.
+
+    At most max_workers jobs run at once and the rest wait in submission order.
+    With max_workers=0 jobs run inline in submit, which is useful for tests and
+    debugging. Only the most recent max_history jobs are kept for status
+    lookups.
+    """
+
+    def __init__(self, max_workers=2, max_history=100):
+        self.max_workers = max_workers
+        self.max_history = max_history
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+            if max_workers > 0
+            else None
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, stages=None, **kwargs):
+        """
+        Queues fn(job, *args, **kwargs) and returns the Job straight away. The
+        return value of fn becomes job.result; an exception fails the job.
+        """
+        job = Job(stages)
+        self._add(job)
+
+        if self._executor is None:
+            self._run(job, fn, args, kwargs)
+        else:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def add_done(self, result, messages=(), stages=None):
+        """
+        Registers a job that is already done with result, e.g. the output of an
+        earlier identical run, so it is served like any other job.
+        """
+        job = Job(stages)
+        job.messages = list(messages)
+        job.result = result
+        job.stage = job.stages[-1] if job.stages else None
+        job.started_at = job.finished_at = datetime.now()
+        job.status = DONE
+        self._add(job)
+        return job
+
+    def _add(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = datetime.now()
+
+    def get(self, job_id):
+        """
+        Returns the job with job_id, or None if it is unknown or has expired.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "max_workers": self.max_workers,
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+        }
@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+APP_LOG = "app.log"
+MAX_LOG_BYTES = 10 * 1024**2
+LOG_BACKUPS = 5
+# How long a run waits for its log file to be written out when it ends
+RUN_LOG_TIMEOUT = 5
+
+_current_run = ContextVar("run_log", default=None)
+_listener = None
+_queue_handler = None
+_run_handler = None
+_lock = threading.Lock()
+
+
+class _RunLogFilter(logging.Filter):
+    """
+    Tags each record with the run log of the context that logged it, if any.
+    """
+
+    def filter(self, record):
+        if not hasattr(record, "run_log"):
+            record.run_log = _current_run.get()
+        return True
+
+
+class RunLogHandler(logging.Handler):
+    """
+    Writes records tagged with a run log (see run_log) to that run's file.
+    Files are opened on their first record and closed by a close record, so all
+    file I/O happens on the listener thread.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._files = {}
+
+    def emit(self, record):
+        path = getattr(record, "run_log", None)
+        if path is None:
+            return
+        closed = getattr(record, "run_log_closed", None)
+        if closed is not None:
+            handler = self._files.pop(path, None)
+            if handler is not None:
+                handler.close()
+            closed.set()
+            return
+        handler = self._files.get(path)
+        if handler is None:
+            handler = logging.FileHandler(path, encoding="utf-8")
+            handler.setFormatter(self.formatter)
+            self._files[path] = handler
+        handler.emit(record)
+
+    def close(self):
+        for handler in self._files.values():
+            handler.close()
+        self._files.clear()
+        super().close()
+
+
+class _AppLogFilter(logging.Filter):
+    """
+    Keeps run log close records out of the shared application log.
+    """
+
+    def filter(self, record):
+        return getattr(record, "run_log_closed", None) is None
+
+
+def configure_logging(
+    log_folder, level=logging.INFO, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS
+):
+    """
+    Sends the root logger's records through a queue to a background listener,
+    which writes them to a rotating app.log in log_folder and to the file of
+    the run that logged them. Logging calls only put the record on the queue,
+    so requests and jobs never wait on file I/O.
+
+    Safe to call more than once; only the first call configures logging.
+
+    Returns:
+        QueueListener: The listener, stopped when the interpreter exits.
+    """
+    global _listener, _queue_handler, _run_handler
+    with _lock:
+        if _listener is not None:
+            return _listener
+        os.makedirs(log_folder, exist_ok=True)
+        formatter = logging.Formatter(LOG_FORMAT)
+        app_handler = RotatingFileHandler(
+            os.path.join(log_folder, APP_LOG),
+            maxBytes=max_bytes,
+            backupCount=backups,
+            encoding="utf-8",
+        )
+        app_handler.setFormatter(formatter)
+        app_handler.addFilter(_AppLogFilter())
+        _run_handler = RunLogHandler()
+        _run_handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        _queue_handler = QueueHandler(log_queue)
+        _queue_handler.addFilter(_RunLogFilter())
+        root = logging.getLogger()
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+
+        _listener = QueueListener(
+            log_queue, app_handler, _run_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """
+    Writes out the queued records and stops the listener started by
+    configure_logging.
+    """
+    global _listener, _queue_handler, _run_handler
+    with _lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = _queue_handler = _run_handler = None
+
+
+@contextmanager
+def run_log(log_folder, name):
+    """
+    Also writes everything logged in this context (this thread, or a job
+    running in it) to its own file, log_folder/name, leaving app.log and other
+    runs' logging untouched:
+
+        with run_log(app.config["LOG_FOLDER"], f"process_{job.id}.log"):
+            process_engagement_data(...)
+
+    On exit, waits up to RUN_LOG_TIMEOUT seconds for the listener to finish
+    the file, so it is complete once the run is. Without configure_logging no
+    file is written.
+    """
+    path = os.path.join(log_folder, name)
+    token = _current_run.set(path)
+    try:
+        yield path
+    finally:
+        _current_run.reset(token)
+        handler = _queue_handler
+        if handler is not None:
+            closed = threading.Event()
+            record = logging.makeLogRecord(
+                {"run_log": path, "run_log_closed": closed, "levelno": logging.INFO}
+            )
+            handler.handle(record)
+            closed.wait(RUN_LOG_TIMEOUT)
@@ -0,0 +1,420 @@
+import argparse
+import logging
+import os
+import smtplib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import formataddr, parseaddr
+from itertools import groupby
+import numpy as np
+import pandas as pd
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from werkzeug.utils import secure_filename
+
+TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates"
+)
+
+# ETCs are expected every ETC_INTERVAL_DAYS. They are due soon in the last
+# DUE_SOON_DAYS before that and escalated ESCALATION_DAYS after it.
+ETC_INTERVAL_DAYS = 30
+DUE_SOON_DAYS = 7
+ESCALATION_DAYS = 28
+
+ESCALATION = "escalation"
+OVERDUE = "overdue"
+DUE_SOON = "due_soon"
+DUE_LATER = "due_later"
+EXCEPTION = "exception"
+
+# Statuses that make an engagement worth an email
+STALE_STATUSES = [ESCALATION, OVERDUE, DUE_SOON]
+
+MANAGER = "manager"
+PARTNER = "partner"
+
+# Section wording from _other/email/tables_code.html
+SECTIONS = {
+    MANAGER: [
+        {
+            "status": ESCALATION,
+            "title": "ETCs that have been escalated to your EP",
+            "intro": "<strong>Please take immediate action. </strong> An ETC for the following engagement(s) in your portfolio is more than 4 weeks overdue. You must submit an ETC, apply for an exception or move the code to pre-closing.",
+            "css_class": "escalation-table",
+            "color": "#A30000",
+        },
+        {
+            "status": OVERDUE,
+            "title": "Overdue ETCs",
+            "intro": "An ETC for the following engagement(s) in your portfolio is now overdue, please <em>submit an ETC as soon as possible</em> or apply for an exception.",
+            "css_class": "overdue-table",
+            "color": "#BD910F",
+        },
+        {
+            "status": DUE_SOON,
+            "title": "ETCs Due Soon",
+            "intro": "An ETC for the following engagement(s) in your portfolio is due within the next week, please start preparing your ETC.",
+            "css_class": "due-table",
+            "color": None,
+        },
+    ],
+    PARTNER: [
+        {
+            "status": ESCALATION,
+            "title": "Overdue ETCs That Require Your Attention",
+            "intro": "<strong>Please take immediate action. </strong>&nbsp; An ETC for the following engagement(s) in your portfolio is more than 4 weeks overdue. Please work with your Engagement Manager(s) to resolve urgently.",
+            "css_class": "escalation-table",
+            "color": "#A30000",
+        },
+        {
+            "status": OVERDUE,
+            "title": "Overdue ETCs",
+            "intro": "An ETC for the following engagement(s) in your portfolio is 0-4 weeks overdue, please encourage your team to submit an ETC or apply for an exception as soon as possible",
+            "css_class": "overdue-table",
+            "color": None,
+        },
+        {
+            "status": DUE_SOON,
+            "title": "ETCs Due Soon",
+            "intro": "<em>For information only, </em> An ETC for the following engagement(s) in your portfolio is due within the next week, the EM has been informed",
+            "css_class": "info-table",
+            "color": None,
+        },
+        {
+            "status": DUE_LATER,
+            "title": "ETCs Due Later",
+            "intro": "<em>For information only, </em> The ETC for the following engagement(s) are up to date.",
+            "css_class": "info-table",
+            "color": None,
+        },
+        {
+            "status": EXCEPTION,
+            "title": "ETCs with active exception",
+            "intro": "An ETC for the following engagement(s) in your portfolio has an active exception:",
+            "css_class": "info-table",
+            "color": None,
+        },
+    ],
+}
+
+ROLES = {
+    MANAGER: {
+        "name_col": "engagement_manager",
+        "gui_col": "engagement_manager_gui",
+        "template": "email/outreach_manager.html",
+        "columns": [
+            ("engagement_id", "Engagement ID"),
+            ("engagement", "Engagement"),
+            ("client", "Client"),
+            ("last_etc_date", "Last ETC Date"),
+            ("etc_age", "ETC Age (days)"),
+        ],
+    },
+    PARTNER: {
+        "name_col": "engagement_partner",
+        "gui_col": "engagement_partner_gui",
+        "template": "email/outreach_partner.html",
+        "columns": [
+            ("engagement_id", "Engagement ID"),
+            ("engagement", "Engagement"),
+            ("client", "Client"),
+            ("engagement_manager", "Engagement Manager"),
+            ("last_etc_date", "Last ETC Date"),
+            ("etc_age", "ETC Age (days)"),
+        ],
+    },
+}
+
+# Delegate email columns added by utils.sharepoint.enrich_engagements
+DELEGATE_EMAIL_COLS = ["delegate1_email", "delegate2_email", "delegate3_email"]
+
+SUBJECT = "{name}, this is your weekly reminder for upcoming or overdue ETCs"
+
+
+def etc_status(df, interval_days=ETC_INTERVAL_DAYS):
+    """
+    Classifies each engagement's ETC from its etc_age as ESCALATION, OVERDUE,
+    DUE_SOON or DUE_LATER. Engagements with an exception running past the
+    report date (exception_until, from enrich_engagements) are EXCEPTION.
+    Engagements without an ETC age get None.
+
+    Returns:
+        pd.Series: The status of each row.
+    """
+    etc_age = df["etc_age"].astype("Float64")
+    conditions = [
+        etc_age > interval_days + ESCALATION_DAYS,
+        etc_age > interval_days,
+        etc_age > interval_days - DUE_SOON_DAYS,
+        etc_age.notna(),
+    ]
+    choices = [ESCALATION, OVERDUE, DUE_SOON, DUE_LATER]
+    if "exception_until" in df.columns:
+        active_exception = pd.to_datetime(df["exception_until"]) >= df["report_date"]
+        conditions.insert(0, active_exception.fillna(False))
+        choices.insert(0, EXCEPTION)
+    conditions = [
+        np.asarray(condition.fillna(False), dtype=bool) for condition in conditions
+    ]
+    status = np.select(conditions, choices, default="")
+    return pd.Series(status, index=df.index).replace("", None)
+
+
+def build_outreach_emails(
+    df, role, address_book=None, sender=None, interval_days=ETC_INTERVAL_DAYS
+):
+    """
+    Builds the context of one outreach email per Engagement Manager or Partner
+    with at least one ETC that is escalated, overdue or due soon.
+
+    Table values are formatted for the whole frame at once and split per
+    recipient in one pass, so the contexts are plain strings ready to be
+    rendered in other processes.
+
+    Args:
+        df (pd.DataFrame): Processed engagement data, optionally enriched with
+            delegates and exceptions.
+        role (str): MANAGER or PARTNER.
+        address_book (dict, optional): GUI or name to email address. Recipients
+            not in it get an email without an address, which is written to the
+            outbox but not sent.
+        sender (str, optional): From address. Defaults to the MAIL_FROM
+            environment variable.
+
+    Returns:
+        list: One dict per recipient with recipient_name, to, cc, sender,
+            subject and sections.
+    """
+    address_book = address_book or {}
+    sender = sender or os.getenv("MAIL_FROM", "")
+    spec = ROLES[role]
+    columns = [col for col, _ in spec["columns"]]
+
+    table = pd.DataFrame(index=df.index)
+    for col in columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime("%d/%m/%Y")
+        table[col] = values.astype("string").fillna("")
+    table["status"] = etc_status(df, interval_days)
+    table["recipient_name"] = df[spec["name_col"]].astype("string")
+    table["recipient_gui"] = df[spec["gui_col"]].astype("string").fillna("")
+    delegate_cols = [col for col in DELEGATE_EMAIL_COLS if col in df.columns]
+    if role == MANAGER:
+        table[delegate_cols] = df[delegate_cols]
+    else:
+        delegate_cols = []
+    table = table[table["recipient_name"].notna()].sort_values(
+        ["recipient_name", "recipient_gui"], kind="stable"
+    )
+
+    # Indexing pandas per recipient and section dominates for thousands of
+    # recipients, so the rows are split from plain lists instead
+    recipients = list(
+        zip(table["recipient_name"].tolist(), table["recipient_gui"].tolist())
+    )
+    statuses = table["status"].tolist()
+    values = table[columns].values.tolist()
+    delegates = table[delegate_cols].values.tolist()
+    labels = [label for _, label in spec["columns"]]
+
+    emails = []
+    for (name, gui), positions in groupby(
+        range(len(recipients)), key=recipients.__getitem__
+    ):
+        positions = list(positions)
+        rows_by_status = {}
+        for i in positions:
+            rows_by_status.setdefault(statuses[i], []).append(values[i])
+        # Only recipients with something to act on
+        if not any(status in rows_by_status for status in STALE_STATUSES):
+            continue
+
+        address = address_book.get(gui) or address_book.get(name) or ""
+        emails.append(
+            {
+                "recipient_name": name,
+                "to": formataddr((name, address)) if address else name,
+                "cc": sorted(
+                    {
+                        str(email)
+                        for i in positions
+                        for email in delegates[i]
+                        if not pd.isna(email)
+                    }
+                ),
+                "sender": sender,
+                "subject": SUBJECT.format(name=name),
+                "sections": [
+                    {
+                        **section,
+                        "columns": labels,
+                        "rows": rows_by_status[section["status"]],
+                    }
+                    for section in SECTIONS[role]
+                    if section["status"] in rows_by_status
+                ],
+            }
+        )
+    return emails
+
+
+_environment = None
+
+
+def _get_template(template_name):
+    """
+    Returns a compiled template. The Jinja environment is created once per
+    process and caches compiled templates, so each template is compiled once.
+    """
+    global _environment
+    if _environment is None:
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=select_autoescape(["html"]),
+        )
+    return _environment.get_template(template_name)
+
+
+def render_message(context, template_name):
+    """
+    Renders an outreach email context into a MIME message.
+
+    Returns:
+        EmailMessage: The message with a plain-text part and the HTML body.
+    """
+    html = _get_template(template_name).render(logo="", **context)
+    message = EmailMessage()
+    message["Subject"] = context["subject"]
+    if context["sender"]:
+        message["From"] = context["sender"]
+    message["To"] = context["to"]
+    if context["cc"]:
+        message["Cc"] = ", ".join(context["cc"])
+    message.set_content(
+        f"{context['subject']}\n\nThis email is best viewed in an HTML capable client."
+    )
+    # base64 encodes much faster than quoted-printable for long HTML lines
+    message.add_alternative(html, subtype="html", cte="base64")
+    return message
+
+
+def _write_message(args):
+    context, template_name, path = args
+    with open(path, "wb") as f:
+        f.write(render_message(context, template_name).as_bytes(policy=SMTP))
+    return path
+
+
+def render_outbox(emails, role, outbox_dir, workers=None):
+    """
+    Renders each email and writes it to outbox_dir as an .eml file.
+
+    Rendering is spread over `workers` processes (default: one per CPU), each
+    compiling the template once in its initializer. With workers=0 emails are
+    rendered in this process.
+
+    Returns:
+        list: The paths written, in the order of emails.
+    """
+    os.makedirs(outbox_dir, exist_ok=True)
+    template_name = ROLES[role]["template"]
+    jobs = [
+        (
+            email,
+            template_name,
+            os.path.join(
+                outbox_dir,
+                f"{i:05d}_{role}_{secure_filename(email['recipient_name']) or 'unnamed'}.eml",
+            ),
+        )
+        for i, email in enumerate(emails)
+    ]
+
+    start_time = time.time()
+    if workers == 0 or len(jobs) <= 1:
+        paths = [_write_message(job) for job in jobs]
+    else:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_get_template, initargs=(template_name,)
+        ) as executor:
+            paths = list(
+                executor.map(
+                    _write_message, jobs, chunksize=max(1, len(jobs) // (workers * 4))
+                )
+            )
+    logging.info(
+        f"Rendered {len(paths)} {role} emails to {outbox_dir} in {time.time() - start_time:.2f} seconds"
+    )
+    return paths
+
+
+def send_outbox(
+    paths, host="localhost", port=25, username=None, password=None, starttls=False
+):
+    """
+    Sends .eml files over a single SMTP connection. Messages without an email
+    address in To are skipped.
+
+    A local debug server can be used for testing, e.g.
+    `python -m aiosmtpd -n -l localhost:1025`.
+
+    Returns:
+        int: Number of messages sent.
+    """
+    from email import message_from_binary_file
+    from email.policy import default
+
+    sent = 0
+    with smtplib.SMTP(host, port) as smtp:
+        if starttls:
+            smtp.starttls()
+        if username:
+            smtp.login(username, password)
+        for path in paths:
+            with open(path, "rb") as f:
+                message = message_from_binary_file(f, policy=default)
+            if "@" not in parseaddr(str(message["To"]))[1]:
+                logging.warning(f"Not sending {path}: no recipient address")
+                continue
+            smtp.send_message(message)
+            sent += 1
+    logging.info(f"Sent {sent} of {len(paths)} emails through {host}:{port}")
+    return sent
+
+
+# Example usage:
+# python -m utils.mailer "./data/loading/processed_data_20240601_120000_outreach.frame.parquet" --role manager --outbox "./data/outbox"
+if __name__ == "__main__":
+    from utils.cache import read_frame
+
+    parser = argparse.ArgumentParser(
+        description="Render outreach emails for stale ETCs to an outbox directory."
+    )
+    parser.add_argument("frame", help="Processed or outreach frame (.parquet, .pkl)")
+    parser.add_argument("--role", choices=[MANAGER, PARTNER], default=MANAGER)
+    parser.add_argument("--outbox", default="./data/outbox")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--address-book", help="CSV with key (GUI or name) and email columns"
+    )
+    parser.add_argument("--send", action="store_true")
+    parser.add_argument("--smtp-host", default=os.getenv("SMTP_HOST", "localhost"))
+    parser.add_argument(
+        "--smtp-port", type=int, default=int(os.getenv("SMTP_PORT", 25))
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    address_book = None
+    if args.address_book:
+        book = pd.read_csv(args.address_book, dtype=str)
+        address_book = dict(zip(book["key"], book["email"]))
+    emails = build_outreach_emails(read_frame(args.frame), args.role, address_book)
+    paths = render_outbox(emails, args.role, args.outbox, args.workers)
+    print(f"Rendered {len(paths)} emails to {args.outbox}")
+    if args.send:
+        print(f"Sent {send_outbox(paths, args.smtp_host, args.smtp_port)} emails")
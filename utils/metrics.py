@@ -0,0 +1,242 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DURATION_BUCKETS = [
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+]  # fmt: skip
+ROW_BUCKETS = [0, 10, 100, 1000, 10000, 50000, 100000, 250000, 500000, 1000000]
+# 32 MB to 8 GB
+MEMORY_BUCKETS = [2**n * 1024**2 for n in range(5, 14)]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = {}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    A Prometheus histogram: per label set, the count of observations at or
+    below each bucket bound, their sum and their count. Safe to observe from
+    the job queue's threads.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = list(buckets) + [float("inf")]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def sums(self):
+        """
+        Returns the sum of observations per label set, keyed by label values.
+        """
+        with self._lock:
+            return {key: total for key, (_, total) in self._values.items()}
+
+    def samples(self):
+        with self._lock:
+            values = {
+                key: (list(counts), total)
+                for key, (counts, total) in self._values.items()
+            }
+        for key, (counts, total) in sorted(values.items()):
+            labels = list(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class Gauge:
+    """
+    A Prometheus gauge holding the last value set per label set.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def set(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            labels = list(zip(self.label_names, key))
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+STAGE_DURATION = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Time spent in each processing stage.",
+    ["stage"],
+    DURATION_BUCKETS,
+)
+STAGE_ROWS_IN = Histogram(
+    "pipeline_stage_rows_in",
+    "Rows going into each processing stage.",
+    ["stage"],
+    ROW_BUCKETS,
+)
+STAGE_ROWS_OUT = Histogram(
+    "pipeline_stage_rows_out",
+    "Rows coming out of each processing stage.",
+    ["stage"],
+    ROW_BUCKETS,
+)
+STAGE_MEMORY = Histogram(
+    "pipeline_stage_resident_memory_bytes",
+    "Process resident memory at the end of each processing stage.",
+    ["stage"],
+    MEMORY_BUCKETS,
+)
+PEAK_MEMORY = Gauge(
+    "process_peak_resident_memory_bytes", "Peak resident memory of the process."
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time taken to handle each request, by route.",
+    ["method", "route", "status"],
+    DURATION_BUCKETS,
+)
+
+
+def resident_memory():
+    """
+    Returns the resident memory of the process in bytes, or None if neither
+    psutil nor the resource module is available.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is not None:
+        # ru_maxrss is the peak rather than the current value, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+def peak_memory():
+    """
+    Returns the peak resident memory of the process in bytes, or None.
+    """
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    if psutil is not None:
+        # peak_wset on Windows
+        return getattr(psutil.Process().memory_info(), "peak_wset", None)
+    return None
+
+
+class StageRecord:
+    """
+    Handed out by stage(); set rows_out (and rows_in if not known up front)
+    before the block ends.
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.start_time = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Records the duration, rows in and out and memory of a processing stage.
+    process_engagement_data records read, filter, prune, dates and calc, the
+    export module export and the database loaders db_insert:
+
+        with stage("dates", rows_in=len(df)) as record:
+            df = parse_date_columns(df, date_cols)
+            record.rows_out = len(df)
+
+    Memory is for the whole process, so stages of jobs running at the same
+    time see each other's memory. A stage that raises is not recorded.
+    """
+    record = StageRecord(name, rows_in)
+    yield record
+    STAGE_DURATION.observe(record.elapsed(), stage=name)
+    if record.rows_in is not None:
+        STAGE_ROWS_IN.observe(record.rows_in, stage=name)
+    if record.rows_out is not None:
+        STAGE_ROWS_OUT.observe(record.rows_out, stage=name)
+    memory = resident_memory()
+    if memory is not None:
+        STAGE_MEMORY.observe(memory, stage=name)
+    logging.debug(
+        f"Stage {name}: {record.elapsed():.2f} seconds, rows {record.rows_in} -> {record.rows_out}, memory {memory}"
+    )
+
+
+def observe_request(method, route, status, seconds):
+    REQUEST_LATENCY.observe(seconds, method=method, route=route, status=status)
+
+
+def render_metrics():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    peak = peak_memory()
+    if peak is not None:
+        PEAK_MEMORY.set(peak)
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
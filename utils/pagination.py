@@ -0,0 +1,93 @@
+import json
+import os
+from functools import lru_cache
+import pandas as pd
+from utils.cache import read_frame
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 500
+
+
+@lru_cache(maxsize=4)
+def _read_frame_cached(path, mtime):
+    return read_frame(path)
+
+
+def load_frame(path):
+    """
+    Reads a cached frame for paging. The last few frames read are kept in
+    memory, keyed by path and modification time, so paging through a table
+    does not re-read the file for every page.
+    """
+    return _read_frame_cached(path, os.path.getmtime(path))
+
+
+def frame_columns(path):
+    """
+    Returns the column names of a cached frame without reading its rows.
+    """
+    return list(read_frame(path, nrows=1).columns)
+
+
+def _search_mask(df, search):
+    """
+    Returns a mask of the rows where any column contains search, case
+    insensitively. Categorical columns are searched through their categories
+    rather than every row.
+    """
+    mask = pd.Series(False, index=df.index)
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.astype(str)
+            matches = categories.str.contains(search, case=False, regex=False)
+            mask |= values.cat.codes.isin(matches.nonzero()[0])
+        else:
+            mask |= (
+                values.astype(str).str.contains(
+                    search, case=False, regex=False, na=False
+                )
+                & values.notna()
+            )
+    return mask
+
+
+def page_frame(
+    df, search=None, sort=None, order="asc", offset=0, limit=DEFAULT_PAGE_SIZE
+):
+    """
+    Returns one page of df in the shape bootstrap-table expects for server-side
+    pagination.
+
+    Args:
+        search (str, optional): Keep only rows where any column contains this
+            text, case insensitively.
+        sort (str, optional): Column to sort by. Unknown columns are ignored.
+        order (str, optional): 'asc' or 'desc'. Defaults to 'asc'.
+        offset (int, optional): Index of the first row of the page. Defaults to 0.
+        limit (int, optional): Rows per page, at most MAX_PAGE_SIZE. Defaults to
+            DEFAULT_PAGE_SIZE.
+
+    Returns:
+        dict: total (rows matching search), totalNotFiltered (all rows) and
+            rows (the page as a list of records, dates in ISO format and
+            missing values as None).
+    """
+    total_not_filtered = len(df)
+    if search:
+        df = df[_search_mask(df, search)]
+    if sort in df.columns:
+        df = df.sort_values(
+            sort, ascending=order != "desc", na_position="last", kind="stable"
+        )
+
+    offset = max(int(offset), 0)
+    limit = min(max(int(limit), 0), MAX_PAGE_SIZE)
+    page = df.iloc[offset : offset + limit]
+    return {
+        "total": len(df),
+        "totalNotFiltered": total_not_filtered,
+        "rows": json.loads(
+            page.to_json(orient="records", date_format="iso", date_unit="s")
+        ),
+    }
@@ -0,0 +1,239 @@
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections with a hard size limit, acquire
+    timeouts and a health check on checkout.
+
+    Connections are opened lazily up to maxconn. When the pool is exhausted,
+    callers wait up to `timeout` seconds for a connection to be returned before
+    a PoolError is raised. Connections that have been idle for longer than
+    `health_check_interval` seconds are pinged with SELECT 1 before being
+    handed out and replaced if the ping fails.
+
+    Args:
+        maxconn (int, optional): Maximum number of open connections. Defaults to 10.
+        timeout (float, optional): Seconds to wait for a free connection. Defaults to 30.
+        health_check_interval (float, optional): Idle seconds after which a
+            connection is pinged on checkout. Defaults to 30.
+        **connect_kwargs: Passed through to psycopg2.connect.
+    """
+
+    def __init__(
+        self, maxconn=10, timeout=30, health_check_interval=30, **connect_kwargs
+    ):
+        if maxconn < 1:
+            raise ValueError("maxconn must be at least 1.")
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Condition()
+        self._idle = []  # (connection, returned_at)
+        self._in_use = set()
+        self._closed = False
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._failed_health_checks = 0
+        self._checkout_seconds_total = 0.0
+        self._checkout_seconds_max = 0.0
+
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _is_healthy(self, connection, returned_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """
+        Checks a connection out of the pool, opening a new one if the pool is
+        below maxconn and waiting up to `timeout` seconds otherwise.
+
+        Raises:
+            PoolError: If the pool is closed or no connection frees up in time.
+        """
+        start_time = time.monotonic()
+        deadline = start_time + self.timeout
+        with self._lock:
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                    break
+                if len(self._in_use) < self.maxconn:
+                    connection, returned_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(
+                        f"timed out after {self.timeout}s waiting for a connection "
+                        f"({self.maxconn} in use)"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+            if waited:
+                self._waits += 1
+            # Reserve the slot before connecting outside the lock
+            placeholder = object()
+            self._in_use.add(placeholder)
+
+        try:
+            if connection is not None and not self._is_healthy(connection, returned_at):
+                with self._lock:
+                    self._failed_health_checks += 1
+                logging.warning("Discarding unhealthy pooled database connection")
+                if not connection.closed:
+                    connection.close()
+                connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            with self._lock:
+                self._in_use.discard(placeholder)
+                self._lock.notify()
+            raise
+
+        elapsed = time.monotonic() - start_time
+        with self._lock:
+            self._in_use.discard(placeholder)
+            self._in_use.add(connection)
+            self._checkouts += 1
+            self._checkout_seconds_total += elapsed
+            self._checkout_seconds_max = max(self._checkout_seconds_max, elapsed)
+        return connection
+
+    def putconn(self, connection, close=False):
+        """
+        Returns a connection to the pool. Any open transaction is rolled back.
+        Broken connections, or close=True, discard the connection instead.
+        """
+        if not close and not connection.closed:
+            try:
+                status = connection.get_transaction_status()
+                if status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except psycopg2.Error:
+                close = True
+
+        with self._lock:
+            self._in_use.discard(connection)
+            if close or connection.closed or self._closed:
+                if not connection.closed:
+                    connection.close()
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks a connection out and always returns it. The
+        connection is rolled back on error.
+        """
+        connection = self.getconn()
+        try:
+            yield connection
+        except Exception:
+            if not connection.closed:
+                connection.rollback()
+            raise
+        finally:
+            self.putconn(connection)
+
+    def closeall(self):
+        """
+        Closes idle connections and stops handing out new ones. Connections that
+        are checked out are closed when they are returned.
+        """
+        with self._lock:
+            self._closed = True
+            for connection, _ in self._idle:
+                if not connection.closed:
+                    connection.close()
+            self._idle = []
+            self._lock.notify_all()
+
+    def stats(self):
+        """
+        Returns pool metrics for sizing: connections in use and idle, how often
+        callers had to wait or timed out, and checkout latency.
+        """
+        with self._lock:
+            return {
+                "max_size": self.maxconn,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "failed_health_checks": self._failed_health_checks,
+                "checkout_latency_avg_ms": (
+                    1000 * self._checkout_seconds_total / self._checkouts
+                    if self._checkouts
+                    else 0.0
+                ),
+                "checkout_latency_max_ms": 1000 * self._checkout_seconds_max,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use from the
+    DB_* environment variables. DB_POOL_MAX, DB_POOL_TIMEOUT and
+    DB_POOL_HEALTH_CHECK set the pool size, acquire timeout and health check
+    interval.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+                health_check_interval=float(os.getenv("DB_POOL_HEALTH_CHECK", 30)),
+                dbname=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                host=os.getenv("DB_HOST"),
+                port=os.getenv("DB_PORT"),
+            )
+        return _pool
+
+
+def close_pool():
+    """
+    Closes the process-wide pool. The next get_pool() call creates a new one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
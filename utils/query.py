@@ -0,0 +1,197 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from utils.database import ENGAGEMENT_COLUMNS, KEYSET_ORDER
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 1000
+
+
+def parse_fields(fields=None):
+    """
+    Returns the requested columns of the engagement table, in the order given,
+    from a list or a comma-separated string. Defaults to every column.
+
+    Raises:
+        ValueError: If a field is not a column of the engagement table.
+    """
+    if not fields:
+        return list(ENGAGEMENT_COLUMNS)
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    fields = [field.strip() for field in fields if field.strip()]
+    unknown = [field for field in fields if field not in ENGAGEMENT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _select_columns(fields):
+    # The keyset columns are always selected, to build the next cursor
+    return list(dict.fromkeys(fields + KEYSET_ORDER))
+
+
+def encode_cursor(row_key):
+    """
+    Returns an opaque cursor for the page after the row with the given
+    KEYSET_ORDER values.
+    """
+    text = json.dumps([_json_value(value) for value in row_key])
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns the KEYSET_ORDER values of a cursor from encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        upload_timestamp, engagement_id, creation_date = json.loads(text)
+        return (
+            datetime.fromisoformat(upload_timestamp),
+            engagement_id,
+            datetime.fromisoformat(creation_date),
+        )
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def build_engagement_query(
+    table_name,
+    fields,
+    service_line=None,
+    partner_guis=None,
+    manager_guis=None,
+    etc_age_min=None,
+    etc_age_max=None,
+    upload_from=None,
+    upload_to=None,
+    cursor=None,
+    limit=DEFAULT_LIMIT,
+):
+    """
+    Builds the query for one page of the engagement table in KEYSET_ORDER.
+
+    Pages start after the cursor's row instead of at an OFFSET, so each page
+    is a range read of the matching keyset index however deep it is. One row
+    more than limit is selected, to tell whether there is a next page.
+
+    Rows with a NULL in any KEYSET_ORDER column have no place in that order (a
+    row comparison with NULL is never true, and a cursor could not resume
+    after them), so they are left out of every page.
+
+    Args:
+        fields (list): Columns to return, from parse_fields.
+        service_line (str, optional): Engagement partner service line.
+        partner_guis, manager_guis (list, optional): Engagement partner or
+            manager GUIs, any of which match.
+        etc_age_min, etc_age_max (int, optional): Inclusive ETC age range.
+        upload_from, upload_to (datetime, optional): Inclusive upload range.
+        cursor (str, optional): next_cursor of the previous page.
+        limit (int, optional): Rows per page, at most MAX_LIMIT.
+
+    Returns:
+        tuple: (query, params)
+
+    Raises:
+        ValueError: If the cursor or limit is invalid.
+    """
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}.")
+    conditions = [f"{column} IS NOT NULL" for column in KEYSET_ORDER]
+    params = []
+    filters = [
+        ("engagement_partner_service_line", "=", service_line),
+        ("engagement_partner_gui", "=", partner_guis or None),
+        ("engagement_manager_gui", "=", manager_guis or None),
+        ("etc_age", ">=", etc_age_min),
+        ("etc_age", "<=", etc_age_max),
+        ("upload_timestamp", ">=", upload_from),
+        ("upload_timestamp", "<=", upload_to),
+    ]
+    # A column matched to a single value leads the row comparison below, so
+    # its (column, keyset) index is read from the cursor on in page order
+    prefix = []
+    for column, operator, value in filters:
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)) and len(value) > 1:
+            conditions.append(f"{column} = ANY(%s)")
+            params.append(list(value))
+            continue
+        value = value[0] if isinstance(value, (list, tuple)) else value
+        conditions.append(f"{column} {operator} %s")
+        params.append(value)
+        if operator == "=" and not prefix:
+            prefix = [(column, value)]
+    keyset = ", ".join(KEYSET_ORDER)
+    if cursor:
+        row = ", ".join([column for column, _ in prefix] + KEYSET_ORDER)
+        placeholders = ", ".join(["%s"] * (len(prefix) + len(KEYSET_ORDER)))
+        conditions.append(f"({row}) > ({placeholders})")
+        params.extend([value for _, value in prefix] + list(decode_cursor(cursor)))
+
+    columns = _select_columns(fields)
+    where = f"WHERE {' AND '.join(conditions)}"
+    query = f"""
+        SELECT {', '.join(columns)}
+        FROM {table_name}
+        {where}
+        ORDER BY {keyset}
+        LIMIT %s;
+        """
+    params.append(limit + 1)
+    return query, params
+
+
+def stream_engagements(connection, query, params, fields, limit=DEFAULT_LIMIT):
+    """
+    Runs a query from build_engagement_query on a server-side cursor and
+    yields the page as JSON text, one chunk per FETCH_SIZE rows:
+
+        {"data": [{field: value, ...}, ...], "count": n, "next_cursor": "..."}
+
+    Only `fields` are included in each row. next_cursor is null on the last
+    page. Dates are ISO 8601 strings.
+    """
+    columns = _select_columns(fields)
+    positions = [columns.index(field) for field in fields]
+    key_positions = [columns.index(col) for col in KEYSET_ORDER]
+    cursor = connection.cursor(name="engagement_page")
+    try:
+        cursor.execute(query, params)
+        yield '{"data": ['
+        count = 0
+        last_row = None
+        while count < limit:
+            rows = cursor.fetchmany(min(FETCH_SIZE, limit - count))
+            if not rows:
+                break
+            yield ("" if count == 0 else ", ") + ", ".join(
+                json.dumps(
+                    {field: _json_value(row[i]) for field, i in zip(fields, positions)}
+                )
+                for row in rows
+            )
+            count += len(rows)
+            last_row = rows[-1]
+        # The query selects one row more than limit when there is a next page
+        next_cursor = None
+        if count == limit and cursor.fetchone() is not None:
+            next_cursor = encode_cursor([last_row[i] for i in key_positions])
+        yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'
+    finally:
+        cursor.close()
+        connection.rollback()
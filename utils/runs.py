@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+
+def run_fingerprint(
+    content_hash, start_row, service_line, export_log=False, enrichment=None
+):
+    """
+    Returns the fingerprint of a /process run: the upload's content hash and
+    everything else that changes its output. Service lines are matched case
+    insensitively, as process_engagement_data does.
+
+    Args:
+        export_log (bool, optional): Whether the run log is linked.
+        enrichment (dict, optional): The version of each list the outreach
+            export is joined to, as from sharepoint_versions.
+    """
+    key = json.dumps(
+        [
+            content_hash,
+            int(start_row),
+            service_line.strip().lower(),
+            bool(export_log),
+            enrichment or {},
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class RunRegistry:
+    """
+    Uploads by content hash and completed /process runs by fingerprint, kept in
+    a JSON file so repeats are recognised across restarts, plus the jobs still
+    running per fingerprint.
+
+    Writes go to a temporary file that is renamed into place. Safe to use from
+    the job queue's threads; one registry file per app process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Reentrant: with an inline job queue, start_job records the run while
+        # claim still holds the lock
+        self._lock = threading.RLock()
+        self._active = {}
+        self._data = {"uploads": {}, "runs": {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._data.update(json.load(f))
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._data, f, indent=2, default=str)
+        os.replace(temp_path, self.path)
+
+    def register_upload(self, content_hash, file_path):
+        """
+        Returns the stored path of an earlier upload with the same contents if
+        it still exists, otherwise records file_path for content_hash and
+        returns it.
+        """
+        with self._lock:
+            existing = self._data["uploads"].get(content_hash)
+            if existing and os.path.exists(existing):
+                return existing
+            self._data["uploads"][content_hash] = file_path
+            self._save()
+            return file_path
+
+    def completed(self, fingerprint):
+        """
+        Returns the entry recorded for a completed run, or None.
+        """
+        with self._lock:
+            return self._data["runs"].get(fingerprint)
+
+    def record(self, fingerprint, result, messages):
+        """
+        Records a completed run's result and messages for later repeats.
+        """
+        entry = {
+            "result": result,
+            "messages": [list(message) for message in messages],
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._data["runs"][fingerprint] = entry
+            self._save()
+        logging.info(f"Recorded run {fingerprint}")
+        return entry
+
+    def forget(self, fingerprint):
+        """
+        Drops a completed run, e.g. when its outputs have been deleted.
+        """
+        with self._lock:
+            if self._data["runs"].pop(fingerprint, None) is not None:
+                self._save()
+
+    def referenced_names(self):
+        """
+        Returns the names of the processed frames, exports and logs that
+        completed runs serve, so storage keeps them while the run is cached.
+        """
+        names = set()
+        with self._lock:
+            for entry in self._data["runs"].values():
+                result = entry["result"]
+                names.update(
+                    name
+                    for name in (
+                        result.get("download_name"),
+                        result.get("outreach_name"),
+                        result.get("log_link"),
+                    )
+                    if name
+                )
+                for line in result.get("service_line_results") or []:
+                    names.add(line["download_name"])
+        return names
+
+    def expire(self, before):
+        """
+        Drops runs completed before the given datetime, so their outputs can be
+        evicted, and uploads whose file no longer exists.
+        """
+        cutoff = before.isoformat(timespec="seconds")
+        with self._lock:
+            runs = self._data["runs"]
+            expired = [
+                key for key, entry in runs.items() if entry["completed_at"] < cutoff
+            ]
+            for key in expired:
+                del runs[key]
+            uploads = self._data["uploads"]
+            missing = [key for key, path in uploads.items() if not os.path.exists(path)]
+            for key in missing:
+                del uploads[key]
+            if expired or missing:
+                self._save()
+        return len(expired)
+
+    def claim(self, fingerprint, start_job):
+        """
+        Returns the job already running for fingerprint, or starts one with
+        start_job() and returns it, so identical requests arriving together
+        share a single run.
+        """
+        with self._lock:
+            job = self._active.get(fingerprint)
+            if job is not None and job.finished_at is None:
+                return job
+            self._active = {
+                key: active
+                for key, active in self._active.items()
+                if active.finished_at is None
+            }
+            job = start_job()
+            if job.finished_at is None:
+                self._active[fingerprint] = job
+            return job
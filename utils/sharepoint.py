@@ -0,0 +1,294 @@
+import io
+import logging
+import time
+import pandas as pd
+from flask import flash
+from utils.aggregates import query_frame
+from utils.cache import CSV_EXTENSIONS, file_extension
+from utils.pool import get_pool
+
+DELEGATES = "delegates"
+EXCEPTIONS = "exceptions"
+
+# (SharePoint field, Power Query name, column) for each field kept from the
+# SharePoint lists, as selected and renamed in _other/pq. Exports may use
+# either the SharePoint field names or the Power Query names.
+DELEGATE_FIELDS = [
+    ("Title", "EngagementID", "engagement_id"),
+    ("field_15", "Delegate1", "delegate1"),
+    ("field_16", "Delegate1Email", "delegate1_email"),
+    ("field_17", "Delegate1Date", "delegate1_date"),
+    ("field_18", "Delegate2Date", "delegate2_date"),
+    ("field_19", "Delegate3Date", "delegate3_date"),
+    ("field_20", "Delegate2", "delegate2"),
+    ("field_21", "Delegate2Email", "delegate2_email"),
+    ("field_22", "Delegate3", "delegate3"),
+    ("field_23", "Delegate3Email", "delegate3_email"),
+]
+
+EXCEPTION_FIELDS = [
+    ("Title", "EngagementID", "engagement_id"),
+    ("field_24", "ExceptionCategory", "exception_category"),
+    ("field_25", "ExceptionUntil", "exception_until"),
+    ("field_26", "ExceptionExplanation", "exception_explanation"),
+    ("field_27", "ExceptionReviewedbyPartner", "exception_reviewed_by_partner"),
+    ("field_28", "ExceptionApprovedbyFinance", "exception_approved_by_finance"),
+    ("field_29", "ExceptionDateApproved", "exception_date_approved"),
+    ("field_30", "Comments", "comments"),
+    (
+        "ExceptionSubmitterEmail",
+        "ExceptionSubmitterEmail",
+        "exception_submitter_email",
+    ),
+]
+
+# Per kind: fields, the columns of which at least one must be filled for a row
+# to be kept, date columns, and the database table
+SHAREPOINT_LISTS = {
+    DELEGATES: {
+        "fields": DELEGATE_FIELDS,
+        "required_any": ["delegate1", "delegate2", "delegate3"],
+        "date_cols": ["delegate1_date", "delegate2_date", "delegate3_date"],
+        "table": "delegates",
+    },
+    EXCEPTIONS: {
+        "fields": EXCEPTION_FIELDS,
+        "required_any": ["exception_category", "exception_until"],
+        "date_cols": ["exception_until", "exception_date_approved"],
+        "table": "etc_exceptions",
+    },
+}
+
+
+def engagement_key(values):
+    """
+    Returns Engagement IDs as stripped strings, so IDs read as numbers from
+    one file match the same IDs read as text from another.
+    """
+    if pd.api.types.is_float_dtype(values):
+        values = values.astype("Int64")
+    return values.astype("string").str.strip()
+
+
+def read_sharepoint_export(file_path, kind):
+    """
+    Reads a CSV or Excel export of the delegates or exceptions SharePoint list
+    and cleans it the way the Power Query scripts did: only the list's fields
+    are kept and renamed, rows with none of the required_any columns filled
+    are dropped and dates are parsed.
+
+    Args:
+        file_path (str): The path to the CSV or Excel export.
+        kind (str): DELEGATES or EXCEPTIONS.
+
+    Returns:
+        pd.DataFrame: The cleaned list, one column per field.
+
+    Raises:
+        KeyError: If any field is missing from the export.
+    """
+    spec = SHAREPOINT_LISTS[kind]
+    rename = {}
+    for field, pq_name, column in spec["fields"]:
+        rename[field] = column
+        rename[pq_name] = column
+
+    if file_extension(file_path) in CSV_EXTENSIONS:
+        df = pd.read_csv(file_path, usecols=lambda name: name in rename, dtype=str)
+    else:
+        df = pd.read_excel(file_path, usecols=lambda name: name in rename)
+    df = df.rename(columns=rename)
+
+    columns = [column for _, _, column in spec["fields"]]
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} not in {kind} export {file_path}")
+
+    df = df[columns]
+    df = df[df[spec["required_any"]].notna().any(axis=1)].reset_index(drop=True)
+    df["engagement_id"] = engagement_key(df["engagement_id"])
+    for col in spec["date_cols"]:
+        df[col] = pd.to_datetime(df[col], errors="coerce", format="mixed")
+    return df
+
+
+def create_sharepoint_table_if_not_exists(connection, kind):
+    """
+    Creates the table for a SharePoint list, indexed on engagement_id.
+    """
+    spec = SHAREPOINT_LISTS[kind]
+    table_name = spec["table"]
+    column_ddl = ",\n        ".join(
+        f"{column} {'TIMESTAMP' if column in spec['date_cols'] else 'TEXT'}"
+        for _, _, column in spec["fields"]
+    )
+    cursor = connection.cursor()
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        {column_ddl},
+        upload_timestamp TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS {table_name}_engagement_id_idx
+        ON {table_name} (engagement_id);
+    """)
+    cursor.close()
+    return table_name
+
+
+def replace_sharepoint_data(connection, df, kind, upload_timestamp):
+    """
+    Replaces the contents of a SharePoint list's table with df using COPY.
+    Each export is the whole list, so the previous contents are removed in the
+    same transaction. Does not commit.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    table_name = create_sharepoint_table_if_not_exists(connection, kind)
+    columns = list(df.columns) + ["upload_timestamp"]
+    buffer = io.StringIO()
+    df.assign(upload_timestamp=upload_timestamp).to_csv(
+        buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S"
+    )
+    buffer.seek(0)
+
+    cursor = connection.cursor()
+    cursor.execute(f"TRUNCATE {table_name};")
+    cursor.copy_expert(
+        f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    cursor.close()
+    return len(df)
+
+
+def load_sharepoint_export(file_path, kind, upload_timestamp, notify=None):
+    """
+    Reads, cleans and loads a delegates or exceptions export into its table.
+
+    Args:
+        notify (callable, optional): Called with (message, category) to report
+            the outcome. Defaults to flask.flash.
+
+    Returns:
+        int: Number of rows loaded, or None if the load failed.
+    """
+    if notify is None:
+        notify = flash
+    try:
+        start_time = time.time()
+        df = read_sharepoint_export(file_path, kind)
+        with get_pool().connection() as connection:
+            rows_loaded = replace_sharepoint_data(
+                connection, df, kind, upload_timestamp
+            )
+            connection.commit()
+        logging.info(
+            f"Loaded {rows_loaded} {kind} from {file_path} in {time.time() - start_time:.2f} seconds"
+        )
+        notify(f"Loaded {rows_loaded} {kind} rows.", "success")
+        return rows_loaded
+    except Exception as e:
+        notify(f"Error loading {kind}: {str(e)}", "danger")
+        logging.error(f"Error loading {kind}: {str(e)}")
+
+
+def read_sharepoint_table(connection, kind):
+    """
+    Returns the loaded rows of a SharePoint list, or None if it has never been
+    loaded.
+    """
+    table_name = SHAREPOINT_LISTS[kind]["table"]
+    cursor = connection.cursor()
+    cursor.execute("SELECT to_regclass(%s);", (table_name,))
+    exists = cursor.fetchone()[0] is not None
+    cursor.close()
+    if not exists:
+        return None
+    columns = [column for _, _, column in SHAREPOINT_LISTS[kind]["fields"]]
+    # In load order, so the latest entry for an engagement comes last
+    return query_frame(
+        connection, f"SELECT {', '.join(columns)} FROM {table_name} ORDER BY ctid;"
+    )
+
+
+def sharepoint_versions():
+    """
+    Returns the version of each loaded SharePoint list: when it was last
+    loaded, None if never, or "unavailable" if the tables cannot be read. A
+    /process run's outreach export changes whenever one of these does.
+    """
+    try:
+        with get_pool().connection() as connection:
+            cursor = connection.cursor()
+            versions = {}
+            for kind, spec in SHAREPOINT_LISTS.items():
+                cursor.execute("SELECT to_regclass(%s);", (spec["table"],))
+                if cursor.fetchone()[0] is None:
+                    versions[kind] = None
+                    continue
+                cursor.execute(
+                    f"SELECT MAX(upload_timestamp), COUNT(*) FROM {spec['table']};"
+                )
+                loaded_at, rows = cursor.fetchone()
+                versions[kind] = f"{loaded_at}:{rows}"
+            cursor.close()
+            return versions
+    except Exception as e:
+        logging.error(f"Error reading delegates and exceptions versions: {str(e)}")
+        return {kind: "unavailable" for kind in SHAREPOINT_LISTS}
+
+
+def read_sharepoint_lists(notify=None):
+    """
+    Reads the loaded delegates and exceptions lists.
+
+    Args:
+        notify (callable, optional): Called with (message, category) if they
+            cannot be read. Defaults to flask.flash.
+
+    Returns:
+        tuple: (delegates, exceptions), each None if never loaded or unreadable.
+    """
+    if notify is None:
+        notify = flash
+    try:
+        with get_pool().connection() as connection:
+            return (
+                read_sharepoint_table(connection, DELEGATES),
+                read_sharepoint_table(connection, EXCEPTIONS),
+            )
+    except Exception as e:
+        notify(f"Error reading delegates and exceptions: {str(e)}", "warning")
+        logging.error(f"Error reading delegates and exceptions: {str(e)}")
+        return None, None
+
+
+def enrich_engagements(df, delegates=None, exceptions=None):
+    """
+    Adds each engagement's delegates and ETC exception to processed engagement
+    data with one left merge per list on engagement_id.
+
+    Engagements listed more than once in a SharePoint list take the last row,
+    i.e. the latest entry in the export.
+
+    Returns:
+        pd.DataFrame: df with the delegate and exception columns added (empty
+            where an engagement has none).
+    """
+    key = engagement_key(df["engagement_id"])
+    enriched = df.assign(_engagement_key=key.values)
+    for kind, lookup in ((DELEGATES, delegates), (EXCEPTIONS, exceptions)):
+        columns = [column for _, _, column in SHAREPOINT_LISTS[kind]["fields"]]
+        if lookup is None:
+            lookup = pd.DataFrame(columns=columns)
+        lookup = (
+            lookup.reindex(columns=columns)
+            .assign(_engagement_key=engagement_key(lookup["engagement_id"]))
+            .drop(columns="engagement_id")
+            .drop_duplicates("_engagement_key", keep="last")
+        )
+        enriched = enriched.merge(
+            lookup, on="_engagement_key", how="left", validate="many_to_one"
+        )
+    return enriched.drop(columns="_engagement_key")
@@ -0,0 +1,359 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Formats that are not already compressed; xlsx, parquet and csv.gz are left as is
+COMPRESSIBLE_EXTENSIONS = [".csv", ".log"]
+COMPRESSED_SUFFIX = ".gz"
+
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_BYTES = 5 * 1024**3
+DEFAULT_COMPRESS_AFTER_DAYS = 2
+# Minimum time between sweeps started by maybe_sweep
+SWEEP_INTERVAL = 10 * 60
+
+
+def artifact_names(path):
+    """
+    Returns the names an artifact can be referenced by: its file name and its
+    stem before the first dot, e.g. processed_data_<ts> for every export and
+    stored frame of that run.
+    """
+    filename = os.path.basename(path)
+    return {filename, filename.split(".")[0]}
+
+
+class StorageManager:
+    """
+    Index of the files the app creates in LOAD_FOLDER and LOG_FOLDER, with
+    their size and last access, kept in a JSON file. sweep() compresses
+    artifacts that have not been used for a while and evicts the least
+    recently used ones by age and total size, skipping files that are pinned
+    (being served or processed) or referenced by a cached run.
+
+    Files the app did not track are never touched. Safe to use from the job
+    queue's threads; one index file per app process.
+    """
+
+    def __init__(
+        self,
+        index_path,
+        max_age_days=DEFAULT_MAX_AGE_DAYS,
+        max_bytes=DEFAULT_MAX_BYTES,
+        compress_after_days=DEFAULT_COMPRESS_AFTER_DAYS,
+        protected=None,
+    ):
+        """
+        Args:
+            protected (callable, optional): Returns the artifact names (see
+                artifact_names) that must be kept, e.g. the outputs of cached
+                runs. Called on each sweep.
+        """
+        self.index_path = index_path
+        self.max_age = timedelta(days=max_age_days)
+        self.max_bytes = max_bytes
+        self.compress_after = timedelta(days=compress_after_days)
+        self.protected = protected or set
+        self._lock = threading.RLock()
+        self._pins = {}
+        self._last_sweep = 0
+        self._index = {}
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self._index = json.load(f)
+
+    def _save(self):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._index, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.index_path)
+
+    @staticmethod
+    def _key(path):
+        return os.path.abspath(path)
+
+    def _stored_path(self, key):
+        entry = self._index[key]
+        return key + COMPRESSED_SUFFIX if entry["compressed"] else key
+
+    def track(self, path):
+        """
+        Adds a file the app has written to the index, or marks it as used.
+        Missing paths are ignored.
+        """
+        if path is None or not os.path.isfile(path):
+            return
+        key = self._key(path)
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or entry["compressed"]:
+                entry = {"created": now, "compressed": False}
+            entry.update(size=os.path.getsize(path), last_access=now)
+            self._index[key] = entry
+            self._save()
+
+    def touch(self, path):
+        """
+        Marks a tracked file as used now, so it is evicted last.
+        """
+        key = self._key(path)
+        with self._lock:
+            if key in self._index:
+                self._index[key]["last_access"] = datetime.now().isoformat(
+                    timespec="seconds"
+                )
+                self._save()
+
+    @contextmanager
+    def pin(self, path):
+        """
+        Keeps path from being compressed or evicted inside the block, e.g. while
+        it is opened for a download or read by a job.
+        """
+        key = self._key(path)
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+
+    def resolve(self, path):
+        """
+        Returns where a file is stored and marks it as used.
+
+        Returns:
+            tuple or None: (stored path, compressed), where a compressed file is
+                gzip data to be decompressed on read; None if neither the file
+                nor a compressed copy exists.
+        """
+        key = self._key(path)
+        with self._lock:
+            if key in self._index and os.path.exists(self._stored_path(key)):
+                self.touch(path)
+                return self._stored_path(key), self._index[key]["compressed"]
+        if os.path.exists(path):
+            return path, False
+        return None
+
+    def restore(self, path):
+        """
+        Decompresses a compressed file back to path, for readers that need the
+        file itself, e.g. reprocessing an upload.
+
+        Returns:
+            bool: True if path exists afterwards.
+        """
+        if path is None:
+            return False
+        key = self._key(path)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None and entry["compressed"]:
+                temp_path = f"{path}.tmp"
+                with gzip.open(key + COMPRESSED_SUFFIX, "rb") as source, open(
+                    temp_path, "wb"
+                ) as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(temp_path, path)
+                os.remove(key + COMPRESSED_SUFFIX)
+                entry.update(compressed=False, size=os.path.getsize(path))
+                self._save()
+                logging.info(f"Restored {path}")
+        self.touch(path)
+        return os.path.exists(path)
+
+    @staticmethod
+    def _gzip(key):
+        # Writes the compressed copy next to the file; no index state is touched
+        temp_path = f"{key}{COMPRESSED_SUFFIX}.tmp"
+        with open(key, "rb") as source, gzip.open(temp_path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        return temp_path
+
+    def _replace_compressed(self, key, temp_path):
+        entry = self._index[key]
+        os.replace(temp_path, key + COMPRESSED_SUFFIX)
+        os.remove(key)
+        size = os.path.getsize(key + COMPRESSED_SUFFIX)
+        logging.info(f"Compressed {key} from {entry['size']} to {size} bytes")
+        entry.update(compressed=True, size=size)
+
+    def _evict(self, key, reason):
+        stored_path = self._stored_path(key)
+        if os.path.exists(stored_path):
+            os.remove(stored_path)
+        entry = self._index.pop(key)
+        logging.info(f"Evicted {stored_path} ({entry['size']} bytes, {reason})")
+        return entry["size"]
+
+    def sweep(self, now=None):
+        """
+        Compresses and evicts tracked files:
+
+        - files no longer on disk are dropped from the index;
+        - compressible files unused for compress_after_days are gzipped;
+        - files unused for max_age_days are deleted;
+        - then the least recently used files are deleted until the total size
+          is within max_bytes.
+
+        Pinned and protected files are skipped at every step. Files are gzipped
+        without holding the index lock; one pinned or rewritten meanwhile is
+        left uncompressed.
+
+        Returns:
+            dict: Counts of files compressed and evicted, bytes freed and the
+                total size tracked afterwards.
+        """
+        now = now or datetime.now()
+        protected = set(self.protected())
+        compressed = evicted = freed = 0
+
+        def keep(key):
+            return key in self._pins or not protected.isdisjoint(artifact_names(key))
+
+        # Candidates are chosen and pinned under the lock, but compressed outside
+        # it, so downloads and jobs are not held up by a sweep
+        candidates = {}
+        with self._lock:
+            self._last_sweep = time.time()
+            for key in list(self._index):
+                if not os.path.exists(self._stored_path(key)):
+                    del self._index[key]
+
+            for key in list(self._index):
+                entry = self._index[key]
+                unused = now - datetime.fromisoformat(entry["last_access"])
+                if keep(key):
+                    continue
+                if unused > self.max_age:
+                    freed += self._evict(key, f"unused for {unused.days} days")
+                    evicted += 1
+                elif (
+                    unused > self.compress_after
+                    and not entry["compressed"]
+                    and os.path.splitext(key)[1].lower() in COMPRESSIBLE_EXTENSIONS
+                ):
+                    candidates[key] = (entry["last_access"], os.stat(key).st_mtime_ns)
+                    self._pins[key] = 1
+            self._save()
+
+        compressed_copies = {}
+        try:
+            for key in candidates:
+                try:
+                    compressed_copies[key] = self._gzip(key)
+                except OSError as e:
+                    logging.warning(f"Could not compress {key}: {e}")
+        finally:
+            with self._lock:
+                for key, version in candidates.items():
+                    self._pins[key] -= 1
+                    if not self._pins[key]:
+                        del self._pins[key]
+                    temp_path = compressed_copies.get(key)
+                    if temp_path is None:
+                        continue
+                    entry = self._index.get(key)
+                    # Skip files used, rewritten or dropped while compressing
+                    if (
+                        entry is None
+                        or key in self._pins
+                        or not os.path.exists(key)
+                        or (entry["last_access"], os.stat(key).st_mtime_ns) != version
+                    ):
+                        os.remove(temp_path)
+                        continue
+                    before = entry["size"]
+                    self._replace_compressed(key, temp_path)
+                    freed += before - entry["size"]
+                    compressed += 1
+                self._save()
+
+        with self._lock:
+            # Least recently used first
+            by_access = sorted(
+                self._index, key=lambda key: self._index[key]["last_access"]
+            )
+            total = sum(entry["size"] for entry in self._index.values())
+            for key in by_access:
+                if total <= self.max_bytes:
+                    break
+                if keep(key):
+                    continue
+                size = self._evict(key, "over the size limit")
+                total -= size
+                freed += size
+                evicted += 1
+            self._save()
+        return {
+            "compressed": compressed,
+            "evicted": evicted,
+            "freed_bytes": freed,
+            "total_bytes": total,
+        }
+
+    def maybe_sweep(self):
+        """
+        Sweeps if the last sweep was more than SWEEP_INTERVAL seconds ago.
+        """
+        if time.time() - self._last_sweep >= SWEEP_INTERVAL:
+            return self.sweep()
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._index),
+                "compressed": sum(
+                    entry["compressed"] for entry in self._index.values()
+                ),
+                "total_bytes": sum(entry["size"] for entry in self._index.values()),
+                "pinned": len(self._pins),
+            }
+
+
+# Example usage:
+# python -m utils.storage ./data/loading/storage.json --runs ./data/loading/runs.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compress and evict the files tracked in a storage index."
+    )
+    parser.add_argument("index", help="Storage index JSON file")
+    parser.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS)
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    parser.add_argument(
+        "--compress-after-days", type=float, default=DEFAULT_COMPRESS_AFTER_DAYS
+    )
+    parser.add_argument(
+        "--runs", help="Run registry JSON file whose cached outputs are kept"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    protected = None
+    if args.runs:
+        from utils.runs import RunRegistry
+
+        run_registry = RunRegistry(args.runs)
+        run_registry.expire(datetime.now() - timedelta(days=args.max_age_days))
+        protected = run_registry.referenced_names
+    storage = StorageManager(
+        args.index,
+        args.max_age_days,
+        args.max_bytes,
+        args.compress_after_days,
+        protected=protected,
+    )
+    print(storage.sweep())
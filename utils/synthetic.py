@@ -0,0 +1,233 @@
+import argparse
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from utils.export import write_export
+
+# Columns of an engagement list export, as in data/inputData/fakerData.ipynb.
+# A superset of utils.dataLoadFunction.KEEP_COLS.
+ENGAGEMENT_LIST_COLUMNS = [
+    "Engagement ID",
+    "Creation Date",
+    "Release Date",
+    "Last Time Charged Date",
+    "Last Expenses Charged Date",
+    "Last Active ETC-P Date",
+    "Engagement",
+    "Client",
+    "Engagement Region",
+    "Engagement Country",
+    "Engagement Type",
+    "Currency",
+    "Engagement Partner",
+    "Engagement Partner GUI",
+    "Engagement Manager",
+    "Engagement Manager GUI",
+    "Engagement Partner Service Line",
+    "Engagement Status",
+]
+
+BENCHMARK_SIZES = [10_000, 100_000, 1_000_000]
+
+SERVICE_LINES = ["CBS & Elim", "Assurance", "Consulting", "Tax", "SaT"]
+STATUSES = ["Released", "Active", "Pending", "Closed"]
+STATUS_WEIGHTS = [0.6, 0.2, 0.1, 0.1]
+COUNTRIES = [
+    ("United Kingdom", "GBP"),
+    ("Ireland", "EUR"),
+    ("Germany", "EUR"),
+    ("France", "EUR"),
+    ("Netherlands", "EUR"),
+    ("Switzerland", "CHF"),
+    ("Sweden", "SEK"),
+    ("United Arab Emirates", "AED"),
+]
+COUNTRY_WEIGHTS = [0.55, 0.1, 0.1, 0.08, 0.07, 0.04, 0.03, 0.03]
+
+FIRST_NAMES = [
+    "Alex", "Amira", "Ben", "Charlotte", "Daniel", "Eleanor", "Farah", "George",
+    "Hannah", "Isaac", "Jade", "Kieran", "Laura", "Mohammed", "Niamh", "Oliver",
+    "Priya", "Rhys", "Sophie", "Tom",
+]  # fmt: skip
+LAST_NAMES = [
+    "Ahmed", "Baker", "Clarke", "Davies", "Evans", "Fletcher", "Green", "Hughes",
+    "Iqbal", "Jones", "Khan", "Lewis", "Morgan", "Nolan", "O'Brien", "Patel",
+    "Roberts", "Smith", "Taylor", "Walsh", "Wilson", "Wright",
+]  # fmt: skip
+CLIENT_WORDS = [
+    "Apex", "Blue", "Cedar", "Delta", "Ember", "Fairway", "Granite", "Harbour",
+    "Iris", "Juniper", "Kestrel", "Lumen", "Meridian", "Northgate", "Orchid",
+    "Pinnacle", "Quay", "Riverside", "Summit", "Thames",
+]  # fmt: skip
+CLIENT_SUFFIXES = ["Ltd", "plc", "Group", "Holdings", "LLP", "Partners"]
+ENGAGEMENT_WORDS = [
+    "Transformation", "Assessment", "Implementation", "Review", "Strategy",
+    "Integration", "Audit", "Programme", "Migration", "Optimisation",
+]  # fmt: skip
+ENGAGEMENT_AREAS = [
+    "Finance", "Supply Chain", "Cloud", "Data", "Cyber", "Tax", "People",
+    "Operations", "Risk", "Digital",
+]  # fmt: skip
+
+# Engagements per partner and per manager, and clients per engagement
+ROWS_PER_PARTNER = 400
+ROWS_PER_MANAGER = 40
+ROWS_PER_CLIENT = 8
+
+
+def _people(rng, count, gui_start):
+    """
+    Returns `count` "Last, First" names and unique 7 digit GUIs.
+    """
+    first = rng.choice(FIRST_NAMES, count)
+    last = rng.choice(LAST_NAMES, count)
+    # Disambiguate repeated names the way a directory would, by a numeric suffix
+    names = pd.Series(last).str.cat(pd.Series(first), sep=", ")
+    duplicate = names.groupby(names).cumcount()
+    names = names.where(duplicate == 0, names + " " + (duplicate + 1).astype(str))
+    guis = pd.Series(np.arange(gui_start, gui_start + count)).astype(str).str.zfill(7)
+    return names.to_numpy(dtype=object), guis.to_numpy(dtype=object)
+
+
+def _optional_dates(rng, start, end, missing_share):
+    """
+    Returns dates uniformly between each start date and end, with a share of
+    them missing.
+    """
+    span = (end - start).dt.days.to_numpy()
+    offsets = (rng.random(len(start)) * (span + 1)).astype("int64")
+    dates = start + pd.to_timedelta(offsets, unit="D")
+    return dates.mask(rng.random(len(start)) < missing_share)
+
+
+def generate_engagements(rows, seed=0, report_date="2024-06-28"):
+    """
+    Generates a realistic engagement list with ENGAGEMENT_LIST_COLUMNS.
+
+    Everything is drawn as whole columns from a seeded numpy generator, so a
+    million rows take seconds and the same seed gives the same list. Partners,
+    managers and clients repeat across engagements in realistic proportions,
+    dates are ordered (creation <= release <= charges and ETC <= report date)
+    and the last charge and ETC dates are often missing, as in the source
+    system.
+
+    Args:
+        rows (int): Number of engagements.
+        seed (int, optional): Random seed. Defaults to 0.
+        report_date (str, optional): Latest possible charge date.
+
+    Returns:
+        pd.DataFrame: The engagement list with datetime64 date columns.
+    """
+    rng = np.random.default_rng(seed)
+    report_date = pd.Timestamp(report_date)
+
+    partner_names, partner_guis = _people(
+        rng, max(1, rows // ROWS_PER_PARTNER), 1_000_000
+    )
+    manager_names, manager_guis = _people(
+        rng, max(1, rows // ROWS_PER_MANAGER), 5_000_000
+    )
+    # Each manager works mostly for one partner
+    manager = rng.integers(0, len(manager_names), rows)
+    partner = rng.integers(0, len(partner_names), len(manager_names))[manager]
+    other_partner = rng.random(rows) < 0.1
+    partner[other_partner] = rng.integers(0, len(partner_names), other_partner.sum())
+
+    client_count = max(1, rows // ROWS_PER_CLIENT)
+    clients = (
+        pd.Series(rng.choice(CLIENT_WORDS, client_count))
+        .str.cat(pd.Series(rng.choice(CLIENT_WORDS, client_count)), sep=" ")
+        .str.cat(pd.Series(rng.choice(CLIENT_SUFFIXES, client_count)), sep=" ")
+        .str.cat(pd.Series(np.arange(client_count)).astype(str), sep=" ")
+        .to_numpy(dtype=object)
+    )
+    engagements = (
+        pd.Series(rng.choice(ENGAGEMENT_AREAS, rows))
+        .str.cat(pd.Series(rng.choice(ENGAGEMENT_WORDS, rows)), sep=" ")
+        .to_numpy(dtype=object)
+    )
+    countries, currencies = (
+        np.array(values, dtype=object) for values in zip(*COUNTRIES)
+    )
+    country = rng.choice(len(COUNTRIES), rows, p=COUNTRY_WEIGHTS)
+
+    creation_date = pd.Series(
+        report_date - pd.to_timedelta(rng.integers(30, 3 * 365, rows), unit="D")
+    )
+    release_date = creation_date + pd.to_timedelta(rng.integers(0, 30, rows), unit="D")
+    last_time_charged = _optional_dates(rng, release_date, report_date, 0.3)
+    last_expenses_charged = _optional_dates(rng, release_date, report_date, 0.6)
+    last_etc = _optional_dates(rng, release_date, report_date, 0.5)
+
+    # Unique IDs in a shuffled order, like an export sorted by something else
+    ids = rng.permutation(rows) + 10_000_000
+    df = pd.DataFrame(
+        {
+            "Engagement ID": pd.Series(ids).astype(str).radd("E-").to_numpy(),
+            "Creation Date": creation_date,
+            "Release Date": release_date,
+            "Last Time Charged Date": last_time_charged,
+            "Last Expenses Charged Date": last_expenses_charged,
+            "Last Active ETC-P Date": last_etc,
+            "Engagement": engagements,
+            "Client": clients[rng.integers(0, client_count, rows)],
+            "Engagement Region": "EMEA",
+            "Engagement Country": countries[country],
+            "Engagement Type": "External Project",
+            "Currency": currencies[country],
+            "Engagement Partner": partner_names[partner],
+            "Engagement Partner GUI": partner_guis[partner],
+            "Engagement Manager": manager_names[manager],
+            "Engagement Manager GUI": manager_guis[manager],
+            "Engagement Partner Service Line": rng.choice(SERVICE_LINES, rows),
+            "Engagement Status": rng.choice(STATUSES, rows, p=STATUS_WEIGHTS),
+        },
+        columns=ENGAGEMENT_LIST_COLUMNS,
+    )
+    return df
+
+
+def write_engagement_list(df, folder, fmt="xlsx", name=None):
+    """
+    Writes a generated engagement list as an upload would arrive: an Excel
+    workbook (streamed, see utils.export), CSV or Parquet file.
+
+    Returns:
+        str: The path written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    name = name or f"synthetic_engagement_data-{len(df)}"
+    path = os.path.join(folder, f"{name}.{fmt}")
+    start_time = time.time()
+    write_export(df, path, fmt)
+    logging.info(
+        f"Wrote {len(df)} synthetic engagements to {path} in {time.time() - start_time:.2f} seconds"
+    )
+    return path
+
+
+# Example usage:
+# python -m utils.synthetic --rows 10000 100000 1000000 --format xlsx parquet
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic engagement list files."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=BENCHMARK_SIZES)
+    parser.add_argument(
+        "--format",
+        nargs="+",
+        default=["xlsx", "parquet"],
+        choices=["xlsx", "csv", "parquet"],
+    )
+    parser.add_argument("--out", default="./data/synthetic")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for rows in args.rows:
+        df = generate_engagements(rows, seed=args.seed)
+        for fmt in args.format:
+            print(write_engagement_list(df, args.out, fmt))